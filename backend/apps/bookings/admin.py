@@ -12,13 +12,13 @@ class JobEvidenceInline(admin.TabularInline):
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('job', 'client', 'hauler', 'amount', 'status', 'escrow_locked_at', 'hauler_marked_done_at')
-    list_filter = ('status',)
+    list_filter = ('status', 'is_suspicious')
     search_fields = ('job__title', 'client__email', 'hauler__email')
     ordering = ('-created_at',)
     readonly_fields = (
         'escrow_locked_at', 'pickup_confirmed_at', 'hauler_marked_done_at',
         'dispute_opened_at', 'auto_release_at', 'completed_at', 'created_at',
-        'pickup_pin',
+        'pickup_pin', 'shared_device_count',
     )
     inlines = [JobEvidenceInline]
 
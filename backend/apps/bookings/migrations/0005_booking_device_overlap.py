@@ -0,0 +1,27 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_jobevidence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='is_suspicious',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='shared_device_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['completed_at'], name='booking_completed_idx'),
+        ),
+    ]
@@ -52,8 +52,15 @@ class Booking(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Parties share a device (apps.users.overlap) or belong to one fraud ring (apps.users.fraudgraph)
+    is_suspicious = models.BooleanField(default=False)
+    shared_device_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['completed_at'], name='booking_completed_idx'),
+        ]
 
     def __str__(self):
         return f'Booking: {self.job.title} — {self.status}'
@@ -9,6 +9,7 @@ from rest_framework.decorators import api_view, parser_classes, throttle_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 
+from config.idempotency import idempotent_request
 from config.throttles import EvidenceUploadThrottle
 from .models import Booking, JobEvidence
 from .serializers import BookingSerializer, JobEvidenceSerializer
@@ -285,6 +286,7 @@ def mark_done(request, pk):
 
 
 @api_view(['POST'])
+@idempotent_request
 def confirm_complete(request, pk):
     """
     Client confirms payment after hauler marks done.
@@ -504,6 +506,7 @@ def request_amendment(request, pk):
 
 
 @api_view(['POST'])
+@idempotent_request
 def respond_amendment(request, pk, amendment_pk):
     """
     Client accepts or rejects a scope amendment.
@@ -557,7 +560,7 @@ def respond_amendment(request, pk, amendment_pk):
         if diff != 0:
             WalletTransaction.objects.create(
                 wallet=client_wallet,
-                transaction_type='escrow_lock',
+                transaction_type='escrow_lock' if diff > 0 else 'escrow_refund',
                 amount=abs(diff),
                 reference_id=str(booking.id),
                 description=f'Escrow adjusted for amendment: ${old_amount} → ${new_amount}',
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatRoom, Message
+from .models import ChatRoom, Message, ModerationScan
 
 
 @admin.register(ChatRoom)
@@ -10,7 +10,16 @@ class ChatRoomAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('sender', 'chat_room', 'content', 'sent_at', 'is_read')
-    list_filter = ('is_read',)
+    list_display = ('sender', 'chat_room', 'content', 'sent_at', 'is_read', 'is_flagged', 'flag_reason')
+    list_filter = ('is_read', 'is_flagged', 'flag_reason')
     search_fields = ('sender__email', 'content')
     ordering = ('-sent_at',)
+
+
+@admin.register(ModerationScan)
+class ModerationScanAdmin(admin.ModelAdmin):
+    list_display = ('rules_version', 'scanned_count', 'flagged_count', 'started_at', 'finished_at')
+    readonly_fields = (
+        'rules_version', 'last_message_id', 'scanned_count', 'flagged_count',
+        'started_at', 'updated_at', 'finished_at',
+    )
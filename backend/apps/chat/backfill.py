@@ -0,0 +1,104 @@
+"""
+Missed-message replay for reconnecting chat sockets.
+
+Every published message is also pushed onto chat:recent:<room_id>, a Redis
+list capped at RECENT_BUFFER_SIZE entries (LTRIM) that expires after
+RECENT_BUFFER_TTL_SECONDS without traffic. A client that reconnects with
+`last_seen=<message id>` gets only what it missed:
+
+  1. cursor found in the buffer  -> the entries after it (one LRANGE, no DB)
+  2. cursor older than the buffer -> keyset query on Message after the
+     cursor's (sent_at, id), merged with buffered entries that write-behind
+     has not flushed yet
+  3. more than BACKFILL_MAX_MESSAGES missed, or an unknown cursor
+     -> nothing is replayed and the caller tells the client to resync over
+        the REST history endpoint
+
+Replay happens after the socket has joined the room group, so nothing falls
+in the gap; a message may arrive twice and clients de-duplicate by id.
+"""
+
+import json
+import uuid
+from datetime import datetime
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Q
+
+from config.redis_client import get_async_redis
+
+
+def _cfg(key, default):
+    return settings.CHAT.get(key, default)
+
+
+def _key(room_id):
+    return f'chat:recent:{room_id}'
+
+
+async def remember(room_id, message: dict):
+    """Append a broadcast message to the room's recent buffer."""
+    key = _key(room_id)
+    pipe = get_async_redis().pipeline(transaction=False)
+    pipe.rpush(key, json.dumps(message))
+    pipe.ltrim(key, -_cfg('RECENT_BUFFER_SIZE', 100), -1)
+    pipe.expire(key, _cfg('RECENT_BUFFER_TTL_SECONDS', 86400))
+    await pipe.execute()
+
+
+def parse_cursor(value):
+    """A last_seen value as a message id string, or None if it is not a UUID."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+@database_sync_to_async
+def _from_db(room_id, last_seen, limit):
+    """(cursor sent_at, up to limit + 1 message dicts after it), or (None, []) for an unknown cursor."""
+    from .consumers import _message_payload
+    from .models import Message
+
+    cursor = Message.objects.filter(id=last_seen, chat_room_id=room_id).values_list('sent_at', flat=True).first()
+    if cursor is None:
+        return None, []
+    rows = (
+        Message.objects
+        .filter(chat_room_id=room_id)
+        .filter(Q(sent_at__gt=cursor) | Q(sent_at=cursor, id__gt=last_seen))
+        .select_related('sender')
+        .order_by('sent_at', 'id')[:limit + 1]
+    )
+    messages = []
+    for m in rows:
+        payload = _message_payload(m.sender, m.id, m.content, m.sent_at, m.is_flagged)
+        payload['is_read'] = m.is_read
+        messages.append(payload)
+    return cursor, messages
+
+
+async def missed_since(room_id, last_seen):
+    """
+    Messages in the room after `last_seen`, oldest first, as (messages, complete).
+    complete is False when the gap cannot be replayed and the client has to resync.
+    """
+    buffered = [json.loads(raw) for raw in await get_async_redis().lrange(_key(room_id), 0, -1)]
+    for i, message in enumerate(buffered):
+        if message['id'] == last_seen:
+            return buffered[i + 1:], True
+
+    limit = _cfg('BACKFILL_MAX_MESSAGES', 200)
+    cursor, messages = await _from_db(room_id, last_seen, limit)
+    if cursor is None or len(messages) > limit:
+        return [], False
+
+    # Write-behind may not have flushed the newest messages yet
+    have = {m['id'] for m in messages}
+    messages += [
+        m for m in buffered
+        if m['id'] not in have and datetime.fromisoformat(m['sent_at']) > cursor
+    ]
+    messages.sort(key=lambda m: (datetime.fromisoformat(m['sent_at']), m['id']))
+    return messages, True
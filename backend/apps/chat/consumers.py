@@ -1,45 +1,479 @@
+import asyncio
 import json
-import re
+import logging
+import time
+import uuid
+from collections import deque
+from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from config import metrics
+from config.ratelimit import SharedTokenBucket, TokenBucket
+
+from . import backfill, presence, writebehind
+from .moderation import get_matcher
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
-# Off-platform solicitation keyword filter
+# Off-platform solicitation filter
 # ---------------------------------------------------------------------------
-# Matches payment app names, money transfer services, phone numbers and emails.
-# Messages matching any pattern are saved with is_flagged=True and delivered
-# normally (soft-flag, not blocked) — aggressive blocking causes false positives.
+# Payment app names, money transfer services, phone numbers and emails — see
+# apps.chat.moderation and data/solicitation_rules.json. Matching messages are
+# saved with is_flagged=True (+ the rule in flag_reason) and delivered normally
+# (soft-flag, not blocked) — aggressive blocking causes false positives.
 # ---------------------------------------------------------------------------
-_PAYMENT_KEYWORDS = re.compile(
-    r'\b(venmo|paypal|pay pal|zelle|cashapp|cash app|wise|western union|'
-    r'wire transfer|bank transfer|interac|revolut|monzo|chime)\b',
-    re.IGNORECASE,
-)
-_PHONE_RE = re.compile(
-    r'(\+?1?\s?\(?\d{3}\)?[\s.\-]\d{3}[\s.\-]\d{4})',
-)
-_EMAIL_RE = re.compile(
-    r'\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b',
-)
-
-
-def _is_flagged(content: str) -> bool:
-    return bool(
-        _PAYMENT_KEYWORDS.search(content)
-        or _PHONE_RE.search(content)
-        or _EMAIL_RE.search(content)
-    )
-
-
-class ChatConsumer(AsyncWebsocketConsumer):
+
+
+def _flag_reason(content: str) -> str:
+    """Name of the solicitation rule `content` trips, or '' if it is clean."""
+    match = get_matcher().match(content)
+    return match.rule if match else ''
+
+
+def _message_payload(user, message_id, content, sent_at, flagged):
+    """The message dict broadcast to the room group (and buffered by write-behind)."""
+    return {
+        'id': str(message_id),
+        'sender_id': str(user.id),
+        'sender_name': user.full_name,
+        'content': content,
+        'sent_at': sent_at.isoformat(),
+        'is_read': False,
+        'is_flagged': flagged,
+    }
+
+
+def _group_name(room_id):
+    return f'chat_{room_id}'
+
+
+def _has_room_access(user, room_id):
+    from .models import ChatRoom
+    try:
+        room = ChatRoom.objects.select_related(
+            'booking', 'application__job'
+        ).get(id=room_id)
+        if room.booking:
+            return room.booking.client == user or room.booking.hauler == user
+        if room.application:
+            return room.application.job.client == user or room.application.hauler == user
+        return False
+    except (ChatRoom.DoesNotExist, ValueError, ValidationError):
+        return False
+
+
+def _is_authenticated(user):
+    return bool(user) and not isinstance(user, AnonymousUser) and user.is_authenticated
+
+
+class _MessagingMixin:
+    """Persist (or enqueue) a message and fan it out to the room group."""
+
+    async def publish_message(self, room_id, content):
+        user = self.scope['user']
+        flag_reason = _flag_reason(content)
+        if settings.CHAT.get('WRITE_BEHIND_ENABLED'):
+            message = await self.enqueue_message(user, room_id, content, flag_reason)
+        else:
+            message = await self.save_message(user, room_id, content, flag_reason)
+
+        await backfill.remember(room_id, message)
+        await self.channel_layer.group_send(
+            _group_name(room_id),
+            {'type': 'chat_message', 'room_id': str(room_id), 'message': message},
+        )
+
+    @database_sync_to_async
+    def save_message(self, user, room_id, content, flag_reason=''):
+        from .models import Message
+        message = Message.objects.create(
+            chat_room_id=room_id,
+            sender=user,
+            content=content,
+            is_flagged=bool(flag_reason),
+            flag_reason=flag_reason,
+        )
+        return _message_payload(user, message.id, content, message.sent_at, message.is_flagged)
+
+    async def enqueue_message(self, user, room_id, content, flag_reason=''):
+        """Write-behind path: id and timestamp are assigned here, the INSERT happens later."""
+        message = _message_payload(user, uuid.uuid4(), content, timezone.now(), bool(flag_reason))
+        await writebehind.append_message(room_id, message, flag_reason)
+        return message
+
+    async def replay_missed(self, room_id, last_seen):
+        """Send what the client missed since `last_seen`, or ask it to resync."""
+        messages, complete = await backfill.missed_since(room_id, last_seen)
+        for message in messages:
+            await self.chat_message({'room_id': str(room_id), 'message': message})
+        if not complete:
+            await self.enqueue_frame({'type': 'resync', 'room_id': str(room_id)})
+
+
+class _PresenceMixin:
+    """
+    Typing and presence events. Presence lives in Redis (apps.chat.presence)
+    and both kinds are fanned out through the channel layer only — nothing
+    here touches Postgres or is persisted.
+
+    Users whose connections expired without a disconnect (worker crash) are
+    broadcast offline by whichever connection's join or heartbeat notices.
+
+    Channel-layer traffic is bounded per connection: presence is broadcast
+    only when a user's online state flips (not per heartbeat), heartbeats are
+    ignored more often than PRESENCE_HEARTBEAT_MIN_SECONDS, and typing=true is
+    re-broadcast at most once per TYPING_THROTTLE_SECONDS, with typing=false
+    only sent after a typing=true. Clients should drop a typing indicator
+    that has not been refreshed for about twice the throttle interval.
+    """
+
+    def init_presence(self):
+        self.last_heartbeat = {}
+        self.typing = {}  # room_id -> (is_typing, monotonic time last broadcast)
+
+    async def presence_join(self, room_id):
+        user_id = str(self.scope['user'].id)
+        self.last_heartbeat[room_id] = time.monotonic()
+        came_online, expired = await presence.join(room_id, user_id, self.channel_name)
+        if came_online:
+            await self.broadcast_presence(room_id, user_id, 'online')
+        await self.broadcast_expired(room_id, expired)
+        # Tell the new connection who else is already here
+        for other_id in await presence.online_users(room_id) - {user_id}:
+            await self.enqueue_frame(
+                {'type': 'presence', 'room_id': str(room_id), 'user_id': other_id, 'status': 'online'},
+                room_id=str(room_id), coalesce_key=('presence', str(room_id), other_id),
+            )
+
+    async def presence_heartbeat(self, room_id):
+        now = time.monotonic()
+        if now - self.last_heartbeat.get(room_id, 0) < settings.CHAT.get('PRESENCE_HEARTBEAT_MIN_SECONDS', 10):
+            return
+        self.last_heartbeat[room_id] = now
+        user_id = str(self.scope['user'].id)
+        came_online, expired = await presence.join(room_id, user_id, self.channel_name)
+        if came_online:
+            await self.broadcast_presence(room_id, user_id, 'online')
+        await self.broadcast_expired(room_id, expired)
+
+    async def presence_leave(self, room_id):
+        user_id = str(self.scope['user'].id)
+        self.last_heartbeat.pop(room_id, None)
+        self.typing.pop(room_id, None)
+        went_offline, expired = await presence.leave(room_id, user_id, self.channel_name)
+        if went_offline:
+            await self.broadcast_presence(room_id, user_id, 'offline')
+        await self.broadcast_expired(room_id, expired)
+
+    async def set_typing(self, room_id, is_typing):
+        now = time.monotonic()
+        was_typing, last_sent = self.typing.get(room_id, (False, 0.0))
+        if is_typing and was_typing and now - last_sent < settings.CHAT.get('TYPING_THROTTLE_SECONDS', 3):
+            return
+        if not is_typing and not was_typing:
+            return
+        self.typing[room_id] = (is_typing, now)
+        await self.channel_layer.group_send(
+            _group_name(room_id),
+            {'type': 'chat_typing', 'room_id': str(room_id), 'user_id': str(self.scope['user'].id),
+             'is_typing': is_typing},
+        )
+
+    def clear_typing(self, room_id):
+        """A sent message ends typing on the client side; no broadcast needed."""
+        self.typing.pop(room_id, None)
+
+    async def broadcast_presence(self, room_id, user_id, status):
+        await self.channel_layer.group_send(
+            _group_name(room_id),
+            {'type': 'chat_presence', 'room_id': str(room_id), 'user_id': user_id, 'status': status},
+        )
+
+    async def broadcast_expired(self, room_id, user_ids):
+        """Offline for users presence pruned because their connections expired."""
+        for user_id in user_ids:
+            metrics.incr('chat.presence.expired')
+            await self.broadcast_presence(room_id, user_id, 'offline')
+
+    async def chat_typing(self, event):
+        if event['user_id'] != str(self.scope['user'].id):
+            await self.enqueue_frame(
+                {'type': 'typing', 'room_id': event['room_id'], 'user_id': event['user_id'],
+                 'is_typing': event['is_typing']},
+                room_id=event['room_id'], coalesce_key=('typing', event['room_id'], event['user_id']),
+            )
+
+    async def chat_presence(self, event):
+        if event['user_id'] != str(self.scope['user'].id):
+            await self.enqueue_frame(
+                {'type': 'presence', 'room_id': event['room_id'], 'user_id': event['user_id'],
+                 'status': event['status']},
+                room_id=event['room_id'], coalesce_key=('presence', event['room_id'], event['user_id']),
+            )
+
+
+class _FlowControlMixin:
+    """
+    Per-connection send buffer and application-level keepalive.
+
+    Every outgoing frame goes through self.outbox and is written by a
+    separate task, so group-event handlers never wait on the socket and the
+    channel-layer inbox keeps draining while a client is slow. The writer
+    sends {"type": "ping", "seq": n} every SEND_ACK_EVERY frames and stops
+    once SEND_WINDOW frames are not yet covered by a matching pong. daphne's
+    send() never blocks, so without the window a stalled client would pile
+    frames up in the server's transport buffer instead.
+
+    While the window is shut, frames wait in the outbox. Typing and presence
+    frames coalesce per (room, user). Once room traffic reaches
+    SEND_BUFFER_HIGH_WATER, SEND_BUFFER_POLICY applies:
+
+      coalesce    drop the buffered messages and queue one resync per room
+      drop        drop new room frames, send resync once the buffer drains
+      disconnect  close with 4008; the client reconnects with last_seen
+
+    A keepalive task pings every PING_INTERVAL_SECONDS. It closes (4408) a
+    connection that has sent nothing for PING_INTERVAL + PONG_TIMEOUT. If
+    either task fails, the error is logged and the socket closed (1011).
+    Buffer depth, overflows and reaped sockets go to config.metrics under
+    chat.*.
+    """
+
+    def start_flow(self):
+        self.outbox = deque()       # [coalesce_key, text, room_id]
+        self.pending = {}           # coalesce_key -> outbox entry
+        self.resync_rooms = set()
+        self.outbox_ready = asyncio.Event()
+        self.window_open = asyncio.Event()
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.ping_seq = 0
+        self.unacked_pings = {}     # seq -> frames_sent when the ping went out
+        self.last_inbound = time.monotonic()
+        self.closing = False
+        self.flow_tasks = [asyncio.ensure_future(self._write_loop()), asyncio.ensure_future(self._keepalive_loop())]
+        for task in self.flow_tasks:
+            task.add_done_callback(self._flow_task_done)
+
+    def _flow_task_done(self, task):
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error('Chat socket %s: flow task failed', self.channel_name, exc_info=task.exception())
+        if not self.closing:
+            self.closing = True
+            asyncio.ensure_future(self.close(code=1011))
+
+    def stop_flow(self):
+        for task in getattr(self, 'flow_tasks', ()):
+            task.cancel()
+
+    async def websocket_receive(self, message):
+        self.last_inbound = time.monotonic()
+        await super().websocket_receive(message)
+
+    async def enqueue_frame(self, payload, room_id=None, coalesce_key=None):
+        """
+        Queue a frame for the socket. room_id marks room traffic (subject to
+        the overflow policy); control frames without one are always queued.
+        """
+        if self.closing:
+            return
+        text = json.dumps(payload)
+        if coalesce_key is not None and coalesce_key in self.pending:
+            self.pending[coalesce_key][1] = text
+            metrics.incr('chat.send_buffer.coalesced')
+            return
+        if room_id is not None and len(self.outbox) >= settings.CHAT.get('SEND_BUFFER_HIGH_WATER', 500):
+            await self._overflow(room_id, is_message=coalesce_key is None)
+            return
+
+        entry = [coalesce_key, text, room_id]
+        self.outbox.append(entry)
+        if coalesce_key is not None:
+            self.pending[coalesce_key] = entry
+        metrics.gauge_max('chat.send_buffer.depth', len(self.outbox))
+        self.outbox_ready.set()
+
+    async def _overflow(self, room_id, is_message):
+        policy = settings.CHAT.get('SEND_BUFFER_POLICY', 'coalesce')
+        metrics.incr(f'chat.send_buffer.overflow.{policy}')
+        if policy == 'disconnect':
+            self.closing = True
+            await self.close(code=4008)
+            return
+        if policy == 'drop':
+            metrics.incr('chat.send_buffer.dropped')
+            if is_message:
+                self.resync_rooms.add(room_id)
+            return
+
+        # coalesce: buffered messages collapse into one resync per room
+        rooms = {room_id} if is_message else set()
+        kept = deque()
+        for entry in self.outbox:
+            key, _text, entry_room = entry
+            if key is None and entry_room is not None:
+                rooms.add(entry_room)
+            else:
+                kept.append(entry)
+        metrics.incr('chat.send_buffer.dropped', len(self.outbox) - len(kept) + 1)
+        self.outbox = kept
+        self._queue_resync(rooms)
+
+    def _queue_resync(self, rooms):
+        for room in sorted(rooms):
+            key = ('resync', room)
+            if key not in self.pending:
+                entry = [key, json.dumps({'type': 'resync', 'room_id': room}), None]
+                self.outbox.append(entry)
+                self.pending[key] = entry
+        self.outbox_ready.set()
+
+    def handle_pong(self, seq):
+        # seq comes from the client: anything but one of our ints is ignored
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            metrics.incr('chat.frames.invalid_pong')
+            return
+        sent = self.unacked_pings.pop(seq, None)
+        if sent is None:
+            return
+        for older in [s for s in self.unacked_pings if s < seq]:
+            del self.unacked_pings[older]
+        self.frames_acked = max(self.frames_acked, sent)
+        self.window_open.set()
+
+    async def send_ping(self):
+        self.ping_seq += 1
+        self.unacked_pings[self.ping_seq] = self.frames_sent
+        await self.send(text_data=json.dumps({'type': 'ping', 'seq': self.ping_seq}))
+
+    async def _write_loop(self):
+        window = settings.CHAT.get('SEND_WINDOW', 200)
+        ack_every = settings.CHAT.get('SEND_ACK_EVERY', 50)
+        while True:
+            if not self.outbox:
+                if self.resync_rooms:
+                    self._queue_resync(self.resync_rooms)
+                    self.resync_rooms.clear()
+                    continue
+                self.outbox_ready.clear()
+                await self.outbox_ready.wait()
+                continue
+            if window and self.frames_sent - self.frames_acked >= window:
+                self.window_open.clear()
+                await self.window_open.wait()
+                continue
+
+            key, text, _room = self.outbox.popleft()
+            if key is not None:
+                self.pending.pop(key, None)
+            await self.send(text_data=text)
+            self.frames_sent += 1
+            if window and self.frames_sent % ack_every == 0:
+                await self.send_ping()
+
+    async def _keepalive_loop(self):
+        interval = settings.CHAT.get('PING_INTERVAL_SECONDS', 25)
+        timeout = settings.CHAT.get('PONG_TIMEOUT_SECONDS', 10)
+        last_ping = time.monotonic()
+        while True:
+            await asyncio.sleep(min(interval, timeout) if interval else 10)
+            now = time.monotonic()
+            metrics.gauge_max('chat.send_buffer.depth', len(self.outbox))
+            await metrics.aflush_if_due()
+            if not interval:
+                continue
+            if now - self.last_inbound > interval + timeout:
+                metrics.incr('chat.sockets.reaped')
+                self.closing = True
+                await self.close(code=4408)
+                return
+            if now - last_ping >= interval:
+                last_ping = now
+                await self.send_ping()
+
+
+class _RateLimitMixin:
+    """
+    Inbound frame limits, enforced when SECURITY['RATE_LIMITING_ENABLED'].
+
+    Every frame except pong draws on an in-process bucket per connection
+    (WS_FRAME_RATE / WS_FRAME_BURST). Chat messages also draw on a Redis
+    bucket per user that all of the user's sockets share (WS_MESSAGE_RATE /
+    WS_MESSAGE_BURST), leased WS_MESSAGE_LEASE tokens at a time so most
+    messages never leave the process. Rejected frames are neither persisted
+    nor broadcast. The client gets {"type": "error", "code": 4429,
+    "retry_after": s}, at most once a second.
+    """
+
+    def init_rate_limits(self):
+        sec = settings.SECURITY
+        self.frame_bucket = TokenBucket(sec.get('WS_FRAME_RATE', 10), sec.get('WS_FRAME_BURST', 30))
+        self.message_bucket = SharedTokenBucket(
+            f"ws:messages:{self.scope['user'].id}",
+            sec.get('WS_MESSAGE_RATE', 1), sec.get('WS_MESSAGE_BURST', 10), sec.get('WS_MESSAGE_LEASE', 3),
+        )
+        self.limit_notice_at = 0.0
+
+    async def frame_allowed(self, room_id):
+        if not settings.SECURITY.get('RATE_LIMITING_ENABLED', False):
+            return True
+        wait = self.frame_bucket.consume()
+        return not wait or await self.reject_frame(room_id, wait)
+
+    async def message_allowed(self, room_id):
+        if not settings.SECURITY.get('RATE_LIMITING_ENABLED', False):
+            return True
+        wait = await self.message_bucket.aconsume()
+        return not wait or await self.reject_frame(room_id, wait)
+
+    async def reject_frame(self, room_id, wait):
+        metrics.incr('chat.rate_limited')
+        now = time.monotonic()
+        if now - self.limit_notice_at >= 1.0:
+            self.limit_notice_at = now
+            await self.enqueue_frame({
+                'type': 'error', 'room_id': str(room_id) if room_id else None, 'code': 4429,
+                'error': 'Rate limit exceeded.', 'retry_after': round(wait, 3),
+            })
+        return False
+
+
+class ChatConsumer(_RateLimitMixin, _FlowControlMixin, _PresenceMixin, _MessagingMixin, AsyncWebsocketConsumer):
+    """
+    One socket per room: ws/chat/<room_id>/[?last_seen=<message id>]
+
+    With last_seen, messages sent after that one are replayed right after the
+    handshake (see apps.chat.backfill); if the gap is too large the socket
+    sends {"type": "resync"} instead and the client should refetch history.
+
+      → {"content": "..."}                       (or {"type": "message", "content": "..."})
+      → {"type": "typing", "is_typing": true | false}
+      → {"type": "presence"}                     heartbeat, every ~20s
+      → {"type": "pong", "seq": n}               reply to every ping
+
+      ← {...message fields}                      (no "type", as before)
+      ← {"type": "typing", "room_id": "<uuid>", "user_id": "<uuid>", "is_typing": true}
+      ← {"type": "presence", "room_id": "<uuid>", "user_id": "<uuid>", "status": "online" | "offline"}
+      ← {"type": "resync", "room_id": "<uuid>"}
+      ← {"type": "ping", "seq": n}
+      ← {"type": "error", "room_id": "<uuid>", "code": 4429, "error": "...", "retry_after": 0.8}
+    """
+
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
+        self.room_group_name = _group_name(self.room_id)
+        self.init_presence()
         user = self.scope.get('user')
 
-        if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
+        if not _is_authenticated(user):
             await self.close(code=4001)
             return
 
@@ -50,66 +484,170 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
+        self.start_flow()
+        self.init_rate_limits()
+        self.joined = True
+        await self.presence_join(self.room_id)
+
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        last_seen = backfill.parse_cursor(params.get('last_seen', [None])[0])
+        if last_seen:
+            await self.replay_missed(self.room_id, last_seen)
 
     async def disconnect(self, close_code):
+        self.stop_flow()
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if getattr(self, 'joined', False):
+            await self.presence_leave(self.room_id)
 
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
         except json.JSONDecodeError:
             return
+        if not isinstance(data, dict):
+            return
 
-        content = data.get('content', '').strip()
-        if not content:
+        frame_type = data.get('type', 'message')
+        if frame_type == 'pong':
+            self.handle_pong(data.get('seq'))
+            return
+        if not await self.frame_allowed(self.room_id):
+            return
+        if frame_type == 'typing':
+            await self.set_typing(self.room_id, bool(data.get('is_typing', True)))
+            return
+        if frame_type == 'presence':
+            await self.presence_heartbeat(self.room_id)
             return
 
-        user = self.scope['user']
-        flagged = _is_flagged(content)
-        message = await self.save_message(user, content, flagged)
+        content = str(data.get('content', '')).strip()
+        if not content or not await self.message_allowed(self.room_id):
+            return
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': {
-                    'id': str(message.id),
-                    'sender_id': str(user.id),
-                    'sender_name': user.full_name,
-                    'content': content,
-                    'sent_at': message.sent_at.isoformat(),
-                    'is_read': False,
-                    'is_flagged': flagged,
-                },
-            }
-        )
+        self.clear_typing(self.room_id)
+        await self.publish_message(self.room_id, content)
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event['message']))
+        await self.enqueue_frame(event['message'], room_id=event['room_id'])
 
     @database_sync_to_async
     def check_access(self, user, room_id):
-        from .models import ChatRoom
+        return _has_room_access(user, room_id)
+
+
+class UserChatConsumer(_RateLimitMixin, _FlowControlMixin, _PresenceMixin, _MessagingMixin,
+                       AsyncWebsocketConsumer):
+    """
+    One socket per user for all of their rooms: ws/chat/
+
+    Authentication (JWTAuthMiddleware) runs once per socket; rooms are joined
+    and left with control frames and every frame carries its room_id:
+
+      → {"action": "subscribe",   "room_id": "<uuid>", "last_seen": "<message id>"}   last_seen optional
+      → {"action": "unsubscribe", "room_id": "<uuid>"}
+      → {"action": "message",     "room_id": "<uuid>", "content": "..."}
+      → {"action": "typing",      "room_id": "<uuid>", "is_typing": true | false}
+      → {"action": "presence",    "room_id": "<uuid>"}      heartbeat, every ~20s
+
+      ← {"type": "subscribed" | "unsubscribed", "room_id": "<uuid>"}
+      ← {"type": "error", "room_id": "<uuid>", "code": 4003 | 4029 | 4429, "error": "..."}
+      ← {"type": "message", "room_id": "<uuid>", ...message fields}
+      ← {"type": "typing" | "presence" | "resync", "room_id": "<uuid>", ...}   (see ChatConsumer)
+      ← {"type": "ping", "seq": n}   → {"type": "pong", "seq": n}
+
+    Room groups are the same chat_<room_id> groups ChatConsumer uses, so both
+    socket styles can share a room.
+    """
+
+    async def connect(self):
+        self.rooms = set()
+        self.init_presence()
+        if not _is_authenticated(self.scope.get('user')):
+            await self.close(code=4001)
+            return
+        await self.accept()
+        self.start_flow()
+        self.init_rate_limits()
+
+    async def disconnect(self, close_code):
+        self.stop_flow()
+        for room_id in getattr(self, 'rooms', ()):
+            await self.channel_layer.group_discard(_group_name(room_id), self.channel_name)
+            await self.presence_leave(room_id)
+
+    async def receive(self, text_data):
         try:
-            room = ChatRoom.objects.select_related(
-                'booking', 'application__job'
-            ).get(id=room_id)
-            if room.booking:
-                return room.booking.client == user or room.booking.hauler == user
-            if room.application:
-                return room.application.job.client == user or room.application.hauler == user
-            return False
-        except ChatRoom.DoesNotExist:
-            return False
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('type') == 'pong':
+            self.handle_pong(data.get('seq'))
+            return
+        if not await self.frame_allowed(data.get('room_id')):
+            return
 
-    @database_sync_to_async
-    def save_message(self, user, content, flagged=False):
-        from .models import ChatRoom, Message
-        room = ChatRoom.objects.get(id=self.room_id)
-        return Message.objects.create(
-            chat_room=room,
-            sender=user,
-            content=content,
-            is_flagged=flagged,
+        action = data.get('action')
+        room_id = str(data.get('room_id', '')).strip().lower()
+        if not room_id:
+            return
+
+        if action == 'subscribe':
+            await self.subscribe(room_id, backfill.parse_cursor(data.get('last_seen')))
+        elif action == 'unsubscribe':
+            await self.unsubscribe(room_id)
+        elif action in ('message', 'typing', 'presence'):
+            if room_id not in self.rooms:
+                await self.send_error(room_id, 4003, 'Subscribe to the room before sending.')
+                return
+            if action == 'typing':
+                await self.set_typing(room_id, bool(data.get('is_typing', True)))
+            elif action == 'presence':
+                await self.presence_heartbeat(room_id)
+            else:
+                content = str(data.get('content', '')).strip()
+                if content and await self.message_allowed(room_id):
+                    self.clear_typing(room_id)
+                    await self.publish_message(room_id, content)
+
+    async def subscribe(self, room_id, last_seen=None):
+        if room_id in self.rooms:
+            await self.send_json({'type': 'subscribed', 'room_id': room_id})
+            return
+        if len(self.rooms) >= settings.CHAT.get('MAX_ROOMS_PER_SOCKET', 50):
+            await self.send_error(room_id, 4029, 'Too many rooms on one socket.')
+            return
+        if not await self.check_access(self.scope['user'], room_id):
+            await self.send_error(room_id, 4003, 'Forbidden.')
+            return
+        self.rooms.add(room_id)
+        await self.channel_layer.group_add(_group_name(room_id), self.channel_name)
+        await self.send_json({'type': 'subscribed', 'room_id': room_id})
+        await self.presence_join(room_id)
+        if last_seen:
+            await self.replay_missed(room_id, last_seen)
+
+    async def unsubscribe(self, room_id):
+        if room_id in self.rooms:
+            self.rooms.discard(room_id)
+            await self.channel_layer.group_discard(_group_name(room_id), self.channel_name)
+            await self.presence_leave(room_id)
+        await self.send_json({'type': 'unsubscribed', 'room_id': room_id})
+
+    async def chat_message(self, event):
+        await self.enqueue_frame(
+            {'type': 'message', 'room_id': event['room_id'], **event['message']}, room_id=event['room_id'],
         )
+
+    async def send_json(self, payload):
+        await self.enqueue_frame(payload)
+
+    async def send_error(self, room_id, code, error):
+        await self.send_json({'type': 'error', 'room_id': room_id, 'code': code, 'error': error})
+
+    @database_sync_to_async
+    def check_access(self, user, room_id):
+        return _has_room_access(user, room_id)
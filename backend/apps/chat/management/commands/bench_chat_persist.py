@@ -0,0 +1,98 @@
+"""
+Throughput of the two chat persistence paths, as ChatConsumer.receive sees them.
+
+    python manage.py bench_chat_persist --messages 5000 --concurrency 100
+
+  sync         Message INSERT through database_sync_to_async (one per message),
+               i.e. what every receive() waits on before broadcasting today.
+  write-behind XADD to the Redis stream (what receive() waits on with
+               CHAT['WRITE_BEHIND_ENABLED']), then flush_stream() draining the
+               backlog into Postgres with bulk_create.
+
+Needs the configured Postgres and Redis. Creates a throwaway room and two
+users and deletes them afterwards.
+"""
+
+import asyncio
+import statistics
+import time
+import uuid
+
+from channels.db import database_sync_to_async
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Benchmark synchronous vs write-behind chat message persistence.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **opts):
+        from apps.users.models import User
+        from apps.chat.models import ChatRoom
+
+        tag = uuid.uuid4().hex[:8]
+        sender = User.objects.create_user(
+            email=f'bench-{tag}-a@example.com', first_name='Bench', last_name='Sender', user_type='client',
+        )
+        other = User.objects.create_user(
+            email=f'bench-{tag}-b@example.com', first_name='Bench', last_name='Peer', user_type='hauler',
+        )
+        room = ChatRoom.objects.create()
+        try:
+            sync = asyncio.run(self._run(self._sync_one(sender, room), opts))
+            enqueue = asyncio.run(self._run(self._enqueue_one(sender, room), opts))
+
+            from apps.chat.writebehind import flush_stream
+            started = time.perf_counter()
+            flushed = flush_stream()
+            flush_secs = time.perf_counter() - started
+        finally:
+            room.delete()
+            User.objects.filter(id__in=[sender.id, other.id]).delete()
+
+        self.stdout.write(f"{'path':<24}{'msg/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, (rate, p50, p99) in (('sync INSERT', sync), ('write-behind XADD', enqueue)):
+            self.stdout.write(f'{name:<24}{rate:>10.0f}{p50:>10.2f}{p99:>10.2f}')
+        self.stdout.write(
+            f'write-behind flush: {flushed} rows in {flush_secs:.2f}s '
+            f'({flushed / flush_secs if flush_secs else 0:.0f} rows/s)'
+        )
+
+    async def _run(self, one, opts):
+        total, concurrency = opts['messages'], opts['concurrency']
+        latencies = []
+        sem = asyncio.Semaphore(concurrency)
+
+        async def worker(i):
+            async with sem:
+                t0 = time.perf_counter()
+                await one(i)
+                latencies.append(time.perf_counter() - t0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return total / elapsed, statistics.median(latencies) * 1000, p99 * 1000
+
+    def _sync_one(self, sender, room):
+        from apps.chat.models import Message
+
+        @database_sync_to_async
+        def one(i):
+            Message.objects.create(chat_room_id=room.id, sender=sender, content=f'sync {i}')
+        return one
+
+    def _enqueue_one(self, sender, room):
+        from apps.chat.consumers import _message_payload
+        from apps.chat.writebehind import append_message
+
+        async def one(i):
+            message = _message_payload(sender, uuid.uuid4(), f'write-behind {i}', timezone.now(), False)
+            await append_message(room.id, message)
+        return one
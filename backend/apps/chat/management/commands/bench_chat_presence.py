@@ -0,0 +1,137 @@
+"""
+Cost of typing/presence events on ChatConsumer: DB queries and channel-layer
+traffic while every client hammers the socket with typing and heartbeat frames.
+
+    python manage.py bench_chat_presence --rooms 50 --seconds 10
+
+Each room gets two in-process clients (WebsocketCommunicator). For --seconds
+every client sends typing=true every --typing-ms and a presence heartbeat
+every --heartbeat-ms, then disconnects. Reported:
+
+  DB queries      during the whole run (room access checks are stubbed out,
+                  so anything counted here comes from the presence path)
+  group_send      per event type, and per connection-second against the
+                  ceiling the throttles allow
+
+Needs the configured channel layer and Redis; no database rows are created.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from apps.chat.consumers import ChatConsumer
+
+
+class _BenchConsumer(ChatConsumer):
+    async def check_access(self, user, room_id):
+        return True
+
+
+class Command(BaseCommand):
+    help = 'Measure DB and channel-layer load of chat typing/presence events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=50)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--typing-ms', type=int, default=100)
+        parser.add_argument('--heartbeat-ms', type=int, default=500)
+
+    def handle(self, *args, **opts):
+        from apps.users.models import User
+
+        queries = Counter()
+
+        def count(execute, sql, params, many, context):
+            queries['total'] += 1
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # Fires again each time a closed connection object reconnects
+            if count not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count)
+
+        for conn in connections.all():
+            conn.execute_wrappers.append(count)
+        connection_created.connect(install)
+
+        layer = get_channel_layer()
+        sends = Counter()
+        group_send = layer.group_send
+
+        async def counting_group_send(group, message):
+            sends[message['type']] += 1
+            return await group_send(group, message)
+
+        layer.group_send = counting_group_send
+        try:
+            received = asyncio.run(self._run(User, opts))
+        finally:
+            layer.group_send = group_send
+            connection_created.disconnect(install)
+            for conn in connections.all():
+                if count in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(count)
+
+        clients = opts['rooms'] * 2
+        conn_secs = clients * opts['seconds']
+        throttle = settings.CHAT.get('TYPING_THROTTLE_SECONDS', 3)
+        typing_sent = conn_secs * 1000 / opts['typing_ms']
+        heartbeats_sent = conn_secs * 1000 / opts['heartbeat_ms']
+
+        self.stdout.write(f"{clients} clients in {opts['rooms']} rooms for {opts['seconds']:.0f}s")
+        self.stdout.write(f'  frames in:        {typing_sent:.0f} typing, {heartbeats_sent:.0f} presence heartbeats')
+        self.stdout.write(f"  DB queries:       {queries['total']}")
+        ceiling = clients * (int(opts['seconds'] // throttle) + 1)
+        self.stdout.write(f"  group_send typing:   {sends['chat_typing']} (throttle ceiling {ceiling}, "
+                          f"{sends['chat_typing'] / conn_secs:.2f}/conn/s)")
+        self.stdout.write(f"  group_send presence: {sends['chat_presence']} "
+                          f"(online + offline transitions; {clients * 2} expected)")
+        self.stdout.write(f'  frames out:       {received}')
+
+    async def _run(self, User, opts):
+        stop_at = time.monotonic() + opts['seconds']
+        received = Counter()
+
+        async def client(room_id):
+            user = User(id=uuid.uuid4(), first_name='Bench', last_name='User', user_type='client')
+            comm = WebsocketCommunicator(_BenchConsumer.as_asgi(), f'/ws/chat/{room_id}/')
+            comm.scope['user'] = user
+            comm.scope['url_route'] = {'kwargs': {'room_id': room_id}}
+            connected, _ = await comm.connect()
+            assert connected
+
+            async def drain():
+                # A receive timeout would cancel the consumer, so wait until cancelled instead
+                while True:
+                    frame = json.loads(await comm.receive_from(timeout=3600))
+                    if frame.get('type') == 'ping':
+                        await comm.send_to(text_data=json.dumps({'type': 'pong', 'seq': frame['seq']}))
+                        continue
+                    received[frame.get('type', 'message')] += 1
+
+            reader = asyncio.ensure_future(drain())
+            next_typing = next_beat = time.monotonic()
+            while (now := time.monotonic()) < stop_at:
+                if now >= next_typing:
+                    await comm.send_to(text_data=json.dumps({'type': 'typing', 'is_typing': True}))
+                    next_typing += opts['typing_ms'] / 1000
+                if now >= next_beat:
+                    await comm.send_to(text_data=json.dumps({'type': 'presence'}))
+                    next_beat += opts['heartbeat_ms'] / 1000
+                await asyncio.sleep(min(next_typing, next_beat) - now)
+            await comm.disconnect()
+            reader.cancel()
+
+        rooms = [str(uuid.uuid4()) for _ in range(opts['rooms'])]
+        await asyncio.gather(*(client(room) for room in rooms for _ in range(2)))
+        return dict(received)
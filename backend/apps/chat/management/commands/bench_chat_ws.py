@@ -0,0 +1,336 @@
+"""
+Load test for the chat WebSocket stack.
+
+    python manage.py bench_chat_ws --clients 500 --rooms 100 --rate 500 --seconds 20
+    python manage.py bench_chat_ws --in-memory-layer            # no Redis channel layer
+    python manage.py bench_chat_ws --url ws://127.0.0.1:8000 --server-pid 1234
+
+Creates --rooms throwaway chat rooms (one client + one hauler each, deleted
+afterwards) and opens --clients authenticated sockets to ws/chat/<room_id>/,
+spread evenly over the rooms. Then a driver sends --rate messages/second for
+--seconds, round-robin over the sockets, and every socket timestamps what it
+receives.
+
+By default sockets talk to config.asgi.application in this process through
+channels.testing.WebsocketCommunicator, so JWT auth, routing, moderation and
+persistence all run for real. With --url they connect to a running daphne
+(or any ASGI server) over TCP using autobahn, which daphne already depends on.
+
+Reported:
+  connect latency        handshake incl. JWT lookup and room access check
+  fan-out latency        send -> receipt on every socket in the room (p50/p95/p99/max)
+  delivered              receipts / (messages x sockets in the room)
+  DB queries per message queries run while messages flow (in-process only)
+  memory per connection  RSS growth across the connect phase; in-process this
+                         includes the test client's own per-socket state, with
+                         --server-pid it is the server process alone
+
+--json PATH writes the same numbers for tracking regressions between runs.
+"""
+
+import asyncio
+import gc
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.utils import timezone
+
+
+def _rss_kb(pid):
+    with open(f'/proc/{pid}/status') as fh:
+        for line in fh:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, int(len(values) * q))]
+    return {
+        'p50': statistics.median(values), 'p95': at(0.95), 'p99': at(0.99), 'max': values[-1],
+    }
+
+
+class _InProcessClient:
+    def __init__(self, path):
+        from channels.testing import WebsocketCommunicator
+        from config.asgi import application
+        self.comm = WebsocketCommunicator(application, path)
+
+    async def connect(self):
+        connected, _ = await self.comm.connect(timeout=30)
+        return connected
+
+    async def send(self, text):
+        await self.comm.send_to(text_data=text)
+
+    async def receive(self):
+        # A timeout here would cancel the application; readers are cancelled instead
+        return await self.comm.receive_from(timeout=3600)
+
+    async def close(self):
+        await self.comm.disconnect()
+
+
+class _TcpClient:
+    """Same interface over a real socket (autobahn asyncio client)."""
+
+    def __init__(self, url):
+        self.url = url
+        self.queue = asyncio.Queue()
+        self.protocol = None
+
+    async def connect(self):
+        from autobahn.asyncio.websocket import WebSocketClientFactory, WebSocketClientProtocol
+
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        queue = self.queue
+
+        class Protocol(WebSocketClientProtocol):
+            def onOpen(self):
+                if not opened.done():
+                    opened.set_result(True)
+
+            def onMessage(self, payload, is_binary):
+                queue.put_nowait(payload.decode())
+
+            def onClose(self, was_clean, code, reason):
+                if not opened.done():
+                    opened.set_result(False)
+
+        factory = WebSocketClientFactory(self.url)
+        factory.protocol = Protocol
+        _, self.protocol = await loop.create_connection(
+            factory, factory.host, factory.port, ssl=factory.isSecure or None,
+        )
+        return await asyncio.wait_for(opened, 30)
+
+    async def send(self, text):
+        self.protocol.sendMessage(text.encode())
+
+    async def receive(self):
+        return await self.queue.get()
+
+    async def close(self):
+        if self.protocol is not None:
+            self.protocol.sendClose()
+
+
+class Command(BaseCommand):
+    help = 'Load-test chat WebSockets in-process or against a running ASGI server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Sockets to open.')
+        parser.add_argument('--rooms', type=int, default=50, help='Rooms to spread the sockets over.')
+        parser.add_argument('--rate', type=float, default=200, help='Messages per second, all rooms together.')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--connect-concurrency', type=int, default=50)
+        parser.add_argument('--url', help='ws://host:port of a running server instead of in-process.')
+        parser.add_argument('--server-pid', type=int, help='PID of that server, for memory per connection.')
+        parser.add_argument('--in-memory-layer', action='store_true',
+                            help='Use InMemoryChannelLayer (in-process only).')
+        parser.add_argument('--json', help='Also write the results to this file.')
+
+    def handle(self, *args, **opts):
+        if opts['clients'] < opts['rooms']:
+            raise CommandError('--clients must be at least --rooms.')
+        if opts['in_memory_layer'] and opts['url']:
+            raise CommandError('--in-memory-layer only applies to in-process runs.')
+
+        rooms, users = self._create_rooms(opts['rooms'])
+        queries = Counter()
+
+        def count(execute, sql, params, many, context):
+            queries['total'] += 1
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # Fires again each time a closed connection object reconnects
+            if count not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count)
+
+        for conn in connections.all():
+            conn.execute_wrappers.append(count)
+        connection_created.connect(install)
+
+        layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        try:
+            if opts['in_memory_layer']:
+                with override_settings(CHANNEL_LAYERS=layers):
+                    results = asyncio.run(self._run(rooms, queries, opts))
+            else:
+                results = asyncio.run(self._run(rooms, queries, opts))
+        finally:
+            connection_created.disconnect(install)
+            for conn in connections.all():
+                if count in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(count)
+            self._cleanup(rooms, users)
+
+        self._report(results, opts)
+        if opts['json']:
+            with open(opts['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def _create_rooms(self, n):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from apps.chat.models import ChatRoom
+        from apps.jobs.models import Job, JobApplication
+        from apps.users.models import User
+
+        tag = uuid.uuid4().hex[:8]
+        rooms, users = [], []
+        for i in range(n):
+            client = User.objects.create_user(
+                email=f'wsbench-{tag}-{i}-c@example.com', first_name='Bench', last_name='Client', user_type='client',
+            )
+            hauler = User.objects.create_user(
+                email=f'wsbench-{tag}-{i}-h@example.com', first_name='Bench', last_name='Hauler', user_type='hauler',
+            )
+            job = Job.objects.create(
+                client=client, title='WS bench', description='-', category='other', budget=Decimal('1'),
+                country='US', city='Bench', scheduled_date=timezone.now(),
+            )
+            application = JobApplication.objects.create(job=job, hauler=hauler, proposal_message='-')
+            room = ChatRoom.objects.create(application=application)
+            rooms.append((str(room.id), [str(AccessToken.for_user(client)), str(AccessToken.for_user(hauler))]))
+            users += [client.id, hauler.id]
+        return rooms, users
+
+    def _cleanup(self, rooms, users):
+        from apps.chat.models import ChatRoom
+        from apps.users.models import User
+        from config.redis_client import get_redis
+
+        room_ids = [room_id for room_id, _ in rooms]
+        ChatRoom.objects.filter(id__in=room_ids).delete()
+        User.objects.filter(id__in=users).delete()
+        try:
+            get_redis().delete(*[f'chat:{kind}:{room_id}' for room_id in room_ids for kind in ('recent', 'presence')])
+        except Exception as exc:  # Redis may be absent on an in-memory run
+            self.stderr.write(f'Could not clear Redis chat keys: {exc}')
+
+    async def _run(self, rooms, queries, opts):
+        n, url = opts['clients'], opts['url']
+        pid = opts['server_pid'] or (None if url else os.getpid())
+
+        # Socket i joins room i % rooms, alternating between the room's two users
+        sockets = []
+        for i in range(n):
+            room_id, tokens = rooms[i % len(rooms)]
+            path = f'/ws/chat/{room_id}/?token={tokens[(i // len(rooms)) % 2]}'
+            sockets.append((room_id, _TcpClient(url.rstrip('/') + path) if url else _InProcessClient(path)))
+        per_room = Counter(room_id for room_id, _ in sockets)
+
+        gc.collect()
+        rss_before = _rss_kb(pid) if pid else None
+        connect_latencies = []
+        failed = 0
+        sem = asyncio.Semaphore(opts['connect_concurrency'])
+
+        async def open_socket(client):
+            nonlocal failed
+            async with sem:
+                t0 = time.perf_counter()
+                if await client.connect():
+                    connect_latencies.append(time.perf_counter() - t0)
+                else:
+                    failed += 1
+
+        connect_started = time.perf_counter()
+        await asyncio.gather(*(open_socket(client) for _, client in sockets))
+        connect_secs = time.perf_counter() - connect_started
+        gc.collect()
+        rss_after = _rss_kb(pid) if pid else None
+        if failed:
+            raise CommandError(f'{failed} of {n} sockets failed to connect.')
+
+        fanout = []
+        received = Counter()
+
+        async def read(client):
+            while True:
+                frame = json.loads(await client.receive())
+                if frame.get('type') == 'ping':
+                    await client.send(json.dumps({'type': 'pong', 'seq': frame['seq']}))
+                    continue
+                if frame.get('type', 'message') != 'message':
+                    continue
+                parts = frame.get('content', '').split(':')
+                if len(parts) == 3 and parts[0] == 'bench':
+                    fanout.append((time.perf_counter_ns() - int(parts[2])) / 1e6)
+                    received['messages'] += 1
+
+        readers = [asyncio.ensure_future(read(client)) for _, client in sockets]
+
+        queries_before = queries['total']
+        sent = expected = 0
+        interval = 1 / opts['rate']
+        started = time.perf_counter()
+        stop_at = started + opts['seconds']
+        next_at = started
+        while time.perf_counter() < stop_at:
+            room_id, client = sockets[sent % n]
+            await client.send(json.dumps({'content': f'bench:{sent}:{time.perf_counter_ns()}'}))
+            sent += 1
+            expected += per_room[room_id]
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        send_secs = time.perf_counter() - started
+
+        # Let in-flight deliveries land
+        deadline = time.perf_counter() + 10
+        while received['messages'] < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        message_queries = queries['total'] - queries_before
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        await asyncio.gather(*(client.close() for _, client in sockets), return_exceptions=True)
+
+        return {
+            'mode': 'tcp' if url else 'in-process',
+            'clients': n,
+            'rooms': len(rooms),
+            'connect_seconds': connect_secs,
+            'connect_ms': {k: v * 1000 for k, v in _percentiles(connect_latencies).items()},
+            'messages_sent': sent,
+            'send_rate': sent / send_secs,
+            'deliveries_expected': expected,
+            'deliveries_received': received['messages'],
+            'fanout_ms': _percentiles(fanout),
+            'db_queries_per_message': None if url else message_queries / max(sent, 1),
+            'rss_per_connection_kb': None if rss_before is None else (rss_after - rss_before) / n,
+        }
+
+    def _report(self, r, opts):
+        def ms(d):
+            return ' '.join(f'{k} {v:.1f}' for k, v in d.items()) or '-'
+
+        self.stdout.write(f"{r['mode']}: {r['clients']} sockets in {r['rooms']} rooms")
+        self.stdout.write(f"  connect        {r['connect_seconds']:.2f}s total; ms {ms(r['connect_ms'])}")
+        self.stdout.write(f"  sent           {r['messages_sent']} messages at {r['send_rate']:.0f}/s "
+                          f"(target {opts['rate']:.0f}/s)")
+        self.stdout.write(f"  delivered      {r['deliveries_received']}/{r['deliveries_expected']}")
+        self.stdout.write(f"  fan-out        ms {ms(r['fanout_ms'])}")
+        if r['db_queries_per_message'] is not None:
+            self.stdout.write(f"  DB queries     {r['db_queries_per_message']:.2f} per message")
+        if r['rss_per_connection_kb'] is not None:
+            self.stdout.write(f"  memory         {r['rss_per_connection_kb']:.1f} KiB RSS per connection")
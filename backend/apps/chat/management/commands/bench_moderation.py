@@ -0,0 +1,122 @@
+"""
+Micro-benchmark: solicitation matcher vs the original three-regex filter.
+
+    python manage.py bench_moderation --messages 20000 --keywords 500
+
+Two scenarios over the same synthetic chat corpus (~5% of messages carry a
+payment keyword, phone number or email):
+
+  shipped rules   the rules file as deployed vs the three regexes that used to
+                  live in apps.chat.consumers (also reports disagreements)
+  grown list      --keywords synthetic multilingual terms, compiled the old way
+                  (one big \\b(a|b|...)\\b alternation + phone + email, three
+                  searches) vs RegexTrieMatcher
+
+No database or Redis needed.
+"""
+
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.chat.moderation import RegexTrieMatcher, load_matcher
+
+# The filter as it was before apps.chat.moderation, kept as the baseline.
+_LEGACY_PAYMENT_KEYWORDS = re.compile(
+    r'\b(venmo|paypal|pay pal|zelle|cashapp|cash app|wise|western union|'
+    r'wire transfer|bank transfer|interac|revolut|monzo|chime)\b',
+    re.IGNORECASE,
+)
+_LEGACY_PHONE_RE = re.compile(r'(\+?1?\s?\(?\d{3}\)?[\s.\-]\d{3}[\s.\-]\d{4})')
+_LEGACY_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b')
+
+_WORDS = (
+    'hi hello the couch sofa boxes stairs floor elevator tomorrow morning at around can you bring a '
+    'dolly straps truck van price quote ok sounds good thanks see you then parking is on the street '
+    'ще дойда утре сутринта имам кашони диван етаж асансьор der umzug kommt morgen um neun uhr '
+    'la mudanza es mañana el sofá no cabe por la puerta'
+).split()
+_HITS = ['paypal me', 'send it by western union', 'my cell 555-123-4567', 'mail me at joe@example.com']
+_SYLLABLES = 'ka lo mi pe ru sa te vo zu ба ве го да жи ку ле му на по ри су тя über straß ña ção'.split()
+
+
+def _corpus(n, rng, hits):
+    messages = []
+    for _ in range(n):
+        words = rng.choices(_WORDS, k=rng.randint(4, 30))
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(hits))
+        messages.append(' '.join(words))
+    return messages
+
+
+def _synthetic_terms(n, rng):
+    terms = set()
+    while len(terms) < n:
+        word = ''.join(rng.choices(_SYLLABLES, k=rng.randint(2, 4)))
+        terms.add(word if rng.random() < 0.8 else f'{word} {rng.choice(_SYLLABLES)}{rng.choice(_SYLLABLES)}')
+    return sorted(terms)
+
+
+def _time(fn, messages, repeat):
+    best = float('inf')
+    flagged = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        flagged = sum(1 for m in messages if fn(m))
+        best = min(best, time.perf_counter() - t0)
+    return best, flagged
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the chat solicitation matcher against the legacy regex filter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=20000)
+        parser.add_argument('--keywords', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+        n, repeat = opts['messages'], opts['repeat']
+
+        def legacy(text):
+            return bool(
+                _LEGACY_PAYMENT_KEYWORDS.search(text)
+                or _LEGACY_PHONE_RE.search(text)
+                or _LEGACY_EMAIL_RE.search(text)
+            )
+
+        shipped = load_matcher()
+        corpus = _corpus(n, rng, _HITS)
+        disagreements = sum(1 for m in corpus if legacy(m) != (shipped.match(m) is not None))
+        self._report('shipped rules', n, [
+            ('legacy 3 regexes', *_time(legacy, corpus, repeat)),
+            ('RegexTrieMatcher', *_time(shipped.match, corpus, repeat)),
+        ])
+        self.stdout.write(f'  disagreements with legacy filter: {disagreements}\n')
+
+        terms = _synthetic_terms(opts['keywords'], rng)
+        grown_corpus = _corpus(n, rng, _HITS + rng.sample(terms, 20))
+        naive_kw = re.compile(r'\b(' + '|'.join(map(re.escape, terms)) + r')\b', re.IGNORECASE)
+
+        def naive(text):
+            return bool(naive_kw.search(text) or _LEGACY_PHONE_RE.search(text) or _LEGACY_EMAIL_RE.search(text))
+
+        grown = RegexTrieMatcher(
+            {'synthetic': terms},
+            {'phone': _LEGACY_PHONE_RE.pattern, 'email': _LEGACY_EMAIL_RE.pattern},
+        )
+        self._report(f'grown list ({len(terms)} keywords)', n, [
+            ('flat alternation', *_time(naive, grown_corpus, repeat)),
+            ('RegexTrieMatcher', *_time(grown.match, grown_corpus, repeat)),
+        ])
+
+    def _report(self, title, n, rows):
+        self.stdout.write(f'{title} — {n} messages')
+        self.stdout.write(f"  {'matcher':<20}{'msg/s':>12}{'us/msg':>10}{'flagged':>10}")
+        for name, secs, flagged in rows:
+            self.stdout.write(f'  {name:<20}{n / secs:>12.0f}{secs / n * 1e6:>10.2f}{flagged:>10}')
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-19 14:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_is_flagged'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='sent_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_message_sent_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='flag_reason',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
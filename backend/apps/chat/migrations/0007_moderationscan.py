@@ -0,0 +1,29 @@
+# Generated by Django 4.2.9 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_message_flag_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rules_version', models.CharField(max_length=64, unique=True)),
+                ('last_message_id', models.UUIDField(blank=True, null=True)),
+                ('scanned_count', models.BigIntegerField(default=0)),
+                ('flagged_count', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
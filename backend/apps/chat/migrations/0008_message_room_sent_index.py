@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_moderationscan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'sent_at', 'id'], name='chat_msg_room_sent_idx'),
+        ),
+    ]
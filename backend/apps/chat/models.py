@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class ChatRoom(models.Model):
@@ -32,13 +33,43 @@ class Message(models.Model):
         related_name='sent_messages'
     )
     content = models.TextField()
-    sent_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: the write-behind path assigns sent_at in the consumer and
+    # bulk_create must keep it.
+    sent_at = models.DateTimeField(default=timezone.now)
     is_read = models.BooleanField(default=False)
     # Set by keyword filter when off-platform solicitation patterns are detected
     is_flagged = models.BooleanField(default=False)
+    # Moderation rule that flagged the message ('user_report' for manual reports)
+    flag_reason = models.CharField(max_length=50, blank=True)
 
     class Meta:
         ordering = ['sent_at']
+        indexes = [
+            # Room history and reconnect backfill (apps.chat.backfill) walk (sent_at, id)
+            models.Index(fields=['chat_room', 'sent_at', 'id'], name='chat_msg_room_sent_idx'),
+        ]
 
     def __str__(self):
         return f'{self.sender.full_name}: {self.content[:50]}'
+
+
+class ModerationScan(models.Model):
+    """
+    Checkpoint for the retroactive re-scan of Message rows against one version
+    of the solicitation rules (apps.chat.tasks.rescan_messages).
+    """
+    rules_version = models.CharField(max_length=64, unique=True)
+    # Keyset position: every message with a smaller pk has been scanned
+    last_message_id = models.UUIDField(null=True, blank=True)
+    scanned_count = models.BigIntegerField(default=0)
+    flagged_count = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        state = 'done' if self.finished_at else 'in progress'
+        return f'Moderation scan {self.rules_version} ({state}, {self.scanned_count} scanned)'
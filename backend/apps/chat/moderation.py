@@ -0,0 +1,159 @@
+"""
+Off-platform solicitation matcher for chat messages.
+
+Rules live in a JSON data file (CHAT['MODERATION_RULES_FILE'], default
+apps/chat/data/solicitation_rules.json):
+
+    {
+      "keywords": {"<rule>": ["term", ...], ...},   # whole words/phrases, any language
+      "patterns": {"<rule>": "<regex>", ...}        # run against the normalized text
+    }
+
+Every keyword is folded into one trie-shaped alternation and combined with the
+patterns into a single compiled regex, so a message is scanned once however
+many terms there are. Text and keywords go through the same normalization
+(NFKC, casefold, zero-width characters dropped, whitespace collapsed), which
+also catches full-width letters/digits and odd casing.
+
+get_matcher() returns the process-wide matcher and rebuilds it when the rules
+file changes on disk (checked at most every MODERATION_RULES_RELOAD_SECONDS).
+CHAT['MODERATION_MATCHER'] swaps the implementation: any class with a
+from_rules(rules) constructor and a match(text) method.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_FILE = Path(__file__).resolve().parent / 'data' / 'solicitation_rules.json'
+
+SolicitationMatch = namedtuple('SolicitationMatch', ['rule', 'term'])
+
+_ZERO_WIDTH = re.compile('[\u200b\u200c\u200d\u2060\ufeff\u00ad]')
+
+
+def normalize(text: str) -> str:
+    # ASCII is already NFKC and has no zero-width characters; most chat is ASCII
+    if not text.isascii():
+        if not unicodedata.is_normalized('NFKC', text):
+            text = unicodedata.normalize('NFKC', text)
+        text = _ZERO_WIDTH.sub('', text)
+    return ' '.join(text.casefold().split())
+
+
+def _trie_pattern(words):
+    """Regex source matching exactly `words`, with shared prefixes factored out."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        optional = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if optional else group
+
+    return build(trie)
+
+
+class RegexTrieMatcher:
+    """Single-pass matcher: one compiled regex for all keywords and patterns."""
+
+    def __init__(self, keywords, patterns):
+        # term -> rule; first rule listing a term wins
+        self.terms = {}
+        for rule, words in keywords.items():
+            for word in words:
+                term = normalize(word)
+                if term:
+                    self.terms.setdefault(term, rule)
+
+        # group name -> rule name (rule names need not be valid identifiers)
+        self.groups = {}
+        parts = []
+        if self.terms:
+            parts.append(rf'(?P<kw>(?<!\w){_trie_pattern(self.terms)}(?!\w))')
+        for i, (rule, source) in enumerate(patterns.items()):
+            name = f'p{i}'
+            self.groups[name] = rule
+            parts.append(f'(?P<{name}>{source})')
+        self.regex = re.compile('|'.join(parts), re.IGNORECASE) if parts else None
+
+    @classmethod
+    def from_rules(cls, rules):
+        return cls(rules.get('keywords', {}), rules.get('patterns', {}))
+
+    def match(self, text: str):
+        """Return the leftmost SolicitationMatch in `text`, or None."""
+        if self.regex is None or not text:
+            return None
+        m = self.regex.search(normalize(text))
+        if m is None:
+            return None
+        if m.lastgroup == 'kw':
+            term = m.group('kw')
+            return SolicitationMatch(self.terms[term], term)
+        return SolicitationMatch(self.groups[m.lastgroup], m.group(m.lastgroup))
+
+
+def _cfg(key, default):
+    return settings.CHAT.get(key, default)
+
+
+def _rules_path():
+    return Path(_cfg('MODERATION_RULES_FILE', None) or DEFAULT_RULES_FILE)
+
+
+def load_matcher(path=None):
+    """Build a matcher from a rules file. The result carries a `version` (content hash)."""
+    raw = Path(path or _rules_path()).read_bytes()
+    matcher_cls = import_string(_cfg('MODERATION_MATCHER', 'apps.chat.moderation.RegexTrieMatcher'))
+    matcher = matcher_cls.from_rules(json.loads(raw))
+    matcher.version = hashlib.sha256(raw).hexdigest()[:12]
+    return matcher
+
+
+_lock = threading.Lock()
+_state = {'matcher': None, 'mtime': None, 'next_check': 0.0}
+
+
+def get_matcher():
+    """Process-wide matcher, rebuilt when the rules file's mtime changes."""
+    now = time.monotonic()
+    if _state['matcher'] is not None and now < _state['next_check']:
+        return _state['matcher']
+
+    with _lock:
+        if _state['matcher'] is not None and now < _state['next_check']:
+            return _state['matcher']
+        path = _rules_path()
+        try:
+            mtime = path.stat().st_mtime_ns
+            if _state['matcher'] is None or mtime != _state['mtime']:
+                _state['matcher'] = load_matcher(path)
+                _state['mtime'] = mtime
+        except (OSError, ValueError, re.error):
+            if _state['matcher'] is None:
+                raise
+            # Keep serving the previous rules rather than dropping moderation
+            logger.exception('Could not reload solicitation rules from %s', path)
+        _state['next_check'] = now + _cfg('MODERATION_RULES_RELOAD_SECONDS', 30)
+    return _state['matcher']
@@ -0,0 +1,118 @@
+"""
+Room presence kept in Redis only — no Postgres reads or writes.
+
+Each room has one hash, chat:presence:<room_id>, with a field per open
+connection ("<user_id>|<channel_name>") whose value is the connection's
+expiry in epoch milliseconds. Connections refresh their field with
+heartbeats; the hash itself carries a TTL of PRESENCE_TTL_SECONDS, so a room
+whose sockets all vanish without a disconnect (worker crash) cleans itself up.
+
+A user is online in a room while at least one of their fields is unexpired.
+join()/leave() report whether the call flipped that state, so consumers only
+broadcast on real transitions — heartbeats and second tabs cost one Redis
+round trip and no channel-layer traffic.
+
+They also prune expired fields, and report the other users that left no live
+connection behind (a socket whose worker died without a disconnect), so the
+caller can broadcast them as offline. Every live connection in the room
+heartbeats, so such a user goes offline for the others within about one
+heartbeat interval of their last connection expiring. The script runs
+atomically, so each expiry is reported to exactly one caller.
+"""
+
+import time
+
+from django.conf import settings
+
+from config.redis_client import get_async_redis
+
+# KEYS[1] presence hash; ARGV: user_id, field, now_ms, ttl_ms, mode ('join' | 'leave')
+# Returns {changed, expired user ids...}: changed is 1 when the caller's online
+# state changed, else 0; the rest are other users whose last field just expired.
+_TOUCH = """
+local key, user, field = KEYS[1], ARGV[1], ARGV[2]
+local now, ttl, mode = tonumber(ARGV[3]), tonumber(ARGV[4]), ARGV[5]
+local prefix = user .. '|'
+local self_live, others_live = false, false
+local live, expired = {}, {}
+local entries = redis.call('HGETALL', key)
+for i = 1, #entries, 2 do
+  local f, expires = entries[i], tonumber(entries[i + 1])
+  local owner = string.match(f, '^([^|]*)|')
+  if expires <= now then
+    redis.call('HDEL', key, f)
+    expired[owner] = true
+  else
+    live[owner] = true
+    if f == field then
+      self_live = true
+    elseif string.sub(f, 1, #prefix) == prefix then
+      others_live = true
+    end
+  end
+end
+local result = {0}
+for owner in pairs(expired) do
+  if owner ~= user and not live[owner] then
+    table.insert(result, owner)
+  end
+end
+if mode == 'leave' then
+  redis.call('HDEL', key, field)
+  if not others_live then result[1] = 1 end
+  return result
+end
+redis.call('HSET', key, field, now + ttl)
+redis.call('PEXPIRE', key, ttl)
+if not (self_live or others_live) then result[1] = 1 end
+return result
+"""
+
+_script = None
+
+
+def _cfg(key, default):
+    return settings.CHAT.get(key, default)
+
+
+def _key(room_id):
+    return f'chat:presence:{room_id}'
+
+
+def _touch_script():
+    global _script
+    if _script is None:
+        _script = get_async_redis().register_script(_TOUCH)
+    return _script
+
+
+async def _touch(room_id, user_id, channel_name, mode):
+    ttl_ms = int(_cfg('PRESENCE_TTL_SECONDS', 60) * 1000)
+    changed, *expired = await _touch_script()(
+        keys=[_key(room_id)],
+        args=[str(user_id), f'{user_id}|{channel_name}', int(time.time() * 1000), ttl_ms, mode],
+    )
+    return bool(changed), expired
+
+
+async def join(room_id, user_id, channel_name):
+    """
+    Register or refresh a connection. Returns (came online, [ids of other
+    users whose last connection had expired]).
+    """
+    return await _touch(room_id, user_id, channel_name, 'join')
+
+
+async def leave(room_id, user_id, channel_name):
+    """
+    Drop a connection. Returns (no live connection left for the user in the
+    room, [ids of other users whose last connection had expired]).
+    """
+    return await _touch(room_id, user_id, channel_name, 'leave')
+
+
+async def online_users(room_id) -> set:
+    """User ids with at least one live connection in the room."""
+    now_ms = time.time() * 1000
+    entries = await get_async_redis().hgetall(_key(room_id))
+    return {field.split('|', 1)[0] for field, expires in entries.items() if float(expires) > now_ms}
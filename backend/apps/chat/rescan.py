@@ -0,0 +1,144 @@
+"""
+Retroactive re-scan of stored chat messages against the current solicitation
+rules (run by the rescan_messages Celery task).
+
+Messages are read in primary-key keyset chunks (pk > checkpoint ORDER BY pk
+LIMIT RESCAN_CHUNK_SIZE), each streamed through a server-side cursor, so no
+query or transaction stays open across chunks. Each chunk is matched in a
+process pool, hits are written with one UPDATE per rule, and the chunk's last
+pk is saved to ModerationScan in the same transaction. A run that dies or
+runs out of time resumes from that checkpoint. The checkpoint is re-read
+under a row lock before each write, so if two runs overlap (a re-queued
+chain and the daily beat), the one that finds it moved stops.
+
+One ModerationScan row exists per rules version (content hash of the rules
+file), so editing the rules starts a fresh scan and re-running an unchanged
+version is a no-op once it has finished.
+
+The scan only ever adds flags: messages that are already flagged are skipped
+and nothing is unflagged. Messages created while a scan is running were
+checked live by the consumer with the same rules, so rows that land behind
+the checkpoint (pks are random UUIDs) are not missed.
+"""
+
+import os
+import time
+from collections import defaultdict
+
+from billiard import Pool
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .moderation import _rules_path, load_matcher
+
+# Messages handed to a pool worker per task
+_BATCH_SIZE = 1000
+
+_worker_matcher = None
+
+
+def _cfg(key, default):
+    return settings.CHAT.get(key, default)
+
+
+def _init_worker(rules_path):
+    global _worker_matcher
+    _worker_matcher = load_matcher(rules_path)
+
+
+def _match_batch(rows):
+    """[(pk, content), ...] -> [(pk, rule), ...] for the rows that match."""
+    hits = []
+    for pk, content in rows:
+        found = _worker_matcher.match(content)
+        if found is not None:
+            hits.append((pk, found.rule))
+    return hits
+
+
+def _fetch_chunk(after, limit):
+    from .models import Message
+
+    qs = Message.objects.filter(is_flagged=False).order_by('pk')
+    if after is not None:
+        qs = qs.filter(pk__gt=after)
+    # Server-side cursor on Postgres: the chunk is streamed, not buffered by the driver
+    return list(qs.values_list('pk', 'content')[:limit].iterator(chunk_size=_BATCH_SIZE))
+
+
+def _apply_hits(scan, after, hits, last_pk, scanned):
+    """
+    Flag the chunk's hits and move the checkpoint from `after` to `last_pk`.
+    Returns False (and writes nothing) when another run has moved the
+    checkpoint since the chunk was read; `scan` is refreshed either way.
+    """
+    from .models import Message, ModerationScan
+
+    by_rule = defaultdict(list)
+    for pk, rule in hits:
+        by_rule[rule].append(pk)
+
+    flagged = 0
+    with transaction.atomic():
+        current = ModerationScan.objects.select_for_update().get(pk=scan.pk)
+        if current.last_message_id != after:
+            scan.refresh_from_db()
+            return False
+        for rule, pks in by_rule.items():
+            # is_flagged=False guards against a report/live flag landing in between
+            flagged += Message.objects.filter(pk__in=pks, is_flagged=False).update(
+                is_flagged=True, flag_reason=rule[:50],
+            )
+        scan.last_message_id = last_pk
+        scan.scanned_count = current.scanned_count + scanned
+        scan.flagged_count = current.flagged_count + flagged
+        scan.save(update_fields=['last_message_id', 'scanned_count', 'flagged_count', 'updated_at'])
+    return True
+
+
+def rescan_messages(time_budget=None):
+    """
+    Scan unflagged messages past the checkpoint for the current rules version.
+
+    Returns (scan, finished). Stops after `time_budget` seconds with the
+    checkpoint saved; finished is False in that case. finished is None when
+    another run on the same scan got ahead of this one: this one stops and
+    leaves the rest to it.
+    """
+    from .models import ModerationScan
+
+    rules_path = str(_rules_path())
+    version = load_matcher(rules_path).version
+    scan, _ = ModerationScan.objects.get_or_create(rules_version=version)
+    if scan.finished_at is not None:
+        return scan, True
+
+    chunk_size = _cfg('RESCAN_CHUNK_SIZE', 20000)
+    workers = _cfg('RESCAN_WORKERS', None) or os.cpu_count() or 1
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+
+    pool = Pool(workers, initializer=_init_worker, initargs=(rules_path,)) if workers > 1 else None
+    if pool is None:
+        _init_worker(rules_path)
+    try:
+        while True:
+            after = scan.last_message_id
+            rows = _fetch_chunk(after, chunk_size)
+            if not rows:
+                scan.finished_at = timezone.now()
+                scan.save(update_fields=['finished_at', 'updated_at'])
+                return scan, True
+
+            batches = [rows[i:i + _BATCH_SIZE] for i in range(0, len(rows), _BATCH_SIZE)]
+            results = pool.map(_match_batch, batches) if pool else map(_match_batch, batches)
+            hits = [hit for batch in results for hit in batch]
+            if not _apply_hits(scan, after, hits, rows[-1][0], len(rows)):
+                return scan, None
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return scan, False
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,40 @@
+from celery import shared_task
+from django.conf import settings
+
+
+@shared_task
+def flush_message_stream():
+    """
+    Bulk-insert chat messages buffered in the write-behind Redis stream.
+    Also replays entries orphaned by a worker that died mid-batch.
+    No-op unless CHAT['WRITE_BEHIND_ENABLED'] is True.
+    Runs every 5 seconds via Celery Beat.
+    """
+    if not settings.CHAT.get('WRITE_BEHIND_ENABLED'):
+        return 'Write-behind disabled — skipped.'
+
+    from .writebehind import flush_stream
+
+    written = flush_stream()
+    return f'Flushed {written} chat message(s)'
+
+
+@shared_task
+def rescan_messages():
+    """
+    Re-check stored chat messages against the current solicitation rules and
+    flag the ones that now match. Resumes from the ModerationScan checkpoint
+    and re-queues itself after CHAT['RESCAN_TIME_BUDGET_SECONDS'], so a large
+    backlog is worked through in bounded runs.
+    Does nothing once the current rules version has been fully scanned.
+    Runs daily at 1am UTC via Celery Beat.
+    """
+    from .rescan import rescan_messages as run_scan
+
+    scan, finished = run_scan(time_budget=settings.CHAT.get('RESCAN_TIME_BUDGET_SECONDS', 600))
+    if finished is None:
+        return f'Rescan {scan.rules_version}: another run is ahead — stopped'
+    if not finished:
+        rescan_messages.delay()
+        return f'Rescan {scan.rules_version}: {scan.scanned_count} scanned, {scan.flagged_count} flagged — continuing'
+    return f'Rescan {scan.rules_version} complete: {scan.scanned_count} scanned, {scan.flagged_count} flagged'
@@ -5,4 +5,5 @@ urlpatterns = [
     path('rooms/', views.chat_rooms, name='chat-rooms'),
     path('rooms/<uuid:pk>/messages/', views.room_messages, name='room-messages'),
     path('rooms/<uuid:room_pk>/messages/<uuid:message_pk>/report/', views.report_message, name='report-message'),
+    path('metrics/', views.socket_metrics, name='chat-socket-metrics'),
 ]
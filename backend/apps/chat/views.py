@@ -84,6 +84,20 @@ def report_message(request, room_pk, message_pk):
         return Response({'error': 'Message not found.'}, status=status.HTTP_404_NOT_FOUND)
 
     message.is_flagged = True
-    message.save(update_fields=['is_flagged'])
+    message.flag_reason = message.flag_reason or 'user_report'
+    message.save(update_fields=['is_flagged', 'flag_reason'])
 
     return Response({'message': 'Message reported. Our team will review it.'})
+
+
+@api_view(['GET'])
+def socket_metrics(request):
+    """
+    Admin view of chat socket health across all daphne processes: send-buffer
+    depth, overflows by policy, dropped/coalesced frames and reaped sockets.
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+    from config import metrics
+    return Response(metrics.snapshot('chat.'))
@@ -0,0 +1,195 @@
+"""
+Write-behind persistence for chat messages (CHAT['WRITE_BEHIND_ENABLED']).
+
+The consumer builds the full message itself (uuid4 id, server timestamp),
+appends it to a Redis stream and broadcasts without waiting on Postgres.
+flush_stream() — run by the flush_message_stream Celery task — reads the
+stream through a consumer group and bulk-inserts into Message.
+
+Delivery is at-least-once:
+  - entries are only XACKed (and XDELed) after their batch has committed;
+  - entries left pending by a worker that died mid-batch are re-claimed with
+    XAUTOCLAIM once they have been idle for WRITE_BEHIND_CLAIM_IDLE_MS;
+  - replays are harmless because ids are assigned up front and the insert
+    uses ON CONFLICT DO NOTHING.
+
+Messages whose room or sender has been deleted are dropped. If a batch still
+fails, its entries are retried one at a time so the good ones are written;
+an entry that keeps failing alone is moved to WRITE_BEHIND_DEAD_STREAM after
+WRITE_BEHIND_MAX_DELIVERIES deliveries instead of being retried forever.
+
+Redis must run with AOF enabled (see docker-compose.yml) for the stream to
+survive a Redis restart.
+"""
+
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from config.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _cfg(key, default):
+    return settings.CHAT.get(key, default)
+
+
+def _stream():
+    return _cfg('WRITE_BEHIND_STREAM', 'chat:messages')
+
+
+def _group():
+    return _cfg('WRITE_BEHIND_GROUP', 'chat-writers')
+
+
+async def append_message(room_id, message: dict, flag_reason='') -> str:
+    """Append a broadcast-ready message dict to the stream. Returns the entry id."""
+    fields = {'room_id': str(room_id), 'message': json.dumps(message), 'flag_reason': flag_reason}
+    return await get_async_redis().xadd(_stream(), fields)
+
+
+def _ensure_group(r):
+    try:
+        r.xgroup_create(_stream(), _group(), id='0', mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def _persist(entries):
+    """Bulk-insert one batch of stream entries. Messages for deleted rooms or senders are dropped."""
+    from django.contrib.auth import get_user_model
+    from .models import ChatRoom, Message
+
+    parsed = []
+    for _entry_id, fields in entries:
+        if not fields:  # entry was XDELed after being claimed
+            continue
+        parsed.append((fields['room_id'], json.loads(fields['message']), fields.get('flag_reason', '')))
+
+    room_ids = {room_id for room_id, _, _ in parsed}
+    live_rooms = {str(pk) for pk in ChatRoom.objects.filter(id__in=room_ids).values_list('id', flat=True)}
+    sender_ids = {str(msg['sender_id']) for _, msg, _ in parsed}
+    live_senders = {
+        str(pk) for pk in get_user_model().objects.filter(pk__in=sender_ids).values_list('pk', flat=True)
+    }
+
+    objs = [
+        Message(
+            id=msg['id'],
+            chat_room_id=room_id,
+            sender_id=msg['sender_id'],
+            content=msg['content'],
+            sent_at=datetime.fromisoformat(msg['sent_at']),
+            is_flagged=msg.get('is_flagged', False),
+            flag_reason=flag_reason,
+        )
+        for room_id, msg, flag_reason in parsed
+        if room_id in live_rooms and str(msg['sender_id']) in live_senders
+    ]
+    with transaction.atomic():
+        Message.objects.bulk_create(objs, ignore_conflicts=True)
+    return len(objs)
+
+
+def _dead_letter(r, entry_id, fields, error):
+    r.xadd(
+        _cfg('WRITE_BEHIND_DEAD_STREAM', 'chat:messages:dead'),
+        {**fields, 'entry_id': entry_id, 'error': error[:1000]},
+    )
+
+
+def _persist_each(r, consumer, entries):
+    """
+    Persist a failed batch, pending for `consumer`, entry by entry. Returns
+    (rows written, ids to ack): the entries that went in, plus any that failed
+    again after WRITE_BEHIND_MAX_DELIVERIES deliveries and were dead-lettered.
+    """
+    max_deliveries = _cfg('WRITE_BEHIND_MAX_DELIVERIES', 5)
+    deliveries = {
+        item['message_id']: item['times_delivered']
+        for item in r.xpending_range(
+            _stream(), _group(), min=entries[0][0], max=entries[-1][0], count=len(entries),
+            consumername=consumer,
+        )
+    }
+    written, done = 0, []
+    for entry_id, fields in entries:
+        try:
+            written += _persist([(entry_id, fields)])
+        except Exception as exc:
+            delivered = deliveries.get(entry_id, 1)
+            if delivered < max_deliveries:
+                continue
+            logger.error('Dead-lettering chat stream entry %s after %s deliveries', entry_id, delivered)
+            _dead_letter(r, entry_id, fields, repr(exc))
+        done.append(entry_id)
+    return written, done
+
+
+def flush_stream(max_batches=None):
+    """
+    Drain the stream into Message. Returns the number of rows handed to
+    bulk_create (replayed duplicates included).
+
+    Order of work per iteration: entries this consumer already owns (left over
+    from a crash under the same name), then stale entries of dead consumers,
+    then new entries.
+    """
+    r = get_redis()
+    _ensure_group(r)
+    stream, group = _stream(), _group()
+    consumer = f'{socket.gethostname()}-{os.getpid()}'
+    batch_size = _cfg('WRITE_BEHIND_BATCH_SIZE', 200)
+    idle_ms = _cfg('WRITE_BEHIND_CLAIM_IDLE_MS', 30000)
+
+    written = 0
+    batches = 0
+    own_pending = True
+    claim_cursor = '0-0'
+    while max_batches is None or batches < max_batches:
+        entries = []
+        if own_pending:
+            resp = r.xreadgroup(group, consumer, {stream: '0'}, count=batch_size)
+            entries = resp[0][1] if resp else []
+            own_pending = bool(entries)
+        if not entries and claim_cursor is not None:
+            claim_cursor, entries, *_ = r.xautoclaim(
+                stream, group, consumer, min_idle_time=idle_ms, start_id=claim_cursor, count=batch_size,
+            )
+            if claim_cursor == '0-0':
+                claim_cursor = None
+        if not entries:
+            resp = r.xreadgroup(group, consumer, {stream: '>'}, count=batch_size)
+            entries = resp[0][1] if resp else []
+        if not entries:
+            break
+
+        ids = [entry_id for entry_id, _ in entries]
+        try:
+            written += _persist(entries)
+        except Exception:
+            logger.warning('Chat write-behind batch of %d failed; retrying entry by entry', len(ids), exc_info=True)
+            persisted, ids = _persist_each(r, consumer, entries)
+            written += persisted
+            # What is left stays pending for a later flush (delivered again, so counted)
+            stalled = len(ids) < len(entries)
+        else:
+            stalled = False
+        if ids:
+            pipe = r.pipeline()
+            pipe.xack(stream, group, *ids)
+            pipe.xdel(stream, *ids)
+            pipe.execute()
+        batches += 1
+        if stalled:
+            break
+
+    return written
@@ -8,6 +8,7 @@ from rest_framework.decorators import api_view, permission_classes, throttle_cla
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from config.idempotency import idempotent_request
 from config.throttles import JobCreationThrottle, JobApplicationThrottle, EscrowLockThrottle
 from .models import Job, JobApplication
 from .serializers import JobSerializer, CreateJobSerializer, JobApplicationSerializer
@@ -119,6 +120,7 @@ def job_applications(request, pk):
 
 @api_view(['GET', 'PATCH'])
 @throttle_classes([EscrowLockThrottle])
+@idempotent_request
 def application_detail(request, pk):
     try:
         app = JobApplication.objects.select_related('job', 'hauler').get(id=pk)
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'handler', 'attempts', 'created_at', 'available_at', 'processed_at')
+    list_filter = ('handler',)
+    readonly_fields = ('handler', 'payload', 'created_at', 'attempts', 'last_error', 'processed_at')
+    actions = ('retry_now',)
+
+    @admin.action(description='Retry selected events now')
+    def retry_now(self, request, queryset):
+        queryset.filter(processed_at__isnull=True).update(available_at=timezone.now(), attempts=0)
@@ -0,0 +1,35 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect (email, cache write, notification) recorded in the same
+    transaction as the change that caused it, and carried out after commit
+    by the relay (apps.outbox.relay). `handler` is the dotted path of the
+    function that performs it.
+    """
+    handler = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not handed to the relay before this (retry backoff)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The relay's claim query: pending events in order
+            models.Index(
+                fields=['available_at', 'id'], name='outbox_pending_idx', condition=Q(processed_at__isnull=True),
+            ),
+            models.Index(
+                fields=['processed_at'], name='outbox_processed_idx', condition=Q(processed_at__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.handler} #{self.pk}'
@@ -0,0 +1,127 @@
+"""
+Transactional outbox for side effects of money / account-state changes.
+
+Code running inside transaction.atomic() (wallet refunds, strikes) must not
+send email or write caches inline: the I/O lengthens how long wallet row
+locks are held, and it fires even when the transaction then rolls back.
+Instead it records the side effect:
+
+    from apps.outbox.relay import enqueue
+    enqueue('apps.users.strikes.send_strike_email', {'user_id': str(user.pk), ...})
+
+enqueue() inserts an OutboxEvent in the caller's transaction (a rollback
+discards it too) and, once that commits, nudges the drain_outbox task.
+drain() claims pending events in id order, OUTBOX['BATCH_SIZE'] at a time,
+with SELECT ... FOR UPDATE SKIP LOCKED so several workers can drain in
+parallel, and calls handler(event_id, payload) for each, in a savepoint.
+Beat also runs drain_outbox every 30 seconds in case a nudge was lost.
+
+Delivery is at least once: a worker that dies after a handler ran but
+before its batch committed leaves the event to run again. Handlers must be
+idempotent — write absolute values, or wrap them in @idempotent to skip
+event ids already handled. A failing handler is retried with exponential
+backoff; after OUTBOX['MAX_ATTEMPTS'] the event is left unprocessed for an
+admin to inspect (OutboxEvent admin, "Retry"). prune() deletes processed
+events after OUTBOX['RETENTION_DAYS'].
+"""
+
+import functools
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _cfg(key, default):
+    return getattr(settings, 'OUTBOX', {}).get(key, default)
+
+
+def enqueue(handler, payload):
+    """Record `handler(event_id, payload)` to run once the current transaction commits."""
+    from .models import OutboxEvent
+
+    event = OutboxEvent.objects.create(handler=handler, payload=payload)
+    transaction.on_commit(_nudge)
+    return event
+
+
+def _nudge():
+    from .tasks import drain_outbox
+    try:
+        drain_outbox.delay()
+    except Exception:
+        # The beat schedule picks the event up instead
+        logger.warning('Could not schedule outbox drain', exc_info=True)
+
+
+def idempotent(handler):
+    """Skip an event id this handler has already completed (remembered for RETENTION_DAYS)."""
+    @functools.wraps(handler)
+    def wrapper(event_id, payload):
+        from django.core.cache import cache
+
+        key = f'outbox:done:{handler.__module__}.{handler.__name__}:{event_id}'
+        if cache.get(key):
+            return
+        handler(event_id, payload)
+        cache.set(key, 1, timeout=_cfg('RETENTION_DAYS', 7) * 86400)
+    return wrapper
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def _run_batch(now):
+    """Claim and run one batch. Returns how many events were claimed."""
+    from .models import OutboxEvent
+
+    with transaction.atomic():
+        batch = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, available_at__lte=now, attempts__lt=_cfg('MAX_ATTEMPTS', 10))
+            .order_by('available_at', 'id')[:_cfg('BATCH_SIZE', 100)]
+        )
+        done, failed = [], []
+        for event in batch:
+            try:
+                with transaction.atomic():
+                    import_string(event.handler)(event.pk, event.payload)
+            except Exception as exc:
+                logger.warning('Outbox event %s (%s) failed', event.pk, event.handler, exc_info=True)
+                event.attempts += 1
+                event.last_error = repr(exc)[:2000]
+                event.available_at = timezone.now() + _backoff(event.attempts)
+                failed.append(event)
+            else:
+                done.append(event.pk)
+        if done:
+            OutboxEvent.objects.filter(pk__in=done).update(processed_at=timezone.now())
+        if failed:
+            OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error', 'available_at'])
+    return len(batch)
+
+
+def drain(max_batches=50):
+    """Run pending events, batch by batch, until none are due. Returns how many were claimed."""
+    now = timezone.now()
+    claimed = 0
+    for _ in range(max_batches):
+        n = _run_batch(now)
+        claimed += n
+        if n < _cfg('BATCH_SIZE', 100):
+            break
+    return claimed
+
+
+def prune(now=None):
+    """Delete events processed more than RETENTION_DAYS ago. Returns how many were removed."""
+    from .models import OutboxEvent
+
+    cutoff = (now or timezone.now()) - timedelta(days=_cfg('RETENTION_DAYS', 7))
+    return OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()[0]
@@ -0,0 +1,24 @@
+"""
+Celery tasks for the outbox app.
+"""
+
+from celery import shared_task
+
+
+@shared_task
+def drain_outbox():
+    """
+    Run the side effects recorded by committed transactions (apps.outbox.relay).
+    Queued whenever an event is enqueued, and run by Celery Beat as a backstop.
+    """
+    from .relay import drain
+
+    return f'Handled {drain()} outbox event(s).'
+
+
+@shared_task
+def prune_outbox():
+    """Delete processed outbox events past their retention. Runs daily via Celery Beat."""
+    from .relay import prune
+
+    return f'Pruned {prune()} outbox event(s).'
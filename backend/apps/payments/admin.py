@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Wallet, Transaction
+from django.utils import timezone
+from .models import Wallet, Transaction, StripeEvent, StatementExport, WalletCheckpoint
 
 
 @admin.register(Wallet)
@@ -14,3 +15,39 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ('transaction_type',)
     search_fields = ('wallet__user__email', 'reference_id')
     ordering = ('-created_at',)
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'type', 'user_ref', 'attempts', 'created', 'received_at', 'processed_at')
+    list_filter = ('type',)
+    search_fields = ('id', 'user_ref')
+    readonly_fields = (
+        'id', 'type', 'user_ref', 'payload', 'created', 'received_at', 'attempts', 'last_error', 'processed_at',
+    )
+    actions = ('retry_now',)
+
+    @admin.action(description='Retry selected events now')
+    def retry_now(self, request, queryset):
+        queryset.filter(processed_at__isnull=True).update(available_at=timezone.now(), attempts=0)
+
+
+@admin.register(StatementExport)
+class StatementExportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'whole_ledger', 'output', 'since', 'until', 'status', 'rows', 'created_at')
+    list_filter = ('status', 'whole_ledger')
+    search_fields = ('user__email',)
+    readonly_fields = ('user', 'file', 'rows', 'error', 'created_at', 'finished_at')
+
+
+@admin.register(WalletCheckpoint)
+class WalletCheckpointAdmin(admin.ModelAdmin):
+    list_display = (
+        'wallet', 'available_balance', 'escrow_balance', 'reserve_balance', 'checked_at', 'drift_detected_at',
+    )
+    list_filter = ('drift_detected_at',)
+    search_fields = ('wallet__user__email',)
+    readonly_fields = (
+        'wallet', 'created_at', 'transaction_id', 'available_balance', 'escrow_balance', 'reserve_balance',
+        'checked_at', 'drift', 'drift_detected_at',
+    )
@@ -0,0 +1,219 @@
+"""
+Load test for Stripe webhook ingestion with locally signed fake events.
+
+    python manage.py fake_stripe_events --events 5000 --users 50 --duplicates 0.2 --concurrency 50
+    python manage.py fake_stripe_events --url http://localhost:8000/api/wallet/webhook/
+
+Builds --events checkout.session.completed events for --users throwaway
+users, signs them the way Stripe does (Stripe-Signature: t=...,v1=HMAC-SHA256)
+with --secret (default STRIPE_WEBHOOK_SECRET), and delivers them, plus a
+--duplicates share of redeliveries, in random order from --concurrency
+threads. Without --url the deliveries call the stripe_webhook view in
+process; with it they are POSTed to a running server.
+
+Then it waits for the events to be applied (a Celery worker must be running),
+or with --apply runs the consumer itself from --workers threads, and reports
+acknowledgement latency, apply throughput and lag, and whether each wallet
+was credited exactly once per event. The users, their wallets and the
+events are deleted afterwards unless --keep is given.
+
+Needs the configured Postgres and Redis.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import RequestFactory
+
+
+def sign(payload, secret, timestamp=None):
+    """The Stripe-Signature header Stripe would send for `payload` (str)."""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class Command(BaseCommand):
+    help = 'Deliver signed fake Stripe events to the webhook and measure ingestion and apply.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--duplicates', type=float, default=0.1, help='Share of events delivered twice.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--url', help='POST to a running server instead of calling the view in process.')
+        parser.add_argument('--secret', help='Signing secret (default: STRIPE_WEBHOOK_SECRET).')
+        parser.add_argument('--apply', action='store_true', help='Run the consumer here instead of waiting.')
+        parser.add_argument('--workers', type=int, default=4, help='Consumer threads with --apply.')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Seconds to wait for a worker.')
+        parser.add_argument('--keep', action='store_true', help='Keep the users, wallets and events.')
+
+    def handle(self, *args, **opts):
+        from apps.users.models import User
+        from apps.payments.models import Wallet, StripeEvent
+
+        tag = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create_user(
+                email=f'fake-stripe-{tag}-{i}@example.com', first_name='Fake', last_name=f'Payer {i}',
+                user_type='client',
+            )
+            for i in range(opts['users'])
+        ]
+        Wallet.objects.bulk_create([Wallet(user=user) for user in users])
+
+        events, expected = self._build(tag, users, opts['events'])
+        deliveries = list(events) + random.sample(events, int(len(events) * opts['duplicates']))
+        random.shuffle(deliveries)
+        secret = opts['secret'] if opts['secret'] is not None else settings.STRIPE_WEBHOOK_SECRET
+        ids = [json.loads(payload)['id'] for payload in events]
+        try:
+            acks, statuses, ingest_secs = self._deliver(deliveries, secret, opts)
+            stored = StripeEvent.objects.filter(id__in=ids).count()
+
+            started = time.perf_counter()
+            if opts['apply']:
+                self._apply(opts['workers'])
+            applied = self._wait(ids, opts['timeout'] if not opts['apply'] else 0)
+            apply_secs = time.perf_counter() - started
+            lag = self._apply_lag(ids)
+            exact = self._check(users, expected)
+        finally:
+            if not opts['keep']:
+                StripeEvent.objects.filter(id__in=ids).delete()
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+
+        acks.sort()
+        p99 = acks[min(len(acks) - 1, int(len(acks) * 0.99))]
+        self.stdout.write(
+            f'delivered {len(deliveries)} ({len(deliveries) - len(events)} redeliveries) in {ingest_secs:.2f}s: '
+            f'{len(deliveries) / ingest_secs:.0f}/s, ack p50 {statistics.median(acks) * 1000:.1f} ms, '
+            f'p99 {p99 * 1000:.1f} ms, statuses {dict(statuses)}'
+        )
+        self.stdout.write(f'stored {stored} of {len(events)} unique events')
+        self.stdout.write(
+            f'applied {applied} in {apply_secs:.2f}s ({applied / apply_secs if apply_secs else 0:.0f}/s), '
+            f'apply lag p50 {lag[0]:.2f}s max {lag[1]:.2f}s'
+        )
+        self.stdout.write(f'wallets credited exactly once per event: {exact} of {len(users)}')
+
+    def _build(self, tag, users, count):
+        """Event bodies (JSON, signed at delivery), and {user id: (deposits, total)} they should produce."""
+        events, expected = [], {}
+        now = int(time.time())
+        for i in range(count):
+            user = random.choice(users)
+            amount = Decimal(random.randint(100, 50000)) / 100
+            session = {
+                'id': f'cs_fake_{tag}_{i}',
+                'object': 'checkout.session',
+                'payment_intent': f'pi_fake_{tag}_{i}',
+                'metadata': {'user_id': str(user.id), 'amount': str(amount)},
+            }
+            events.append(json.dumps({
+                'id': f'evt_fake_{tag}_{i}',
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'created': now,
+                'data': {'object': session},
+            }))
+            n, total = expected.get(user.id, (0, Decimal('0')))
+            expected[user.id] = (n + 1, total + amount)
+        return events, expected
+
+    def _deliver(self, deliveries, secret, opts):
+        """Send every delivery. Returns (ack latencies, {status: n}, elapsed seconds)."""
+        from apps.payments import views
+
+        factory = RequestFactory()
+        acks, statuses, lock = [], {}, threading.Lock()
+
+        def one(payload):
+            header = sign(payload, secret)
+            t0 = time.perf_counter()
+            if opts['url']:
+                request = urllib.request.Request(
+                    opts['url'], data=payload.encode(), method='POST',
+                    headers={'Content-Type': 'application/json', 'Stripe-Signature': header},
+                )
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as response:
+                        code = response.status
+                except urllib.error.HTTPError as exc:
+                    code = exc.code
+            else:
+                request = factory.post(
+                    '/api/wallet/webhook/', data=payload, content_type='application/json',
+                    HTTP_STRIPE_SIGNATURE=header,
+                )
+                code = views.stripe_webhook(request).status_code
+            elapsed = time.perf_counter() - t0
+            if not opts['url']:
+                connection.close()
+            with lock:
+                acks.append(elapsed)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts['concurrency']) as pool:
+            list(pool.map(one, deliveries))
+        return acks, statuses, time.perf_counter() - started
+
+    def _apply(self, workers):
+        from apps.payments.webhooks import apply_pending
+
+        def one(_):
+            while apply_pending():
+                pass
+            connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(workers)))
+
+    def _wait(self, ids, timeout):
+        """Poll until every event is applied or `timeout` passes. Returns how many were applied."""
+        from apps.payments.models import StripeEvent
+
+        deadline = time.monotonic() + timeout
+        while True:
+            applied = StripeEvent.objects.filter(id__in=ids, processed_at__isnull=False).count()
+            if applied == len(ids) or time.monotonic() >= deadline:
+                return applied
+            time.sleep(0.5)
+
+    def _apply_lag(self, ids):
+        from apps.payments.models import StripeEvent
+
+        lags = sorted(
+            (processed_at - received_at).total_seconds()
+            for received_at, processed_at in StripeEvent.objects.filter(
+                id__in=ids, processed_at__isnull=False,
+            ).values_list('received_at', 'processed_at')
+        )
+        return (statistics.median(lags), lags[-1]) if lags else (0.0, 0.0)
+
+    def _check(self, users, expected):
+        """How many wallets hold exactly one deposit per event sent to them."""
+        from apps.payments.models import Transaction
+
+        found = {
+            row['wallet__user_id']: (row['n'], row['total'])
+            for row in Transaction.objects.filter(
+                wallet__user__in=users, transaction_type='deposit',
+            ).values('wallet__user_id').annotate(n=Count('id'), total=Sum('amount'))
+        }
+        return sum(1 for user in users if found.get(user.id, (0, Decimal('0'))) == expected.get(user.id, (0, 0)))
@@ -0,0 +1,52 @@
+"""
+Run the ledger reconciliation here instead of through Celery.
+
+    python manage.py reconcile_ledger --workers 4
+    python manage.py reconcile_ledger --full        # forget checkpoints, replay everything
+
+Runs every shard of apps.payments.reconcile on --workers threads, then lists
+the wallets whose stored balances disagree with their ledger.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Replay wallet ledgers and report balance drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--full', action='store_true', help='Delete checkpoints first and replay all history.')
+
+    def handle(self, *args, **opts):
+        from apps.payments.models import WalletCheckpoint
+        from apps.payments.reconcile import reconcile_shard, shards
+
+        if opts['full']:
+            WalletCheckpoint.objects.all().delete()
+
+        def one(bounds):
+            try:
+                return reconcile_shard(*bounds)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            totals = [sum(column) for column in zip(*pool.map(one, shards()))] or [0, 0, 0]
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{totals[0]} wallet(s), {totals[1]} transaction(s) replayed in {elapsed:.2f}s; {totals[2]} drifting'
+        )
+        for checkpoint in WalletCheckpoint.objects.filter(drift__isnull=False).order_by('wallet_id'):
+            drift = checkpoint.drift
+            self.stdout.write(
+                f'  wallet {checkpoint.wallet_id}: expected {drift["expected"]}, stored {drift["actual"]}, '
+                f'first divergent transaction {drift["first_divergent_transaction"]} '
+                f'(since {checkpoint.drift_detected_at:%Y-%m-%d %H:%M})'
+            )
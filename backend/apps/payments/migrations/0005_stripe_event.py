@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-19 20:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_transaction_available_at_transaction_is_processed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=100)),
+                ('user_ref', models.CharField(blank=True, max_length=64)),
+                ('payload', models.JSONField()),
+                ('created', models.DateTimeField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created', 'received_at'],
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['created', 'received_at'], name='stripe_event_pending_idx'), models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['user_ref', 'created', 'received_at'], name='stripe_event_user_pending_idx'), models.Index(condition=models.Q(('processed_at__isnull', False)), fields=['processed_at'], name='stripe_event_processed_idx')],
+            },
+        ),
+    ]
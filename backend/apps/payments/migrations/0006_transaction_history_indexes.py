@@ -0,0 +1,21 @@
+# Generated by Django 4.2.9 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_stripe_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='txn_wallet_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('is_processed', False), ('transaction_type', 'deposit')), fields=['wallet', 'available_at'], name='txn_wallet_pending_idx'),
+        ),
+    ]
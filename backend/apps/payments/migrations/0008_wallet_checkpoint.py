@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-19 22:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_statement_export'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletCheckpoint',
+            fields=[
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='checkpoint', serialize=False, to='payments.wallet')),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction_id', models.UUIDField(blank=True, null=True)),
+                ('available_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('escrow_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reserve_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('checked_at', models.DateTimeField()),
+                ('drift', models.JSONField(blank=True, null=True)),
+                ('drift_detected_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
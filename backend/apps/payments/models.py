@@ -1,6 +1,8 @@
 import uuid
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from django.utils import timezone
 
 
 class Wallet(models.Model):
@@ -44,6 +46,116 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Wallet history pages, newest first (payments.views.transactions)
+            models.Index(fields=['wallet', 'created_at', 'id'], name='txn_wallet_created_idx'),
+            # pending_balance: a wallet's deposits still on hold
+            models.Index(
+                fields=['wallet', 'available_at'], name='txn_wallet_pending_idx',
+                condition=Q(transaction_type='deposit', is_processed=False),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.transaction_type} ${self.amount} — {self.wallet.user.full_name}'
+
+
+class WalletCheckpoint(models.Model):
+    """
+    How far apps.payments.reconcile has replayed a wallet's ledger: the sums
+    of every transaction up to and including (created_at, transaction_id),
+    and any drift between the replay and the wallet's stored balances.
+    """
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, primary_key=True, related_name='checkpoint')
+    # Position of the last transaction included below; None before the first one
+    created_at = models.DateTimeField(null=True, blank=True)
+    transaction_id = models.UUIDField(null=True, blank=True)
+    available_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    escrow_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reserve_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    checked_at = models.DateTimeField()
+    # Set while the stored balances disagree with the replay: {'expected': {...},
+    # 'actual': {...}, 'first_divergent_transaction': id or None}
+    drift = models.JSONField(null=True, blank=True)
+    drift_detected_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Checkpoint for wallet {self.wallet_id}'
+
+
+class StripeEvent(models.Model):
+    """
+    A verified Stripe webhook event, recorded by the webhook views before
+    they answer and applied afterwards by apps.payments.webhooks. The primary
+    key is Stripe's event id, so a redelivered event is only stored once.
+    """
+    id = models.CharField(primary_key=True, max_length=255)
+    type = models.CharField(max_length=100)
+    # metadata.user_id of the event's object: events for one user (and so one
+    # wallet) are applied in order
+    user_ref = models.CharField(max_length=64, blank=True)
+    payload = models.JSONField()
+    # Stripe's event.created
+    created = models.DateTimeField()
+    received_at = models.DateTimeField(default=timezone.now)
+    # Not applied before this (retry backoff)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created', 'received_at']
+        indexes = [
+            # The consumer's claim query, and its check for earlier events of the same user
+            models.Index(
+                fields=['created', 'received_at'], name='stripe_event_pending_idx',
+                condition=Q(processed_at__isnull=True),
+            ),
+            models.Index(
+                fields=['user_ref', 'created', 'received_at'], name='stripe_event_user_pending_idx',
+                condition=Q(processed_at__isnull=True),
+            ),
+            models.Index(
+                fields=['processed_at'], name='stripe_event_processed_idx', condition=Q(processed_at__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.type} {self.id}'
+
+
+class StatementExport(models.Model):
+    """
+    A statement (or, for staff, whole-ledger) export written to a gzipped
+    file in the background by apps.payments.statements.
+    """
+    OUTPUT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='statement_exports')
+    # Every wallet instead of the user's own
+    whole_ledger = models.BooleanField(default=False)
+    output = models.CharField(max_length=5, choices=OUTPUT_CHOICES, default='csv')
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='statements/', blank=True)
+    rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.output} export for {self.user} ({self.status})'
@@ -0,0 +1,203 @@
+"""
+Ledger reconciliation: replay each wallet's Transaction rows and compare the
+result with the balances stored on the Wallet.
+
+What each row does to (available, escrow, reserve), for amount a:
+
+  deposit          (+a, 0, 0) once processed (credited); nothing while on hold
+  withdrawal       (-a, 0, 0)
+  escrow_lock      (-a, +a, 0); zero-amount rows (disputes) change nothing.
+                   Amendments that lowered the price used to be written as
+                   escrow_lock too ("Escrow adjusted for amendment: $old → $new"
+                   with new < old); those are (+a, -a, 0)
+  escrow_release   (+a, 0, 0) for the hauler paid, (0, -a, 0) for the client
+  escrow_refund    (+a, -a, 0)
+  reserve_hold     (-a, 0, +a)
+  reserve_release  (+a, 0, -a)
+
+reconcile_wallets (nightly) cuts the wallet ids into ranges of
+RECONCILE['SHARD_SIZE'] and queues reconcile_wallet_shard for each, so shards
+run in parallel on however many workers there are. A shard reads in one
+REPEATABLE READ snapshot, so a wallet's balances and its rows are compared as
+of the same moment, and streams the rows after each wallet's checkpoint
+through a server-side cursor in (wallet, created_at, id) order.
+
+WalletCheckpoint holds the replayed sums up to a transaction, so a run only
+reads rows added since the previous one. A checkpoint never moves past a row
+newer than SETTLE_SECONDS (a transaction still open could commit a row with
+an earlier created_at) or past a deposit still on hold (it takes effect when
+it matures, without a new row); those rows are replayed again next time.
+
+A wallet whose stored balances differ from the replay gets `drift` on its
+checkpoint: expected and actual balances and the first divergent transaction.
+That is the first row at which a replayed balance goes negative, or else the
+first row replayed after the wallet's checkpoint (the drift came in at or
+after it); None means a balance changed with no new row at all. The first
+detection is kept until a run finds the wallet clean again.
+"""
+
+import logging
+import re
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from config import metrics
+
+logger = logging.getLogger(__name__)
+
+BALANCES = ('available', 'escrow', 'reserve')
+# Rows fetched per round trip from the server-side cursor
+CHUNK_SIZE = 2000
+_LEGACY_AMENDMENT = re.compile(r'^Escrow adjusted for amendment: \$(\S+) → \$(\S+)$')
+
+
+def _cfg(key, default):
+    return getattr(settings, 'RECONCILE', {}).get(key, default)
+
+
+def effect(kind, amount, is_processed, description, user_type):
+    """(available, escrow, reserve) change for one transaction row (see module docstring)."""
+    zero = Decimal('0')
+    if kind == 'deposit':
+        return (amount, zero, zero) if is_processed else (zero, zero, zero)
+    if kind == 'withdrawal':
+        return -amount, zero, zero
+    if kind == 'escrow_lock':
+        legacy = _LEGACY_AMENDMENT.match(description)
+        if legacy and Decimal(legacy.group(2)) < Decimal(legacy.group(1)):
+            return amount, -amount, zero
+        return -amount, amount, zero
+    if kind == 'escrow_release':
+        return (amount, zero, zero) if user_type == 'hauler' else (zero, -amount, zero)
+    if kind == 'escrow_refund':
+        return amount, -amount, zero
+    if kind == 'reserve_hold':
+        return -amount, zero, amount
+    if kind == 'reserve_release':
+        return amount, zero, -amount
+    raise ValueError(f'Unknown transaction type {kind!r}')
+
+
+def shards():
+    """[(first wallet id, last wallet id + 1)] covering every wallet, SHARD_SIZE ids each."""
+    from .models import Wallet
+
+    bounds = Wallet.objects.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        return []
+    size = _cfg('SHARD_SIZE', 5000)
+    return [(lo, min(lo + size, bounds['hi'] + 1)) for lo in range(bounds['lo'], bounds['hi'] + 1, size)]
+
+
+def _replay(wallet, checkpoint, rows, settled_before):
+    """
+    Replay `rows` (this wallet's, in order, after `checkpoint`) from the
+    checkpoint's sums. Returns (expected balances, new checkpoint position and
+    sums, first row id to go negative, first row id, row count).
+    """
+    if checkpoint is not None and checkpoint.created_at is not None:
+        sums = [checkpoint.available_balance, checkpoint.escrow_balance, checkpoint.reserve_balance]
+        position = (checkpoint.created_at, checkpoint.transaction_id)
+    else:
+        sums, position = [Decimal('0')] * 3, (None, None)
+    saved = (position, tuple(sums))
+    advancing = True
+    first_negative = first_row = None
+    count = 0
+    for _, pk, created_at, kind, amount, is_processed, description in rows:
+        count += 1
+        first_row = first_row or pk
+        change = effect(kind, amount, is_processed, description, wallet['user_type'])
+        sums = [total + delta for total, delta in zip(sums, change)]
+        if first_negative is None and min(sums) < 0:
+            first_negative = pk
+        if advancing and (created_at > settled_before or (kind == 'deposit' and not is_processed)):
+            advancing = False
+        if advancing:
+            saved = ((created_at, pk), tuple(sums))
+    return dict(zip(BALANCES, sums)), saved, first_negative, first_row, count
+
+
+def reconcile_shard(lo, hi, now=None):
+    """Reconcile wallets with lo <= id < hi. Returns (wallets checked, rows replayed, wallets drifting)."""
+    from .models import Wallet, Transaction, WalletCheckpoint
+
+    now = now or timezone.now()
+    settled_before = now - timedelta(seconds=_cfg('SETTLE_SECONDS', 600))
+    results = []
+    replayed = 0
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        wallets = {
+            row['id']: row for row in Wallet.objects.filter(id__gte=lo, id__lt=hi).values(
+                'id', 'available_balance', 'escrow_balance', 'reserve_balance', user_type=F('user__user_type'),
+            )
+        }
+        checkpoints = {cp.wallet_id: cp for cp in WalletCheckpoint.objects.filter(wallet_id__gte=lo, wallet_id__lt=hi)}
+        rows = (
+            Transaction.objects.filter(wallet_id__gte=lo, wallet_id__lt=hi)
+            .filter(
+                Q(wallet__checkpoint__created_at__isnull=True)
+                | Q(created_at__gt=F('wallet__checkpoint__created_at'))
+                | Q(created_at=F('wallet__checkpoint__created_at'), id__gt=F('wallet__checkpoint__transaction_id'))
+            )
+            .order_by('wallet_id', 'created_at', 'id')
+            .values_list('wallet_id', 'id', 'created_at', 'transaction_type', 'amount', 'is_processed', 'description')
+        )
+        grouped = groupby(rows.iterator(CHUNK_SIZE), key=lambda row: row[0])
+        pending = next(grouped, None)
+        for wallet_id in sorted(wallets):
+            wallet_rows = ()
+            if pending is not None and pending[0] == wallet_id:
+                wallet_rows = pending[1]
+            replay = _replay(wallets[wallet_id], checkpoints.get(wallet_id), wallet_rows, settled_before)
+            if wallet_rows:
+                pending = next(grouped, None)
+            replayed += replay[4]
+            results.append((wallet_id, replay))
+
+    checkpoints_out, drifting = [], 0
+    for wallet_id, (expected, saved, first_negative, first_row, _) in results:
+        wallet, previous = wallets[wallet_id], checkpoints.get(wallet_id)
+        actual = {name: wallet[f'{name}_balance'] for name in BALANCES}
+        (created_at, pk), sums = saved
+        checkpoint = WalletCheckpoint(
+            wallet_id=wallet_id, created_at=created_at, transaction_id=pk,
+            available_balance=sums[0], escrow_balance=sums[1], reserve_balance=sums[2], checked_at=now,
+        )
+        if actual != expected:
+            drifting += 1
+            if previous is not None and previous.drift:
+                first = previous.drift['first_divergent_transaction']
+                checkpoint.drift_detected_at = previous.drift_detected_at
+            else:
+                first = first_negative or first_row
+                checkpoint.drift_detected_at = now
+                logger.warning('Wallet %s drifted from its ledger: expected %s, stored %s', wallet_id, expected, actual)
+            checkpoint.drift = {
+                'expected': {name: str(value) for name, value in expected.items()},
+                'actual': {name: str(value) for name, value in actual.items()},
+                'first_divergent_transaction': str(first) if first else None,
+            }
+        checkpoints_out.append(checkpoint)
+
+    WalletCheckpoint.objects.bulk_create(
+        checkpoints_out, batch_size=1000, update_conflicts=True, unique_fields=['wallet'],
+        update_fields=[
+            'created_at', 'transaction_id', 'available_balance', 'escrow_balance', 'reserve_balance',
+            'checked_at', 'drift', 'drift_detected_at',
+        ],
+    )
+    metrics.incr('ledger.reconcile.wallets', len(results))
+    metrics.incr('ledger.reconcile.rows', replayed)
+    metrics.incr('ledger.drift.wallets', drifting)
+    metrics.flush_if_due()
+    return len(results), replayed, drifting
@@ -1,3 +1,7 @@
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework import serializers
 from .models import Wallet, Transaction
@@ -15,7 +19,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 
 class WalletSerializer(serializers.ModelSerializer):
-    transactions = TransactionSerializer(many=True, read_only=True)
+    """Balances only; the history is paginated separately (payments.views.transactions)."""
     total_balance = serializers.SerializerMethodField()
     pending_balance = serializers.SerializerMethodField()
 
@@ -23,7 +27,7 @@ class WalletSerializer(serializers.ModelSerializer):
         model = Wallet
         fields = [
             'available_balance', 'escrow_balance', 'reserve_balance',
-            'pending_balance', 'total_balance', 'transactions',
+            'pending_balance', 'total_balance',
         ]
 
     def get_total_balance(self, obj):
@@ -31,10 +35,8 @@ class WalletSerializer(serializers.ModelSerializer):
 
     def get_pending_balance(self, obj):
         """Sum of deposits that haven't cleared the hold period yet."""
-        now = timezone.now()
-        result = obj.transactions.filter(
+        return obj.transactions.filter(
             transaction_type='deposit',
             is_processed=False,
-            available_at__gt=now,
-        ).values_list('amount', flat=True)
-        return sum(result) if result else 0
+            available_at__gt=timezone.now(),
+        ).aggregate(total=Coalesce(Sum('amount'), Decimal('0')))['total']
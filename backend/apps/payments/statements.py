@@ -0,0 +1,223 @@
+"""
+Wallet statements and whole-ledger exports, streamed row by row.
+
+    GET  /api/wallet/statement/?output=csv&since=2025-01-01&until=2025-12-31
+    GET  /api/wallet/statement/?output=jsonl&scope=all          (staff: every wallet)
+    POST /api/wallet/statement/  {same params}  -> 202, written in the background
+    GET  /api/wallet/statement/exports/<id>/    -> status; ?download=1 for the .gz
+
+Rows come from a server-side cursor (QuerySet.iterator) in (wallet, created_at,
+id) order — the txn_wallet_created_idx order — and are formatted and sent in
+~64 KB chunks as they arrive, so memory stays flat however many rows there
+are. Under ASGI (daphne) the chunks are handed over through an async
+iterator: Django 4.2 would read a sync one into a list before sending it.
+Each row carries its net change and the running balance after it:
+
+  deposit          +amount (counted when Stripe confirmed it, hold or not)
+  withdrawal       -amount
+  escrow_release   +amount for the hauler who is paid, -amount for the client
+                   whose escrow pays
+  everything else   0 (moves money between the wallet's own balances)
+
+so the balance is what the wallet holds in total, pending deposits included.
+The opening balance for a `since` bound is one SQL aggregate over the earlier
+rows (one per wallet for a ledger export).
+
+Large ranges can be exported by export_statement instead (POST): it writes
+the same lines to a gzipped temporary file and stores it on a
+StatementExport, which prune_exports() deletes after EXPORT_RETENTION_DAYS.
+"""
+
+import csv
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.files import File
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+
+COLUMNS = (
+    'created_at', 'wallet_id', 'id', 'transaction_type', 'description', 'reference_id',
+    'amount', 'net_change', 'balance',
+)
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+# Rows fetched per round trip from the server-side cursor
+CHUNK_SIZE = 2000
+# Bytes collected before a chunk is sent or written
+BUFFER_SIZE = 64 * 1024
+EXPORT_RETENTION_DAYS = 7
+
+
+def net_change():
+    """What a transaction adds to its wallet's total holdings (see module docstring)."""
+    return Case(
+        When(transaction_type='deposit', then=F('amount')),
+        When(transaction_type='withdrawal', then=-F('amount')),
+        When(transaction_type='escrow_release', wallet__user__user_type='hauler', then=F('amount')),
+        When(transaction_type='escrow_release', then=-F('amount')),
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _transactions(wallet_id, since, until):
+    from .models import Transaction
+
+    qs = Transaction.objects.all()
+    if wallet_id is not None:
+        qs = qs.filter(wallet_id=wallet_id)
+    if since:
+        qs = qs.filter(created_at__gte=since)
+    if until:
+        qs = qs.filter(created_at__lt=until)
+    return qs
+
+
+def _opening_balances(wallet_id, since):
+    """{wallet_id: balance} before `since`."""
+    from .models import Transaction
+
+    if since is None:
+        return {}
+    qs = Transaction.objects.filter(created_at__lt=since)
+    if wallet_id is not None:
+        qs = qs.filter(wallet_id=wallet_id)
+    rows = qs.order_by().values('wallet_id').annotate(balance=Sum(net_change()))
+    return {row['wallet_id']: row['balance'] for row in rows}
+
+
+def records(wallet_id=None, since=None, until=None):
+    """
+    Yield one tuple per transaction, in COLUMNS order, for one wallet (or all
+    of them if `wallet_id` is None) between `since` (inclusive) and `until`.
+    """
+    openings = _opening_balances(wallet_id, since)
+    rows = (
+        _transactions(wallet_id, since, until)
+        .annotate(net_change=net_change())
+        .order_by('wallet_id', 'created_at', 'id')
+        .values_list(
+            'created_at', 'wallet_id', 'id', 'transaction_type', 'description', 'reference_id',
+            'amount', 'net_change',
+        )
+    )
+    current, balance = None, Decimal('0')
+    for created_at, wallet, pk, kind, description, reference, amount, change in rows.iterator(CHUNK_SIZE):
+        if wallet != current:
+            current, balance = wallet, openings.get(wallet) or Decimal('0')
+        balance += change
+        yield created_at.isoformat(), wallet, str(pk), kind, description, reference, amount, change, balance
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def lines(rows, output):
+    """Format `rows` as CSV (with a header) or JSON Lines, one string per row."""
+    if output == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(COLUMNS, row)), default=str) + '\n'
+
+
+def chunks(strings):
+    """Join `strings` into pieces of about BUFFER_SIZE bytes."""
+    buffer, size = [], 0
+    for s in strings:
+        buffer.append(s)
+        size += len(s)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def _async_chunks(iterable):
+    """`iterable` pulled one item at a time on the request's sync thread (same DB connection and cursor)."""
+    iterator = iter(iterable)
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _read(file):
+    with file:
+        while chunk := file.read(BUFFER_SIZE):
+            yield chunk
+
+
+def streaming_response(request, content, content_type, name):
+    """An attachment streaming `content` (an iterable of str / bytes chunks) to the client."""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _async_chunks(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
+
+
+def file_response(request, export):
+    """A finished export's gzipped file, streamed."""
+    name = f'{filename(export.output, export.since, export.until)}.gz'
+    return streaming_response(request, _read(export.file.open('rb')), 'application/gzip', name)
+
+
+def filename(output, since=None, until=None):
+    start = since.date().isoformat() if since else 'start'
+    end = (until - timedelta(microseconds=1)).date().isoformat() if until else timezone.now().date().isoformat()
+    return f'statement-{start}-to-{end}.{output}'
+
+
+def write_export(export):
+    """Write `export`'s rows to a gzipped file on it and mark it ready. Returns the row count."""
+    wallet_id = None if export.whole_ledger else export.user.wallet.id
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.open(tmp, 'wt', newline='') as out:
+            for chunk in chunks(lines(counted(records(wallet_id, export.since, export.until)), export.output)):
+                out.write(chunk)
+        tmp.seek(0)
+        export.file.save(f'{export.id}-{filename(export.output, export.since, export.until)}.gz', File(tmp), save=False)
+    export.rows = count
+    export.status = 'ready'
+    export.finished_at = timezone.now()
+    export.save(update_fields=['file', 'rows', 'status', 'finished_at'])
+    return count
+
+
+def prune_exports(now=None):
+    """Delete export files and records older than EXPORT_RETENTION_DAYS. Returns how many were removed."""
+    from .models import StatementExport
+
+    cutoff = (now or timezone.now()) - timedelta(days=EXPORT_RETENTION_DAYS)
+    removed = 0
+    for export in StatementExport.objects.filter(created_at__lt=cutoff).iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        removed += 1
+    return removed
@@ -4,10 +4,58 @@ from decimal import Decimal
 from celery import shared_task
 from django.conf import settings
 from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Round
 from django.utils import timezone
 
 SEC = settings.SECURITY
 
+# Matured rows claimed per transaction
+CHUNK_SIZE = 1000
+
+
+def _claim_matured(transaction_type, now, **annotations):
+    """
+    Lock up to CHUNK_SIZE unprocessed `transaction_type` rows whose hold has
+    ended (SKIP LOCKED: rows another worker holds are left to it) and mark
+    them processed. Returns the claimed rows as dicts with id, wallet_id,
+    amount, reference_id and any `annotations`; the caller's transaction
+    keeps them locked.
+    """
+    from .models import Transaction
+
+    rows = list(
+        Transaction.objects.select_for_update(skip_locked=True)
+        .filter(transaction_type=transaction_type, is_processed=False, available_at__lte=now)
+        .order_by('available_at', 'id')
+        .annotate(**annotations)
+        .values('id', 'wallet_id', 'amount', 'reference_id', *annotations)[:CHUNK_SIZE]
+    )
+    if rows:
+        Transaction.objects.filter(id__in=[row['id'] for row in rows]).update(is_processed=True)
+    return rows
+
+
+def _credit_wallets(ids, now, **totals):
+    """
+    One UPDATE per wallet adding the per-wallet sums of `totals` (field ->
+    expression over the rows `ids`) to its balances, in wallet id order so
+    concurrent workers lock wallets in the same order.
+    """
+    from .models import Wallet, Transaction
+
+    per_wallet = (
+        Transaction.objects.filter(id__in=ids)
+        .values('wallet_id')
+        .annotate(**{field: Sum(expression) for field, expression in totals.items()})
+        .order_by('wallet_id')
+    )
+    for row in per_wallet:
+        Wallet.objects.filter(pk=row['wallet_id']).update(
+            updated_at=now, **{field: F(field) + row[field] for field in totals},
+        )
+    return len(per_wallet)
+
 
 @shared_task
 def process_matured_deposits():
@@ -16,51 +64,47 @@ def process_matured_deposits():
     For each matured deposit:
       - (1 - CHARGEBACK_RESERVE_PCT) goes to available_balance
       - CHARGEBACK_RESERVE_PCT goes to reserve_balance + a reserve_hold transaction
+    Works through the backlog a chunk at a time: one UPDATE marks a chunk
+    processed, one UPDATE per wallet applies its sums, and the reserve holds
+    are inserted with one bulk_create. Several copies of the task can run at
+    once and split the backlog between them.
     Runs nightly via Celery Beat.
     """
-    from .models import Wallet, Transaction
+    from .models import Transaction
 
     now = timezone.now()
     reserve_pct = Decimal(str(SEC.get('CHARGEBACK_RESERVE_PCT', 0.0)))
     reserve_release_days = SEC.get('RESERVE_RELEASE_DAYS', 30)
-
-    pending = Transaction.objects.filter(
-        transaction_type='deposit',
-        is_processed=False,
-        available_at__lte=now,
-    ).select_related('wallet')
+    # Reserve per deposit, rounded to the cent; the rest of the deposit is spendable
+    reserve = Round(
+        ExpressionWrapper(F('amount') * reserve_pct, output_field=DecimalField(max_digits=10, decimal_places=2)), 2,
+    )
 
     processed = 0
-    for txn in pending:
-        try:
-            with transaction.atomic():
-                w = Wallet.objects.select_for_update().get(pk=txn.wallet_id)
-                spendable = txn.amount * (1 - reserve_pct)
-                reserve = txn.amount * reserve_pct
-
-                w.available_balance += spendable
-                if reserve > 0:
-                    w.reserve_balance += reserve
-                w.save(update_fields=['available_balance', 'reserve_balance', 'updated_at'])
-
-                # Mark original deposit processed
-                txn.is_processed = True
-                txn.save(update_fields=['is_processed'])
-
-                # Create a reserve_hold transaction that matures later
-                if reserve > 0:
-                    Transaction.objects.create(
-                        wallet=w,
-                        transaction_type='reserve_hold',
-                        amount=reserve,
-                        reference_id=txn.reference_id,
-                        description=f'Chargeback reserve for deposit {txn.id}',
-                        available_at=now + timedelta(days=reserve_release_days),
-                        is_processed=False,
-                    )
-                processed += 1
-        except Exception:
-            continue
+    while True:
+        with transaction.atomic():
+            rows = _claim_matured('deposit', now, reserve=reserve)
+            if not rows:
+                break
+            _credit_wallets(
+                [row['id'] for row in rows], now,
+                available_balance=F('amount') - reserve,
+                reserve_balance=reserve,
+            )
+            # reserve_hold transactions that mature later
+            Transaction.objects.bulk_create([
+                Transaction(
+                    wallet_id=row['wallet_id'],
+                    transaction_type='reserve_hold',
+                    amount=row['reserve'],
+                    reference_id=row['reference_id'],
+                    description=f'Chargeback reserve for deposit {row["id"]}',
+                    available_at=now + timedelta(days=reserve_release_days),
+                    is_processed=False,
+                )
+                for row in rows if row['reserve'] > 0
+            ])
+        processed += len(rows)
 
     return f'Processed {processed} matured deposit(s)'
 
@@ -68,39 +112,101 @@ def process_matured_deposits():
 @shared_task
 def release_matured_reserves():
     """
-    Move matured reserve_balance funds to available_balance.
+    Move matured reserve_balance funds to available_balance, a chunk at a
+    time like process_matured_deposits.
     Runs nightly via Celery Beat.
     """
-    from .models import Wallet, Transaction
+    from .models import Transaction
 
     now = timezone.now()
-    pending = Transaction.objects.filter(
-        transaction_type='reserve_hold',
-        is_processed=False,
-        available_at__lte=now,
-    ).select_related('wallet')
-
     released = 0
-    for txn in pending:
-        try:
-            with transaction.atomic():
-                w = Wallet.objects.select_for_update().get(pk=txn.wallet_id)
-                w.reserve_balance -= txn.amount
-                w.available_balance += txn.amount
-                w.save(update_fields=['reserve_balance', 'available_balance', 'updated_at'])
-
-                txn.is_processed = True
-                txn.save(update_fields=['is_processed'])
-
-                Transaction.objects.create(
-                    wallet=w,
+    while True:
+        with transaction.atomic():
+            rows = _claim_matured('reserve_hold', now)
+            if not rows:
+                break
+            _credit_wallets(
+                [row['id'] for row in rows], now,
+                reserve_balance=-F('amount'),
+                available_balance=F('amount'),
+            )
+            Transaction.objects.bulk_create([
+                Transaction(
+                    wallet_id=row['wallet_id'],
                     transaction_type='reserve_release',
-                    amount=txn.amount,
-                    reference_id=txn.reference_id,
+                    amount=row['amount'],
+                    reference_id=row['reference_id'],
                     description='Chargeback reserve released',
                 )
-                released += 1
-        except Exception:
-            continue
+                for row in rows
+            ])
+        released += len(rows)
 
     return f'Released {released} reserve(s)'
+
+
+@shared_task
+def apply_stripe_events():
+    """
+    Apply recorded Stripe webhook events (apps.payments.webhooks).
+    Queued by the webhook views, and run by Celery Beat as a backstop.
+    """
+    from .webhooks import apply_pending
+
+    return f'Applied {apply_pending()} Stripe event(s).'
+
+
+@shared_task
+def prune_stripe_events():
+    """Delete applied Stripe events past their retention. Runs daily via Celery Beat."""
+    from .webhooks import prune
+
+    return f'Pruned {prune()} Stripe event(s).'
+
+
+@shared_task
+def export_statement(export_id):
+    """Write a requested statement / ledger export to its gzipped file (apps.payments.statements)."""
+    from .models import StatementExport
+    from .statements import write_export
+
+    export = StatementExport.objects.select_related('user').get(pk=export_id)
+    try:
+        rows = write_export(export)
+    except Exception as exc:
+        StatementExport.objects.filter(pk=export_id).update(
+            status='failed', error=repr(exc)[:2000], finished_at=timezone.now(),
+        )
+        raise
+    return f'Exported {rows} transaction(s) for statement {export_id}.'
+
+
+@shared_task
+def prune_statement_exports():
+    """Delete statement exports past their retention. Runs daily via Celery Beat."""
+    from .statements import prune_exports
+
+    return f'Pruned {prune_exports()} statement export(s).'
+
+
+@shared_task
+def reconcile_wallets():
+    """
+    Queue a ledger reconciliation task per shard of wallet ids (apps.payments.reconcile).
+    Runs nightly via Celery Beat.
+    """
+    from .reconcile import shards
+
+    queued = shards()
+    for lo, hi in queued:
+        reconcile_wallet_shard.delay(lo, hi)
+    return f'Queued {len(queued)} reconciliation shard(s).'
+
+
+@shared_task
+def reconcile_wallet_shard(lo, hi):
+    """Replay the ledger of wallets lo <= id < hi and record drift on their checkpoints."""
+    from .reconcile import reconcile_shard
+
+    wallets, rows, drifting = reconcile_shard(lo, hi)
+    return f'Reconciled {wallets} wallet(s) ({rows} transaction(s)); {drifting} drifting.'
@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.wallet, name='wallet'),
+    path('transactions/', views.transactions, name='wallet-transactions'),
+    path('statement/', views.statement, name='wallet-statement'),
+    path('statement/exports/<uuid:pk>/', views.statement_export, name='wallet-statement-export'),
     path('deposit/', views.deposit, name='deposit'),
     path('withdraw/', views.withdraw, name='withdraw'),
     path('webhook/', views.stripe_webhook, name='stripe-webhook'),
@@ -1,16 +1,22 @@
-from datetime import timedelta
+import math
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
 from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from config.idempotency import idempotent_request
+from config.ratelimit import RollingWindow
 from config.throttles import DepositThrottle
-from .models import Wallet, Transaction
+from .models import Wallet, Transaction, StatementExport
 from .serializers import WalletSerializer, TransactionSerializer
 
 SEC = settings.SECURITY
@@ -18,12 +24,133 @@ SEC = settings.SECURITY
 
 @api_view(['GET'])
 def wallet(request):
+    """Balances only; the history is at transactions below."""
     w, _ = Wallet.objects.get_or_create(user=request.user)
     return Response(WalletSerializer(w).data)
 
 
+class TransactionCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 25
+
+
+def _parse_bound(value, end_of_day=False):
+    """An ISO date or datetime query param -> aware datetime; a bare date covers that whole day."""
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+@api_view(['GET'])
+def transactions(request):
+    """
+    The wallet's transaction history, newest first, cursor-paginated.
+    Filters: ?type=deposit,withdrawal  ?since=2026-01-01  ?until=2026-01-31
+    (dates or ISO datetimes; a date includes that whole day).
+    """
+    qs = Transaction.objects.filter(wallet__user=request.user)
+
+    types = [t for t in request.query_params.get('type', '').split(',') if t]
+    if types:
+        known = {choice for choice, _ in Transaction.TYPE_CHOICES}
+        if not set(types) <= known:
+            return Response(
+                {'error': f'Unknown transaction type. Choose from: {", ".join(sorted(known))}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        qs = qs.filter(transaction_type__in=types)
+    try:
+        if request.query_params.get('since'):
+            qs = qs.filter(created_at__gte=_parse_bound(request.query_params['since']))
+        if request.query_params.get('until'):
+            qs = qs.filter(created_at__lt=_parse_bound(request.query_params['until'], end_of_day=True))
+    except ValueError:
+        return Response(
+            {'error': 'since / until must be dates (YYYY-MM-DD) or ISO datetimes.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    paginator = TransactionCursorPagination()
+    page = paginator.paginate_queryset(qs, request)
+    return paginator.get_paginated_response(TransactionSerializer(page, many=True).data)
+
+
+def _export_payload(export):
+    return {
+        'id': str(export.id),
+        'status': export.status,
+        'rows': export.rows,
+        'created_at': export.created_at,
+        'finished_at': export.finished_at,
+    }
+
+
+@api_view(['GET', 'POST'])
+def statement(request):
+    """
+    Statement export (apps.payments.statements). Params, in the query string
+    or the POST body: output=csv|jsonl, since / until (as for transactions),
+    scope=all for the whole ledger (staff only).
+    GET streams the file; POST queues a gzipped export and returns its status.
+    """
+    from . import statements
+    from .tasks import export_statement
+
+    params = request.query_params if request.method == 'GET' else request.data
+    output = params.get('output', 'csv')
+    if output not in statements.CONTENT_TYPES:
+        return Response({'error': 'output must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+    whole_ledger = params.get('scope') == 'all'
+    if whole_ledger and not request.user.is_staff:
+        return Response({'error': 'Only staff can export the whole ledger.'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        since = _parse_bound(params['since']) if params.get('since') else None
+        until = _parse_bound(params['until'], end_of_day=True) if params.get('until') else None
+    except ValueError:
+        return Response(
+            {'error': 'since / until must be dates (YYYY-MM-DD) or ISO datetimes.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    w, _ = Wallet.objects.get_or_create(user=request.user)
+
+    if request.method == 'POST':
+        export = StatementExport.objects.create(
+            user=request.user, whole_ledger=whole_ledger, output=output, since=since, until=until,
+        )
+        transaction.on_commit(lambda: export_statement.delay(str(export.id)))
+        return Response(_export_payload(export), status=status.HTTP_202_ACCEPTED)
+
+    rows = statements.records(None if whole_ledger else w.id, since, until)
+    return statements.streaming_response(
+        request, statements.chunks(statements.lines(rows, output)),
+        statements.CONTENT_TYPES[output], statements.filename(output, since, until),
+    )
+
+
+@api_view(['GET'])
+def statement_export(request, pk):
+    """Status of a queued statement export; ?download=1 returns the gzipped file once it is ready."""
+    from . import statements
+
+    try:
+        export = StatementExport.objects.get(pk=pk, user=request.user)
+    except (StatementExport.DoesNotExist, ValueError, DjangoValidationError):
+        return Response({'error': 'Export not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if request.query_params.get('download'):
+        if export.status != 'ready':
+            return Response({'error': 'Export is not ready yet.'}, status=status.HTTP_409_CONFLICT)
+        return statements.file_response(request, export)
+    return Response(_export_payload(export))
+
+
 @api_view(['POST'])
 @throttle_classes([DepositThrottle])
+@idempotent_request
 def deposit(request):
     import stripe
     stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -38,8 +165,6 @@ def deposit(request):
 
     # Task 18: Deposit velocity limits (production only)
     if SEC.get('DEPOSIT_VELOCITY_ENABLED'):
-        from django.core.cache import cache
-
         tier = getattr(request.user, 'verification_tier', 'unverified')
         DAILY_LIMITS = {
             'unverified':     Decimal('200.00'),
@@ -55,18 +180,6 @@ def deposit(request):
         daily_limit = DAILY_LIMITS.get(tier, Decimal('200.00'))
         balance_cap = BALANCE_CAPS.get(tier)
 
-        daily_key = f'deposits:{request.user.id}:daily'
-        today_total = Decimal(str(cache.get(daily_key) or '0'))
-
-        if today_total + amount > daily_limit:
-            return Response(
-                {
-                    'error': f'Daily deposit limit of ${daily_limit} reached for your verification level ({tier}).',
-                    'upgrade_tip': 'Verify your phone or identity to increase limits.',
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         if balance_cap is not None:
             w_check, _ = Wallet.objects.get_or_create(user=request.user)
             if w_check.available_balance + w_check.escrow_balance + amount > balance_cap:
@@ -75,8 +188,24 @@ def deposit(request):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        # Update counter (24hr TTL)
-        cache.set(daily_key, str(today_total + amount), timeout=86400)
+        # Deposits in the last 24 hours, in cents, against the current tier's limit; checked and
+        # spent in one atomic step (config.ratelimit.RollingWindow). Not keyed by tier, so an
+        # upgrade raises the limit without resetting what was already deposited.
+        window = RollingWindow(f'deposits:{request.user.id}', 86400)
+        wait = window.consume(int(daily_limit * 100), int(amount * 100))
+        if wait:
+            headers = {'Retry-After': str(math.ceil(wait))} if wait != math.inf else {}
+            return Response(
+                {
+                    'error': (
+                        f'Deposit limit of ${daily_limit} per 24 hours reached '
+                        f'for your verification level ({tier}).'
+                    ),
+                    'upgrade_tip': 'Verify your phone or identity to increase limits.',
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+                headers=headers,
+            )
 
     # Build Stripe session params
     session_params = {
@@ -111,68 +240,19 @@ def deposit(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
-    import stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
+    """
+    Stripe payments webhook. Records the verified event and answers straight
+    away; apps.payments.webhooks applies it (wallet credit) in the background.
+    """
+    from .webhooks import receive
 
-    try:
-        event = stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
-    except (stripe.error.SignatureVerificationError, Exception):
+    if not receive(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''), settings.STRIPE_WEBHOOK_SECRET):
         return Response({'error': 'Invalid signature.'}, status=status.HTTP_400_BAD_REQUEST)
-
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        user_id = session['metadata'].get('user_id')
-        amount = Decimal(session['metadata'].get('amount', '0'))
-        payment_intent = session.get('payment_intent', '')
-
-        hold_days = SEC.get('DEPOSIT_HOLD_DAYS', 0)
-        reserve_pct = Decimal(str(SEC.get('CHARGEBACK_RESERVE_PCT', 0.0)))
-
-        # New accounts (<7 days) get a longer hold in production
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        try:
-            user = User.objects.get(id=user_id)
-            if hold_days > 0 and (timezone.now() - user.created_at).days < 7:
-                hold_days = max(hold_days, 5)
-        except User.DoesNotExist:
-            pass
-
-        with transaction.atomic():
-            w = Wallet.objects.select_for_update().get(user_id=user_id)
-
-            if hold_days == 0 and reserve_pct == 0:
-                # Dev / no-hold path: credit immediately
-                w.available_balance += amount
-                w.save(update_fields=['available_balance', 'updated_at'])
-                Transaction.objects.create(
-                    wallet=w,
-                    transaction_type='deposit',
-                    amount=amount,
-                    reference_id=payment_intent,
-                    description='Wallet deposit via Stripe',
-                    is_processed=True,
-                )
-            else:
-                # Prod path: mark deposit as pending, Celery task will credit when ready
-                available_at = timezone.now() + timedelta(days=hold_days)
-                Transaction.objects.create(
-                    wallet=w,
-                    transaction_type='deposit',
-                    amount=amount,
-                    reference_id=payment_intent,
-                    description='Wallet deposit via Stripe (pending hold)',
-                    available_at=available_at,
-                    is_processed=False,
-                )
-
     return Response({'status': 'ok'})
 
 
 @api_view(['POST'])
+@idempotent_request
 def withdraw(request):
     """
     Request a withdrawal of available_balance funds.
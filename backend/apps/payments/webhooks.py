@@ -0,0 +1,268 @@
+"""
+Stripe webhook ingestion: record now, apply in the background.
+
+The webhook views (payments.stripe_webhook, users.stripe_identity_webhook)
+only call receive(): it checks the Stripe-Signature header and inserts the
+event as a StripeEvent keyed by Stripe's event id, then answers 200. A
+redelivery of an event already recorded — Stripe retries anything it thinks
+timed out — hits the primary key and is acknowledged without being stored
+again, so a deposit is credited once however often it is delivered.
+
+apply_pending() (the apply_stripe_events task, scheduled on commit by every
+receive() and by Celery Beat every 30 seconds) claims due events in
+(created, received_at) order with SELECT ... FOR UPDATE SKIP LOCKED, so
+several workers can share the backlog, and runs the HANDLERS entry for each
+event type in a savepoint. Marking the event processed commits together
+with its wallet writes. Events for one user (metadata.user_id) are applied
+in order: an event waits while an earlier one for the same user is still
+pending, whether another worker holds it or it is backing off after a
+failure. A failing event is retried with exponential backoff up to
+STRIPE_EVENTS['MAX_ATTEMPTS'] times, then left for an admin (StripeEvent
+admin, "Retry").
+
+Metrics (config.metrics):
+  stripe.events.received / .duplicate / .applied / .failed / .deferred
+  stripe.events.delivery_lag_seconds   Stripe's event.created -> recorded
+  stripe.events.apply_lag_seconds      recorded -> applied
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from config import metrics
+
+logger = logging.getLogger(__name__)
+
+SEC = settings.SECURITY
+
+
+def _cfg(key, default):
+    return getattr(settings, 'STRIPE_EVENTS', {}).get(key, default)
+
+
+def receive(payload, sig_header, secret):
+    """Verify a webhook delivery and record its event. Returns False if the signature is not valid."""
+    import stripe
+    from .models import StripeEvent
+
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'), sig_header, secret, stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+        event = json.loads(payload)
+        obj = event['data']['object']
+        created = datetime.fromtimestamp(event['created'], tz=dt_timezone.utc)
+    except Exception:
+        return False
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                id=event['id'],
+                type=event['type'],
+                user_ref=str((obj.get('metadata') or {}).get('user_id') or '')[:64],
+                payload=event,
+                created=created,
+                received_at=now,
+            )
+    except IntegrityError:
+        metrics.incr('stripe.events.duplicate')
+    else:
+        metrics.incr('stripe.events.received')
+        metrics.gauge_max('stripe.events.delivery_lag_seconds', (now - created).total_seconds())
+        transaction.on_commit(_nudge)
+    metrics.flush_if_due()
+    return True
+
+
+def _nudge(countdown=None):
+    from .tasks import apply_stripe_events
+    try:
+        apply_stripe_events.apply_async(countdown=countdown)
+    except Exception:
+        # The beat schedule picks the event up instead
+        logger.warning('Could not schedule Stripe event consumer', exc_info=True)
+
+
+# ---------------------------------------------------------------------------
+# Handlers: event type -> function(event object), run inside the claim transaction
+# ---------------------------------------------------------------------------
+
+def credit_deposit(session):
+    """checkout.session.completed: credit the deposit now, or record it as pending its hold."""
+    from django.contrib.auth import get_user_model
+    from .models import Wallet, Transaction
+
+    user_id = session['metadata'].get('user_id')
+    amount = Decimal(session['metadata'].get('amount', '0'))
+    payment_intent = session.get('payment_intent') or ''
+
+    hold_days = SEC.get('DEPOSIT_HOLD_DAYS', 0)
+    reserve_pct = Decimal(str(SEC.get('CHARGEBACK_RESERVE_PCT', 0.0)))
+
+    # New accounts (<7 days) get a longer hold in production
+    User = get_user_model()
+    try:
+        user = User.objects.get(id=user_id)
+        if hold_days > 0 and (timezone.now() - user.created_at).days < 7:
+            hold_days = max(hold_days, 5)
+    except User.DoesNotExist:
+        pass
+
+    w = Wallet.objects.select_for_update().get(user_id=user_id)
+
+    if hold_days == 0 and reserve_pct == 0:
+        # Dev / no-hold path: credit immediately
+        w.available_balance += amount
+        w.save(update_fields=['available_balance', 'updated_at'])
+        Transaction.objects.create(
+            wallet=w,
+            transaction_type='deposit',
+            amount=amount,
+            reference_id=payment_intent,
+            description='Wallet deposit via Stripe',
+            is_processed=True,
+        )
+    else:
+        # Prod path: mark deposit as pending, Celery task will credit when ready
+        Transaction.objects.create(
+            wallet=w,
+            transaction_type='deposit',
+            amount=amount,
+            reference_id=payment_intent,
+            description='Wallet deposit via Stripe (pending hold)',
+            available_at=timezone.now() + timedelta(days=hold_days),
+            is_processed=False,
+        )
+
+
+def verify_identity(session):
+    """identity.verification_session.verified: promote the user to id_verified."""
+    from django.contrib.auth import get_user_model
+
+    user_id = (session.get('metadata') or {}).get('user_id')
+    if user_id:
+        get_user_model().objects.filter(id=user_id).update(verification_tier='id_verified')
+
+
+HANDLERS = {
+    'checkout.session.completed': credit_deposit,
+    'identity.verification_session.verified': verify_identity,
+}
+
+
+# ---------------------------------------------------------------------------
+# Consumer
+# ---------------------------------------------------------------------------
+
+def _backoff(attempts):
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def _first_pending_elsewhere(batch, now):
+    """
+    {user_ref: ((created, received_at), due)} for the earliest pending event
+    of each user in `batch` that is not in it; `due` is False while that
+    event is backing off or has used up its attempts.
+    """
+    from .models import StripeEvent
+
+    refs = {event.user_ref for event in batch if event.user_ref}
+    if not refs:
+        return {}
+    rows = (
+        StripeEvent.objects.filter(processed_at__isnull=True, user_ref__in=refs)
+        .exclude(pk__in=[event.pk for event in batch])
+        .order_by('user_ref', 'created', 'received_at')
+        .distinct('user_ref')
+        .values_list('user_ref', 'created', 'received_at', 'available_at', 'attempts')
+    )
+    max_attempts = _cfg('MAX_ATTEMPTS', 10)
+    return {
+        ref: ((created, received_at), available_at <= now and attempts < max_attempts)
+        for ref, created, received_at, available_at, attempts in rows
+    }
+
+
+def _run_batch(now):
+    """
+    Claim and apply one batch. Returns (claimed, applied, waiting), `waiting`
+    being whether an event was deferred behind one another worker holds.
+    """
+    from .models import StripeEvent
+
+    with transaction.atomic():
+        batch = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, available_at__lte=now, attempts__lt=_cfg('MAX_ATTEMPTS', 10))
+            .order_by('created', 'received_at')[:_cfg('BATCH_SIZE', 100)]
+        )
+        first_elsewhere = _first_pending_elsewhere(batch, now)
+        blocked = set()
+        done, failed = [], []
+        waiting = False
+        for event in batch:
+            ref = event.user_ref
+            earlier = first_elsewhere.get(ref)
+            if ref in blocked or (earlier and earlier[0] < (event.created, event.received_at)):
+                # An earlier event for this user has not been applied yet
+                blocked.add(ref)
+                waiting = waiting or bool(earlier and earlier[1])
+                metrics.incr('stripe.events.deferred')
+                continue
+            handler = HANDLERS.get(event.type)
+            try:
+                if handler is not None:
+                    with transaction.atomic():
+                        handler(event.payload['data']['object'])
+            except Exception as exc:
+                logger.warning('Stripe event %s (%s) failed', event.pk, event.type, exc_info=True)
+                event.attempts += 1
+                event.last_error = repr(exc)[:2000]
+                event.available_at = timezone.now() + _backoff(event.attempts)
+                failed.append(event)
+                if ref:
+                    blocked.add(ref)
+            else:
+                done.append(event.pk)
+                metrics.gauge_max(
+                    'stripe.events.apply_lag_seconds', (timezone.now() - event.received_at).total_seconds(),
+                )
+        if done:
+            StripeEvent.objects.filter(pk__in=done).update(processed_at=timezone.now())
+        if failed:
+            StripeEvent.objects.bulk_update(failed, ['attempts', 'last_error', 'available_at'])
+    metrics.incr('stripe.events.applied', len(done))
+    metrics.incr('stripe.events.failed', len(failed))
+    return len(batch), len(done), waiting
+
+
+def apply_pending(max_batches=50):
+    """Apply due events, batch by batch, until none are left. Returns how many were applied."""
+    now = timezone.now()
+    applied = 0
+    for _ in range(max_batches):
+        claimed, done, waiting = _run_batch(now)
+        applied += done
+        if claimed < _cfg('BATCH_SIZE', 100) or not done:
+            break
+    if waiting:
+        # Deferred behind another worker's batch: look again once it has committed
+        _nudge(countdown=1)
+    metrics.flush_if_due()
+    return applied
+
+
+def prune(now=None):
+    """Delete events processed more than RETENTION_DAYS ago. Returns how many were removed."""
+    from .models import StripeEvent
+
+    cutoff = (now or timezone.now()) - timedelta(days=_cfg('RETENTION_DAYS', 30))
+    return StripeEvent.objects.filter(processed_at__lt=cutoff).delete()[0]
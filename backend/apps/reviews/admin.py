@@ -1,10 +1,24 @@
 from django.contrib import admin
+from . import ratings
 from .models import Review
 
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('reviewer', 'reviewee', 'rating', 'booking', 'created_at')
-    list_filter = ('rating',)
+    list_display = ('reviewer', 'reviewee', 'rating', 'booking', 'is_flagged', 'created_at')
+    list_filter = ('rating', 'is_flagged')
     search_fields = ('reviewer__email', 'reviewee__email')
     ordering = ('-created_at',)
+    # Flag through the actions so the hauler's rating aggregates stay in step
+    readonly_fields = ('is_flagged', 'rating_bucket', 'rating_weight')
+    actions = ('flag_reviews', 'unflag_reviews')
+
+    @admin.action(description='Flag selected reviews (exclude from rating)')
+    def flag_reviews(self, request, queryset):
+        for review in queryset.select_related('reviewee', 'reviewer'):
+            ratings.set_flagged(review, True)
+
+    @admin.action(description='Unflag selected reviews')
+    def unflag_reviews(self, request, queryset):
+        for review in queryset.select_related('reviewee', 'reviewer'):
+            ratings.set_flagged(review, False)
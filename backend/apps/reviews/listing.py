@@ -0,0 +1,135 @@
+"""
+Public hauler review listing: GET /api/haulers/<id>/reviews/
+
+Responses are cursor-paginated (newest first) and carry a rating summary:
+
+    {"summary": {"rating_avg": "4.60", "review_count": 25,
+                 "histogram": {"1": 0, "2": 1, "3": 2, "4": 4, "5": 18}},
+     "next": "/api/haulers/<id>/reviews/?cursor=...", "previous": null,
+     "results": [...]}
+
+Flagged reviews are left out, matching rating_avg / review_count.
+
+The summary and each page are cached in Redis per hauler under a version
+number (reviews:hauler:<id>:v). Anything that changes the hauler's rating
+aggregates (apps.reviews.ratings) bumps the version once its transaction
+commits, so stale entries are never read again and simply expire. Links
+are relative so a cached page is valid whatever Host it was built under.
+
+Anonymous responses get `Cache-Control: public, max-age=...` so nginx can
+serve repeat hits without touching Django; authenticated ones are private.
+"""
+
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.pagination import CursorPagination
+
+from config.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _cfg(key, default):
+    return getattr(settings, 'REVIEWS', {}).get(key, default)
+
+
+class ReviewCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        return _cfg('PAGE_SIZE', 10)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        # next/previous relative to this host-independent path (see module docstring)
+        self.base_url = request.get_full_path()
+        return page
+
+
+def _version_key(hauler_id):
+    return f'reviews:hauler:{hauler_id}:v'
+
+
+def invalidate_hauler(hauler_id):
+    """Drop cached listings for a hauler once the current transaction commits."""
+    def bump():
+        try:
+            get_redis().incr(_version_key(hauler_id))
+        except redis.RedisError:
+            logger.warning('Could not invalidate review cache for hauler %s', hauler_id, exc_info=True)
+    transaction.on_commit(bump)
+
+
+def _cached(hauler_id, part, build):
+    """build() through the per-hauler cache; falls back to build() if Redis is unavailable."""
+    try:
+        r = get_redis()
+        key = f'reviews:hauler:{hauler_id}:{r.get(_version_key(hauler_id)) or 0}:{part}'
+        raw = r.get(key)
+        if raw is not None:
+            return json.loads(raw)
+    except redis.RedisError:
+        logger.warning('Review cache unavailable', exc_info=True)
+        return build()
+
+    value = build()
+    try:
+        r.set(key, json.dumps(value), ex=_cfg('CACHE_SECONDS', 300))
+    except redis.RedisError:
+        logger.warning('Could not cache reviews for hauler %s', hauler_id, exc_info=True)
+    return value
+
+
+def rating_summary(hauler_id):
+    from apps.users.models import HaulerProfile
+    from .models import Review
+
+    histogram = {str(rating): 0 for rating in range(1, 6)}
+    rows = (
+        Review.objects.filter(reviewee_id=hauler_id, is_flagged=False)
+        .order_by().values('rating').annotate(n=Count('id'))
+    )
+    for row in rows:
+        histogram[str(row['rating'])] = row['n']
+    rating_avg = HaulerProfile.objects.filter(user_id=hauler_id).values_list('rating_avg', flat=True).first()
+    return {
+        'rating_avg': f'{rating_avg or 0:.2f}',
+        'review_count': sum(histogram.values()),
+        'histogram': histogram,
+    }
+
+
+def _page(request, hauler_id):
+    from .models import Review
+    from .serializers import PublicReviewSerializer
+
+    paginator = ReviewCursorPagination()
+    reviews = Review.objects.filter(reviewee_id=hauler_id, is_flagged=False).select_related('reviewer')
+    page = paginator.paginate_queryset(reviews, request)
+    return {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': PublicReviewSerializer(page, many=True).data,
+    }
+
+
+def hauler_reviews_body(request, hauler_id):
+    cursor = request.query_params.get(ReviewCursorPagination.cursor_query_param, '')
+    body = {'summary': _cached(hauler_id, 'summary', lambda: rating_summary(hauler_id))}
+    body.update(_cached(hauler_id, f'page:{cursor}', lambda: _page(request, hauler_id)))
+    return body
+
+
+def add_cache_headers(request, response):
+    if request.auth is None:
+        patch_cache_control(response, public=True, max_age=_cfg('HTTP_MAX_AGE_SECONDS', 60))
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_review_is_flagged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='rating_bucket',
+            field=models.CharField(blank=True, choices=[('', 'Not counted'), ('recent', 'Recent (< 90 days)'), ('older', 'Older')], default='', max_length=6),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='rating_weight',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=2, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['rating_bucket', 'created_at'], name='review_bucket_created_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    """Count every unflagged review about a hauler into the rating buckets (apps.reviews.ratings)."""
+    Review = apps.get_model('reviews', 'Review')
+    HaulerProfile = apps.get_model('users', 'HaulerProfile')
+
+    cutoff = timezone.now() - timedelta(days=90)
+    for profile in HaulerProfile.objects.iterator():
+        sums = {'recent': [Decimal('0'), Decimal('0')], 'older': [Decimal('0'), Decimal('0')]}
+        ids = {}
+        reviews = Review.objects.filter(reviewee_id=profile.user_id, is_flagged=False).values_list(
+            'id', 'rating', 'created_at', 'reviewer__phone_verified',
+        )
+        for review_id, rating, created_at, verified in reviews:
+            bucket = 'recent' if created_at >= cutoff else 'older'
+            weight = Decimal('2.0') if bucket == 'recent' else Decimal('1.0')
+            if verified:
+                weight *= Decimal('1.5')
+            ids.setdefault((bucket, weight), []).append(review_id)
+            sums[bucket][0] += rating * weight
+            sums[bucket][1] += weight
+        for (bucket, weight), review_ids in ids.items():
+            Review.objects.filter(id__in=review_ids).update(rating_bucket=bucket, rating_weight=weight)
+
+        weight_total = sums['recent'][1] + sums['older'][1]
+        profile.rating_recent_sum, profile.rating_recent_weight = sums['recent']
+        profile.rating_older_sum, profile.rating_older_weight = sums['older']
+        profile.review_count = sum(len(review_ids) for review_ids in ids.values())
+        profile.rating_avg = (
+            round(float((sums['recent'][0] + sums['older'][0]) / weight_total), 2) if weight_total > 0 else 0
+        )
+        profile.save(update_fields=[
+            'rating_avg', 'review_count', 'rating_recent_sum', 'rating_recent_weight',
+            'rating_older_sum', 'rating_older_weight',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_review_rating_bucket_review_rating_weight_and_more'),
+        ('users', '0006_haulerprofile_rating_older_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
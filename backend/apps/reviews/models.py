@@ -5,6 +5,12 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 
 
 class Review(models.Model):
+    RATING_BUCKET_CHOICES = [
+        ('', 'Not counted'),
+        ('recent', 'Recent (< 90 days)'),
+        ('older', 'Older'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     booking = models.ForeignKey('bookings.Booking', on_delete=models.CASCADE, related_name='reviews')
     reviewer = models.ForeignKey(
@@ -20,11 +26,18 @@ class Review(models.Model):
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField(blank=True)
     is_flagged = models.BooleanField(default=False)  # flagged reviews excluded from rating_avg
+    # Which HaulerProfile rating bucket this review is counted in, and with what weight (apps.reviews.ratings)
+    rating_bucket = models.CharField(max_length=6, choices=RATING_BUCKET_CHOICES, blank=True, default='')
+    rating_weight = models.DecimalField(max_digits=2, decimal_places=1, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('booking', 'reviewer')
         ordering = ['-created_at']
+        indexes = [
+            # age_out_reviews: recent-bucket reviews past the 90-day boundary
+            models.Index(fields=['rating_bucket', 'created_at'], name='review_bucket_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.reviewer.full_name} → {self.reviewee.full_name}: {self.rating}/5'
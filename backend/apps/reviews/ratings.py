@@ -0,0 +1,220 @@
+"""
+Incremental maintenance of HaulerProfile.rating_avg / review_count.
+
+The rating is a weighted average over the hauler's unflagged reviews:
+  - Reviews < 90 days old:         weight ×2
+  - Reviews from verified clients: weight ×1.5  (reviewer.phone_verified)
+  - Flagged reviews:               excluded
+
+Rather than re-reading every review on each change, HaulerProfile keeps
+Σ rating·weight and Σ weight for two age buckets, 'recent' and 'older', and
+every counted review records the bucket and weight it contributed so it can
+be taken out again exactly:
+
+  count_review()       new / unflagged review -> added to its bucket
+  uncount_review()     flagged review         -> subtracted from its bucket
+  age_out_reviews()    periodic task          -> recent reviews past 90 days
+                                                 move to 'older' at half weight
+  reweight_reviewer()  phone verified         -> the reviewer's reviews ×1.5
+
+Each is a few queries no matter how many reviews the hauler has. Weights are
+1, 1.5, 2 or 3, so the sums are exact one-decimal Decimals and the average is
+computed from the same numbers a full recompute would produce.
+
+The old full recompute applied the 90-day cutoff as of each call. Every
+write to a hauler's aggregates here first ages out that hauler's own reviews
+past the cutoff, so the rating it stores is exactly the one a recompute at
+that moment would give. Between writes, a review crossing the cutoff stays
+in 'recent' until the hourly age_out_reviews run: a stored rating_avg lags
+the cutoff by at most an hour (the old one, recomputed only on a new review,
+could lag it indefinitely).
+
+All changes to a hauler's aggregates, and to the bucket/weight of reviews
+about them, happen under a row lock on their HaulerProfile, and invalidate
+the hauler's cached review listing (apps.reviews.listing) on commit.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.directory import refresh_rank_score
+from .listing import invalidate_hauler
+
+RECENT_DAYS = 90
+RECENT_FACTOR = Decimal('2.0')
+VERIFIED_FACTOR = Decimal('1.5')
+
+
+def review_weight(review, now=None):
+    """(bucket, weight) the review counts with right now."""
+    recent = review.created_at >= (now or timezone.now()) - timedelta(days=RECENT_DAYS)
+    weight = Decimal('1.0')
+    if recent:
+        weight *= RECENT_FACTOR
+    if getattr(review.reviewer, 'phone_verified', False):
+        weight *= VERIFIED_FACTOR
+    return ('recent' if recent else 'older'), weight
+
+
+def _locked_profile(reviewee_id):
+    from apps.users.models import HaulerProfile
+    return HaulerProfile.objects.select_for_update().get(user_id=reviewee_id)
+
+
+def _adjust(profile, deltas, count_delta=0):
+    """
+    Apply {bucket: (Δ Σ rating·weight, Δ Σ weight)} to a locked profile's
+    aggregates and refresh rating_avg and the directory rank_score.
+    """
+    for bucket, (weighted, weight) in deltas.items():
+        setattr(profile, f'rating_{bucket}_sum', getattr(profile, f'rating_{bucket}_sum') + weighted)
+        setattr(profile, f'rating_{bucket}_weight', getattr(profile, f'rating_{bucket}_weight') + weight)
+    profile.review_count += count_delta
+
+    weighted_sum = profile.rating_recent_sum + profile.rating_older_sum
+    weight_total = profile.rating_recent_weight + profile.rating_older_weight
+    profile.rating_avg = round(float(weighted_sum / weight_total), 2) if weight_total > 0 else 0
+    refresh_rank_score(profile)
+    profile.save(update_fields=[
+        'rating_avg', 'review_count', 'rating_recent_sum', 'rating_recent_weight',
+        'rating_older_sum', 'rating_older_weight', 'rank_score', 'updated_at',
+    ])
+    invalidate_hauler(profile.user_id)
+
+
+def _deltas():
+    return defaultdict(lambda: [Decimal('0'), Decimal('0')])
+
+
+def _to_older(bucket, weight):
+    return ('older', weight / RECENT_FACTOR) if bucket == 'recent' else (bucket, weight)
+
+
+def _stale(now, **filters):
+    """Counted reviews still in 'recent' that are past the 90-day cutoff at `now`."""
+    from .models import Review
+
+    cutoff = now - timedelta(days=RECENT_DAYS)
+    return Review.objects.filter(rating_bucket='recent', created_at__lt=cutoff, **filters)
+
+
+def _rebucket(reviews, reweigh, deltas):
+    """
+    Re-bucket/re-weight the counted reviews among `reviews` (a queryset, read
+    under the reviewee's lock). `reweigh(bucket, weight)` returns the new
+    (bucket, weight); the aggregate changes are added to `deltas`. Returns
+    how many reviews changed.
+    """
+    from .models import Review
+
+    rows = reviews.exclude(rating_bucket='').values_list('id', 'rating', 'rating_bucket', 'rating_weight')
+    updates = defaultdict(list)
+    for review_id, rating, bucket, weight in rows:
+        new_bucket, new_weight = reweigh(bucket, weight)
+        if (new_bucket, new_weight) == (bucket, weight):
+            continue
+        deltas[bucket][0] -= rating * weight
+        deltas[bucket][1] -= weight
+        deltas[new_bucket][0] += rating * new_weight
+        deltas[new_bucket][1] += new_weight
+        updates[(new_bucket, new_weight)].append(review_id)
+    for (bucket, weight), review_ids in updates.items():
+        Review.objects.filter(id__in=review_ids).update(rating_bucket=bucket, rating_weight=weight)
+    return sum(len(review_ids) for review_ids in updates.values())
+
+
+def count_review(review):
+    """Add an unflagged review about a hauler to their rating."""
+    with transaction.atomic():
+        profile = _locked_profile(review.reviewee_id)
+        review.refresh_from_db(fields=['is_flagged', 'rating_bucket'])
+        if review.is_flagged or review.rating_bucket:
+            return
+        now = timezone.now()
+        deltas = _deltas()
+        _rebucket(_stale(now, reviewee_id=review.reviewee_id), _to_older, deltas)
+        bucket, weight = review_weight(review, now)
+        review.rating_bucket, review.rating_weight = bucket, weight
+        review.save(update_fields=['rating_bucket', 'rating_weight'])
+        deltas[bucket][0] += review.rating * weight
+        deltas[bucket][1] += weight
+        _adjust(profile, deltas, count_delta=1)
+
+
+def uncount_review(review):
+    """Take a review back out of the hauler's rating (e.g. it was flagged)."""
+    with transaction.atomic():
+        profile = _locked_profile(review.reviewee_id)
+        review.refresh_from_db(fields=['rating_bucket', 'rating_weight'])
+        if not review.rating_bucket:
+            return
+        deltas = _deltas()
+        _rebucket(_stale(timezone.now(), reviewee_id=review.reviewee_id), _to_older, deltas)
+        # Re-read: aging out may just have moved this review too
+        review.refresh_from_db(fields=['rating_bucket', 'rating_weight'])
+        bucket, weight = review.rating_bucket, review.rating_weight
+        review.rating_bucket, review.rating_weight = '', None
+        review.save(update_fields=['rating_bucket', 'rating_weight'])
+        deltas[bucket][0] -= review.rating * weight
+        deltas[bucket][1] -= weight
+        _adjust(profile, deltas, count_delta=-1)
+
+
+def set_flagged(review, flagged):
+    """Flag or unflag a review, keeping the reviewee's rating in step."""
+    if review.is_flagged == flagged:
+        return
+    review.is_flagged = flagged
+    with transaction.atomic():
+        review.save(update_fields=['is_flagged'])
+        if flagged:
+            uncount_review(review)
+        elif review.reviewee.user_type == 'hauler':
+            count_review(review)
+
+
+def _move(reviews, reweigh, now=None):
+    """
+    Re-bucket/re-weight counted reviews. `reweigh(bucket, weight)` returns the
+    new (bucket, weight); one locked aggregate update per hauler, which also
+    ages out the hauler's reviews past the cutoff at `now`.
+    """
+    from .models import Review
+
+    now = now or timezone.now()
+    by_reviewee = defaultdict(list)
+    for review_id, reviewee_id in reviews.values_list('id', 'reviewee_id'):
+        by_reviewee[reviewee_id].append(review_id)
+
+    moved = 0
+    for reviewee_id, ids in by_reviewee.items():
+        with transaction.atomic():
+            profile = _locked_profile(reviewee_id)
+            deltas = _deltas()
+            aged = _rebucket(_stale(now, reviewee_id=reviewee_id), _to_older, deltas)
+            # Re-read under the lock: a flag may have landed since the scan
+            changed = _rebucket(Review.objects.filter(id__in=ids), reweigh, deltas)
+            if aged or changed:
+                _adjust(profile, deltas)
+            moved += aged + changed
+    return moved
+
+
+def age_out_reviews(now=None):
+    """Move recent-bucket reviews older than 90 days to 'older'. Returns how many moved."""
+    now = now or timezone.now()
+    return _move(_stale(now), _to_older, now)
+
+
+def reweight_reviewer(reviewer):
+    """Apply the verified-client weight to reviews `reviewer` wrote before verifying."""
+    from .models import Review
+
+    counted = Review.objects.filter(reviewer=reviewer).exclude(rating_bucket='')
+    unverified = {Decimal('1.0'), RECENT_FACTOR}
+    return _move(counted, lambda bucket, weight: (bucket, weight * VERIFIED_FACTOR) if weight in unverified
+                 else (bucket, weight))
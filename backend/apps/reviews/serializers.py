@@ -11,3 +11,20 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = ['id', 'booking', 'reviewer', 'reviewee', 'rating', 'comment', 'created_at']
         read_only_fields = ['id', 'reviewer', 'reviewee', 'booking', 'created_at']
+
+
+class PublicReviewerSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    full_name = serializers.CharField()
+
+
+class PublicReviewSerializer(serializers.ModelSerializer):
+    """Review as shown on a public hauler profile: no contact details, safe for shared caches."""
+    reviewer = PublicReviewerSerializer(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'reviewer', 'rating', 'comment', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,18 @@
+"""
+Celery tasks for the reviews app.
+"""
+
+from celery import shared_task
+
+
+@shared_task
+def age_out_review_ratings():
+    """
+    Move reviews that have passed the 90-day mark out of the "recent ×2"
+    rating bucket and refresh the affected haulers' rating_avg
+    (apps.reviews.ratings). Runs hourly via Celery Beat.
+    """
+    from .ratings import age_out_reviews
+
+    moved = age_out_reviews()
+    return f'Moved {moved} review(s) out of the recent rating bucket.'
@@ -0,0 +1,145 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.jobs.models import Job
+from apps.users.models import HaulerProfile, User
+
+from . import ratings
+from .models import Review
+
+
+def full_recompute(hauler, now):
+    """The rating the pre-bucket _update_hauler_rating computed at `now`: (rating_avg, review_count, Σ, Σ weight)."""
+    weighted_sum = weight_total = Decimal('0')
+    count = 0
+    for review in Review.objects.filter(reviewee=hauler, is_flagged=False).select_related('reviewer'):
+        weight = Decimal('1.0')
+        if review.created_at >= now - timedelta(days=90):
+            weight *= Decimal('2.0')
+        if review.reviewer.phone_verified:
+            weight *= Decimal('1.5')
+        weighted_sum += Decimal(str(review.rating)) * weight
+        weight_total += weight
+        count += 1
+    avg = round(float(weighted_sum / weight_total), 2) if weight_total > 0 else 0
+    return avg, count, weighted_sum, weight_total
+
+
+class IncrementalRatingTests(TestCase):
+    """
+    Random count / uncount / reweight / age-out sequences against a full
+    recompute. Every write to a hauler's aggregates must leave exactly what
+    the old formula would give at that moment; after age_out_reviews, every
+    hauler's must.
+    """
+
+    STEPS = 250
+
+    def setUp(self):
+        self.clock = timezone.now()
+        patcher = mock.patch.object(ratings.timezone, 'now', lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertMatchesRecompute(self, hauler, step):
+        profile = HaulerProfile.objects.get(user=hauler)
+        stored = (
+            float(profile.rating_avg), profile.review_count,
+            profile.rating_recent_sum + profile.rating_older_sum,
+            profile.rating_recent_weight + profile.rating_older_weight,
+        )
+        self.assertEqual(stored, full_recompute(hauler, self.clock), f'step {step}')
+
+    def _review(self, rng, hauler, client):
+        job = Job.objects.create(
+            client=client, title='Move', description='-', category='other', budget=Decimal('10'),
+            country='US', city='Austin', scheduled_date=self.clock,
+        )
+        booking = Booking.objects.create(
+            job=job, client=client, hauler=hauler, amount=Decimal('10'), status='completed',
+        )
+        review = Review.objects.create(booking=booking, reviewer=client, reviewee=hauler, rating=rng.randint(1, 5))
+        # Straddle the 90-day cutoff
+        age = timedelta(days=rng.choice([0, 0, 30, 89, 90, 91, 200]), hours=rng.randint(0, 23))
+        Review.objects.filter(id=review.id).update(created_at=self.clock - age)
+        review.refresh_from_db()
+        return review
+
+    def _run(self, seed):
+        rng = random.Random(seed)
+        haulers = [
+            User.objects.create_user(
+                email=f'hauler-{seed}-{i}@example.com', first_name='H', last_name=str(i), user_type='hauler',
+            )
+            for i in range(3)
+        ]
+        for hauler in haulers:
+            HaulerProfile.objects.get_or_create(user=hauler)
+        clients = [
+            User.objects.create_user(
+                email=f'client-{seed}-{i}@example.com', first_name='C', last_name=str(i), user_type='client',
+                phone_verified=rng.random() < 0.3,
+            )
+            for i in range(8)
+        ]
+        reviews = []
+
+        for step in range(self.STEPS):
+            op = rng.random()
+            if op < 0.45:
+                review = self._review(rng, rng.choice(haulers), rng.choice(clients))
+                ratings.count_review(review)
+                reviews.append(review.id)
+                self.assertMatchesRecompute(review.reviewee, step)
+            elif op < 0.65 and reviews:
+                review = Review.objects.select_related('reviewee').get(id=rng.choice(reviews))
+                ratings.set_flagged(review, not review.is_flagged)
+                self.assertMatchesRecompute(review.reviewee, step)
+            elif op < 0.72:
+                client = rng.choice(clients)
+                if client.phone_verified:
+                    continue
+                client.phone_verified = True
+                client.save(update_fields=['phone_verified'])
+                ratings.reweight_reviewer(client)
+                reviewed = User.objects.filter(received_reviews__reviewer=client, received_reviews__is_flagged=False)
+                for hauler in reviewed.distinct():
+                    self.assertMatchesRecompute(hauler, step)
+            else:
+                self.clock += timedelta(hours=rng.choice([1, 6, 24, 24 * 10]))
+                if rng.random() < 0.5:
+                    ratings.age_out_reviews()
+                    for hauler in haulers:
+                        self.assertMatchesRecompute(hauler, step)
+
+        ratings.age_out_reviews()
+        for hauler in haulers:
+            self.assertMatchesRecompute(hauler, self.STEPS)
+
+    def test_random_sequences_match_full_recompute(self):
+        for seed in (1, 2, 3):
+            with self.subTest(seed=seed):
+                self._run(seed)
+
+    def test_age_out_lag_is_bounded_by_the_next_write(self):
+        hauler = User.objects.create_user(email='h@example.com', first_name='H', last_name='L', user_type='hauler')
+        client = User.objects.create_user(email='c@example.com', first_name='C', last_name='L', user_type='client')
+        HaulerProfile.objects.get_or_create(user=hauler)
+        rng = random.Random(0)
+        first = self._review(rng, hauler, client)
+        Review.objects.filter(id=first.id).update(created_at=self.clock - timedelta(days=90) + timedelta(minutes=30))
+        first.refresh_from_db()
+        ratings.count_review(first)
+        self.assertEqual(Review.objects.get(id=first.id).rating_bucket, 'recent')
+
+        # Past the cutoff, no age_out run yet: the next write for the hauler still ages it out
+        self.clock += timedelta(hours=1)
+        ratings.count_review(self._review(rng, hauler, client))
+        self.assertEqual(Review.objects.get(id=first.id).rating_bucket, 'older')
+        self.assertMatchesRecompute(hauler, 'second review')
@@ -1,14 +1,16 @@
+import math
 from datetime import timedelta
-from decimal import Decimal
 
 from django.conf import settings
-from django.db.models import Avg, ExpressionWrapper, FloatField, Case, When, Value
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 
+from config.ratelimit import RollingWindow
 from config.throttles import ReviewThrottle
+from . import ratings
 from .models import Review
 from .serializers import ReviewSerializer
 from apps.bookings.models import Booking
@@ -16,48 +18,6 @@ from apps.bookings.models import Booking
 SEC = settings.SECURITY
 
 
-def _update_hauler_rating(reviewee):
-    """
-    Recompute HaulerProfile rating using a weighted average:
-      - Reviews < 90 days old:        weight 2
-      - Reviews from verified clients: weight 1.5
-      - Flagged reviews:               weight 0  (excluded)
-    review_count counts only unflagged reviews.
-    """
-    from apps.users.models import HaulerProfile
-
-    unflagged = Review.objects.filter(reviewee=reviewee, is_flagged=False)
-
-    if not unflagged.exists():
-        profile = reviewee.hauler_profile
-        profile.rating_avg = 0
-        profile.review_count = 0
-        profile.save(update_fields=['rating_avg', 'review_count', 'updated_at'])
-        return
-
-    now = timezone.now()
-    cutoff_90 = now - timedelta(days=90)
-
-    weighted_sum = Decimal('0')
-    weight_total = Decimal('0')
-
-    for review in unflagged.select_related('reviewer'):
-        w = Decimal('1.0')
-        if review.created_at >= cutoff_90:
-            w *= Decimal('2.0')
-        if getattr(review.reviewer, 'phone_verified', False):
-            w *= Decimal('1.5')
-        weighted_sum += Decimal(str(review.rating)) * w
-        weight_total += w
-
-    avg = float(weighted_sum / weight_total) if weight_total > 0 else 0
-
-    profile = reviewee.hauler_profile
-    profile.rating_avg = round(avg, 2)
-    profile.review_count = unflagged.count()
-    profile.save(update_fields=['rating_avg', 'review_count', 'updated_at'])
-
-
 @api_view(['POST'])
 @throttle_classes([ReviewThrottle])
 def create_review(request):
@@ -96,13 +56,6 @@ def create_review(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Daily velocity gate (max 5 reviews per user per day)
-    from django.core.cache import cache
-    velocity_key = f'review_velocity:{request.user.id}'
-    today_count = int(cache.get(velocity_key) or 0)
-    if today_count >= 5:
-        return Response({'error': 'Daily review limit reached (5 per day).'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
     if Review.objects.filter(booking=booking, reviewer=request.user).exists():
         return Response({'error': 'You have already reviewed this booking.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -110,14 +63,29 @@ def create_review(request):
 
     serializer = ReviewSerializer(data=request.data)
     if serializer.is_valid():
-        review = serializer.save(booking=booking, reviewer=request.user, reviewee=reviewee)
-
-        # Increment daily velocity counter (24hr TTL)
-        cache.set(velocity_key, today_count + 1, timeout=86400)
-
-        # Update hauler rating using weighted average
-        if reviewee.user_type == 'hauler':
-            _update_hauler_rating(reviewee)
+        # Velocity gate (max 5 reviews per user in any 24 hours), spent only by valid reviews
+        velocity = RollingWindow(f'review_velocity:{request.user.id}', 86400)
+        wait = velocity.consume(5)
+        if wait:
+            return Response(
+                {'error': 'Review limit reached (5 per 24 hours).'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(math.ceil(wait))},
+            )
+
+        try:
+            with transaction.atomic():
+                review = serializer.save(booking=booking, reviewer=request.user, reviewee=reviewee)
+                # Fold into the hauler's weighted rating aggregates (apps.reviews.ratings)
+                if reviewee.user_type == 'hauler':
+                    ratings.count_review(review)
+        except IntegrityError:
+            # A concurrent request saved this booking's review first
+            velocity.refund()
+            return Response({'error': 'You have already reviewed this booking.'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            velocity.refund()
+            raise
 
         return Response(ReviewSerializer(review).data, status=status.HTTP_201_CREATED)
 
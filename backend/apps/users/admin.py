@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, HaulerProfile
+from .authentication import revoke_tokens
+from .models import User, HaulerProfile, FraudGraphNode
 
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     list_display = ('email', 'first_name', 'last_name', 'user_type', 'auth_provider', 'is_active', 'created_at')
-    list_filter = ('user_type', 'auth_provider', 'is_active', 'is_staff')
+    list_filter = ('user_type', 'auth_provider', 'is_active', 'is_staff', 'is_suspicious')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('-created_at',)
     fieldsets = (
@@ -22,8 +23,21 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Access tokens carry these as claims: deactivation / staff / type changes apply at once
+        if change and {'is_active', 'is_staff', 'user_type'} & set(form.changed_data):
+            revoke_tokens(obj)
+
 
 @admin.register(HaulerProfile)
 class HaulerProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'rating_avg', 'review_count')
     search_fields = ('user__email', 'user__first_name')
+
+
+@admin.register(FraudGraphNode)
+class FraudGraphNodeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'component', 'updated_at')
+    search_fields = ('user__email', '=component')
+    readonly_fields = ('user', 'component', 'updated_at')
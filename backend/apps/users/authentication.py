@@ -0,0 +1,133 @@
+"""
+Stateless JWT authentication: the user comes from the access token, not from
+a query.
+
+Tokens issued by for_user() carry the fields most requests need (CLAIMS) plus
+the user's token_version ('tv'). ClaimsJWTAuthentication turns those into a
+ClaimsUser — a real User instance with only the claimed fields loaded. The
+first access to any other field loads the rest of the row in one query, so
+views that need the full user (serializers, .save()) still work unchanged.
+
+Revocation: bumping User.token_version (revoke_tokens, on every
+account_status change and on admin changes to a claimed field) invalidates
+every token issued before it. Each request compares the token's 'tv' with
+the current version, read from Redis
+(auth:user:<id>:tv, cached for SECURITY['TOKEN_VERSION_CACHE_SECONDS']) and
+from the database on a miss. revoke_tokens writes the new version to Redis
+as its transaction commits, so revocation takes effect on the next request;
+if Redis is unreachable every check falls back to the database.
+
+Claims are refreshed whenever tokens are (login, /api/auth/refresh/), so a
+change to a claimed field that does not revoke tokens (e.g. a new name) shows
+up in request.user within ACCESS_TOKEN_LIFETIME. Tokens issued before claims
+existed carry no 'tv' and are authenticated the old way, with a query.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# User fields carried in the token, besides the id and 'tv'
+CLAIMS = ('user_type', 'account_status', 'is_staff', 'is_active', 'first_name', 'last_name')
+VERSION_CLAIM = 'tv'
+
+
+def _version_key(user_id):
+    return f'auth:user:{user_id}:tv'
+
+
+def _cache_seconds():
+    return settings.SECURITY.get('TOKEN_VERSION_CACHE_SECONDS', 300)
+
+
+def for_user(user):
+    """A RefreshToken for `user` whose claims (and its access token's) describe the user."""
+    refresh = RefreshToken.for_user(user)
+    for claim in CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    refresh[VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+def _db_version(user_id):
+    from .models import User
+    return User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+
+
+def current_version(user_id):
+    """The user's token_version (None if the user is gone), through the Redis cache."""
+    key = _version_key(user_id)
+    try:
+        r = get_redis()
+        cached = r.get(key)
+        if cached is not None:
+            return int(cached)
+    except redis.RedisError:
+        logger.warning('Token version cache unavailable', exc_info=True)
+        return _db_version(user_id)
+
+    version = _db_version(user_id)
+    if version is not None:
+        try:
+            # NX: never overwrite a newer version published by revoke_tokens meanwhile
+            r.set(key, version, ex=_cache_seconds(), nx=True)
+        except redis.RedisError:
+            logger.warning('Could not cache token version for user %s', user_id, exc_info=True)
+    return version
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to `user` so far, from the next request on."""
+    from .models import User
+
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.token_version = _db_version(user.pk)
+    version = user.token_version
+
+    def publish():
+        try:
+            get_redis().set(_version_key(user.pk), version, ex=_cache_seconds())
+        except redis.RedisError:
+            logger.warning('Could not publish token version for user %s', user.pk, exc_info=True)
+    transaction.on_commit(publish)
+
+
+def user_from_claims(token):
+    """ClaimsUser built from a validated token, or None if the token predates claims."""
+    from .models import ClaimsUser
+
+    if VERSION_CLAIM not in token or any(claim not in token for claim in CLAIMS):
+        return None
+    claimed = {claim: token[claim] for claim in CLAIMS}
+    claimed['id'] = ClaimsUser._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    claimed['token_version'] = token[VERSION_CLAIM]
+    # from_db() wants the values in field order; the fields left out are deferred
+    fields = [f.attname for f in ClaimsUser._meta.concrete_fields if f.attname in claimed]
+    return ClaimsUser.from_db(router.db_for_read(ClaimsUser), fields, [claimed[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that takes the user from the token's claims (see module docstring)."""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user = user_from_claims(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if current_version(user.pk) != user.token_version:
+            raise InvalidToken('Token has been revoked')
+        return user
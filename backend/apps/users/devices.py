@@ -0,0 +1,79 @@
+"""
+Device fingerprint bookkeeping (DeviceSession).
+
+There is one row per (user, fingerprint). Each login upserts it in a single
+INSERT ... ON CONFLICT statement on the (user, fingerprint) unique index:
+  - new device:   the row is inserted
+  - known device: login_count is bumped and last_seen / ip_address are
+                  updated. recent_ips keeps the last RECENT_IPS distinct IPs,
+                  newest first.
+Logging in repeatedly from one device therefore never grows the table.
+
+prune_stale() is the retention job: it deletes devices not used for
+SECURITY['DEVICE_SESSION_RETENTION_DAYS'], in batches.
+"""
+
+import ipaddress
+import json
+import uuid
+
+from django.db import connection
+from django.utils import timezone
+
+RECENT_IPS = 5
+PRUNE_BATCH = 5_000
+
+
+def _normalise_ip(ip):
+    try:
+        return str(ipaddress.ip_address((ip or '').strip()))
+    except ValueError:
+        return None
+
+
+def record_login(user, fingerprint, ip=None):
+    """Upsert the (user, fingerprint) row for a login from `ip`."""
+    from .models import DeviceSession
+
+    table = DeviceSession._meta.db_table
+    ip = _normalise_ip(ip)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} AS d
+                (id, user_id, fingerprint, ip_address, recent_ips, login_count, first_seen, last_seen)
+            VALUES (%s, %s, %s, %s, %s::jsonb, 1, %s, %s)
+            ON CONFLICT (user_id, fingerprint) DO UPDATE SET
+                login_count = d.login_count + 1,
+                last_seen = EXCLUDED.last_seen,
+                ip_address = COALESCE(EXCLUDED.ip_address, d.ip_address),
+                recent_ips = CASE
+                    WHEN EXCLUDED.ip_address IS NULL THEN d.recent_ips
+                    ELSE jsonb_path_query_array(
+                        EXCLUDED.recent_ips || (d.recent_ips - (EXCLUDED.recent_ips ->> 0)),
+                        '$[0 to {RECENT_IPS - 1}]'
+                    )
+                END
+            """,
+            [uuid.uuid4(), user.pk, fingerprint[:128], ip, json.dumps([ip] if ip else []), now, now],
+        )
+
+
+def prune_stale(now=None):
+    """Delete devices not seen within the retention period. Returns how many were removed."""
+    from datetime import timedelta
+
+    from django.conf import settings
+
+    from .models import DeviceSession
+
+    days = settings.SECURITY.get('DEVICE_SESSION_RETENTION_DAYS', 365)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    removed = 0
+    while True:
+        stale = DeviceSession.objects.filter(last_seen__lt=cutoff).order_by()
+        ids = list(stale.values_list('id', flat=True)[:PRUNE_BATCH])
+        if not ids:
+            return removed
+        removed += DeviceSession.objects.filter(id__in=ids).delete()[0]
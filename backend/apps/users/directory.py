@@ -0,0 +1,119 @@
+"""
+Public hauler directory: GET /api/haulers/
+
+    ?city=Sofia&country=BG&skills=IKEA Assembly,Packing&min_rating=4&max_no_shows=0&cursor=...
+
+Results are ordered by HaulerProfile.rank_score, a precomputed score kept
+up to date wherever its inputs change (rating aggregates in
+apps.reviews.ratings, no-show strikes in apps.users.strikes):
+
+    Bayesian-smoothed rating    (PRIOR_WEIGHT * PRIOR_RATING + rating_avg * review_count)
+                                / (PRIOR_WEIGHT + review_count)
+    minus a no-show penalty     NO_SHOW_PENALTY * no_show_count
+
+so a single 5-star review does not outrank fifty 4.8s. Pages are keyset
+paginated on (rank_score, id) — the cursor is the last row's position, never
+an offset — and every page is one query whatever the directory size:
+
+  skills      JSONB containment (skills @> [...]), GIN index (jsonb_path_ops)
+  city        UPPER(city) expression index on users_user
+  ordering    (rank_score DESC, id DESC) index on HaulerProfile
+"""
+
+import base64
+from decimal import Decimal
+
+PRIOR_RATING = Decimal('3.5')
+PRIOR_WEIGHT = 5
+NO_SHOW_PENALTY = Decimal('0.5')
+PAGE_SIZE = 20
+MAX_SKILLS = 10
+
+# Haulers that cannot currently take bookings are not listed
+HIDDEN_STATUSES = ('suspended', 'banned')
+
+
+def rank_score(rating_avg, review_count, no_show_count):
+    rating_avg = Decimal(str(rating_avg))
+    smoothed = (PRIOR_WEIGHT * PRIOR_RATING + rating_avg * review_count) / (PRIOR_WEIGHT + review_count)
+    return (smoothed - NO_SHOW_PENALTY * no_show_count).quantize(Decimal('0.0001'))
+
+
+def refresh_rank_score(profile):
+    """Set profile.rank_score from its current fields; the caller saves it."""
+    profile.rank_score = rank_score(profile.rating_avg, profile.review_count, profile.no_show_count)
+
+
+class DirectoryQueryError(Exception):
+    pass
+
+
+def _number(params, key, cast, low, high=None):
+    raw = params.get(key)
+    if not raw:
+        return None
+    try:
+        value = cast(raw)
+        if value < low or (high is not None and value > high):
+            raise ValueError
+    except (ValueError, ArithmeticError):
+        bounds = f'between {low} and {high}' if high is not None else f'{low} or more'
+        raise DirectoryQueryError(f'{key} must be a number {bounds}.')
+    return value
+
+
+def encode_cursor(profile):
+    return base64.urlsafe_b64encode(f'{profile.rank_score}|{profile.id}'.encode()).decode()
+
+
+def decode_cursor(value):
+    try:
+        score, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        score = Decimal(score)
+        if not score.is_finite():
+            raise ValueError
+        return score, int(pk)
+    except (ValueError, ArithmeticError):
+        raise DirectoryQueryError('Invalid cursor.')
+
+
+def search(params):
+    """
+    (profiles, next_cursor) for the query params. Raises DirectoryQueryError
+    on malformed input.
+    """
+    from django.db.models import Q
+
+    from .models import HaulerProfile
+
+    qs = HaulerProfile.objects.filter(
+        user__user_type='hauler', user__is_active=True,
+    ).exclude(user__account_status__in=HIDDEN_STATUSES)
+
+    city = params.get('city', '').strip()
+    country = params.get('country', '').strip()
+    if city:
+        qs = qs.filter(user__city__iexact=city)
+    if country:
+        qs = qs.filter(user__country__iexact=country)
+
+    skills = [s.strip() for s in params.get('skills', '').split(',') if s.strip()]
+    if len(skills) > MAX_SKILLS:
+        raise DirectoryQueryError(f'At most {MAX_SKILLS} skills.')
+    if skills:
+        qs = qs.filter(skills__contains=skills)
+
+    min_rating = _number(params, 'min_rating', Decimal, 0, 5)
+    if min_rating is not None:
+        qs = qs.filter(rating_avg__gte=min_rating)
+    max_no_shows = _number(params, 'max_no_shows', int, 0)
+    if max_no_shows is not None:
+        qs = qs.filter(no_show_count__lte=max_no_shows)
+
+    if params.get('cursor'):
+        score, pk = decode_cursor(params['cursor'])
+        qs = qs.filter(Q(rank_score__lt=score) | Q(rank_score=score, id__lt=pk))
+
+    rows = list(qs.select_related('user').order_by('-rank_score', '-id')[:PAGE_SIZE + 1])
+    page = rows[:PAGE_SIZE]
+    return page, (encode_cursor(page[-1]) if len(rows) > PAGE_SIZE else None)
@@ -0,0 +1,273 @@
+"""
+Fraud-ring detection over shared devices and login IPs.
+
+Users are nodes; two users are linked when they have logged in with the same
+device fingerprint or from the same IP address (DeviceSession.fingerprint /
+recent_ips). A fraud ring is a connected component of that graph, so
+accounts that never share a device directly (A and B on one phone, B and C
+on one laptop) still end up together. A booking whose client and hauler are in the same component is a
+ring trading with itself: the booking and every member of the component are
+flagged (is_suspicious) for manual review.
+
+Components are persisted as FraudGraphNode(user, component), where the
+component id is the user id of one of its members. Users linked to nobody
+have no row. Each run (apps.users.tasks.update_fraud_graph) is incremental:
+
+  1. Stream the DeviceSession rows used since the FraudGraphScan watermark
+     (last_seen), in one server-side cursor pass, grouping users by
+     fingerprint / IP.
+  2. Add the other users that have those keys (one query per KEY_BATCH
+     keys; IPs through the GIN index on recent_ips), then union each
+     group in an in-memory union-find (union by size, path halving).
+  3. Union in the stored components of every touched user, then write the
+     result back: merged components are relabelled with one UPDATE each,
+     newly linked users are inserted.
+  4. Flag bookings between members of the same component.
+
+Work is proportional to the devices used since the last run plus the size
+of the components they merge, not to the whole table. The first run covers
+everything.
+
+Fingerprints / IPs shared by more than MAX_KEY_USERS accounts (public Wi-Fi,
+carrier NAT, a shop's demo device) say nothing about who knows whom and
+would fuse unrelated users into one giant component, so they are ignored.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+LINK_FIELDS = ('fingerprint', 'ip')
+MAX_KEY_USERS = 20
+SETTLE = timedelta(minutes=5)
+STREAM_CHUNK = 20_000
+KEY_BATCH = 5_000
+
+
+class UnionFind:
+    """Disjoint sets over hashable ids, union by size with path halving."""
+
+    __slots__ = ('parent', 'size')
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+    def groups(self):
+        """{root: [members]} for every set with more than one member."""
+        out = defaultdict(list)
+        for x in self.parent:
+            root = self.find(x)
+            if self.size[root] > 1:
+                out[root].append(x)
+        return out
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _hot_keys(keys, field):
+    """The keys in `keys` stored for more than MAX_KEY_USERS distinct users (whole table)."""
+    from django.db import connection
+
+    from .models import DeviceSession
+
+    hot = set()
+    for batch in _batches(keys, KEY_BATCH):
+        if field == 'fingerprint':
+            hot.update(
+                DeviceSession.objects.filter(fingerprint__in=batch).order_by()
+                .values('fingerprint').annotate(n=Count('user_id', distinct=True)).filter(n__gt=MAX_KEY_USERS)
+                .values_list('fingerprint', flat=True)
+            )
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT e.ip FROM {DeviceSession._meta.db_table} d
+                    CROSS JOIN jsonb_array_elements_text(d.recent_ips) e(ip)
+                    WHERE d.recent_ips ?| %s::text[] AND e.ip = ANY(%s::text[])
+                    GROUP BY e.ip HAVING count(DISTINCT d.user_id) > %s
+                    """,
+                    [batch, batch, MAX_KEY_USERS],
+                )
+                hot.update(ip for ip, in cursor.fetchall())
+    return hot
+
+
+def _earlier_users(keys, field):
+    """Yield (key, user_id) for every stored device that has one of `keys` (whole table)."""
+    from .models import DeviceSession
+
+    for batch in _batches(keys, KEY_BATCH):
+        if field == 'fingerprint':
+            yield from DeviceSession.objects.filter(fingerprint__in=batch).values_list('fingerprint', 'user_id')
+        else:
+            wanted = set(batch)
+            rows = DeviceSession.objects.filter(recent_ips__has_any_keys=batch).values_list('user_id', 'recent_ips')
+            for user_id, ips in rows:
+                for ip in wanted.intersection(ips):
+                    yield ip, user_id
+
+
+def _link_sessions(uf, sessions, since):
+    """Union users in `sessions` by shared keys, and with earlier users of those keys. Returns rows seen."""
+    users = {field: defaultdict(set) for field in LINK_FIELDS}
+    seen = 0
+    rows = sessions.order_by().values_list('user_id', 'fingerprint', 'recent_ips')
+    for user_id, fingerprint, ips in rows.iterator(chunk_size=STREAM_CHUNK):
+        seen += 1
+        uf.add(user_id)
+        users['fingerprint'][fingerprint].add(user_id)
+        for ip in ips:
+            users['ip'][ip].add(user_id)
+
+    if since is not None:
+        # Devices not touched this run that share a key with one that was. Keys
+        # that are already too common are dropped first rather than fetched.
+        for field, by_key in users.items():
+            for key in _hot_keys(list(by_key), field):
+                del by_key[key]
+            for key, user_id in _earlier_users(list(by_key), field):
+                by_key[key].add(user_id)
+
+    for by_key in users.values():
+        for members in by_key.values():
+            if 1 < len(members) <= MAX_KEY_USERS:
+                first, *rest = members
+                uf.add(first)
+                for user_id in rest:
+                    uf.add(user_id)
+                    uf.union(first, user_id)
+    return seen
+
+
+def _store(uf):
+    """Merge the in-memory sets into FraudGraphNode. Returns the ids of the components written."""
+    from .models import FraudGraphNode
+
+    linked = [x for members in uf.groups().values() for x in members]
+    stored = {}
+    for batch in _batches(linked, KEY_BATCH):
+        stored.update(FraudGraphNode.objects.filter(user_id__in=batch).values_list('user_id', 'component'))
+    # A stored component is a set in its own right: join it to its touched members
+    for user_id, component in stored.items():
+        uf.add(component)
+        uf.union(user_id, component)
+    sizes = {}
+    for batch in _batches(set(stored.values()), KEY_BATCH):
+        sizes.update(
+            FraudGraphNode.objects.filter(component__in=batch).order_by()
+            .values('component').annotate(n=Count('user_id')).values_list('component', 'n')
+        )
+
+    written = set()
+    new_nodes = []
+    for members in uf.groups().values():
+        components = {stored[x] for x in members if x in stored}
+        # Keep the largest stored label so the fewest rows are rewritten
+        target = max(components, key=lambda c: (sizes.get(c, 0), str(c))) if components else min(members, key=str)
+        for component in components - {target}:
+            FraudGraphNode.objects.filter(component=component).update(component=target, updated_at=timezone.now())
+        new_nodes.extend(
+            FraudGraphNode(user_id=x, component=target)
+            for x in members if x not in stored and x not in components
+        )
+        written.add(target)
+    FraudGraphNode.objects.bulk_create(new_nodes, batch_size=KEY_BATCH, ignore_conflicts=True)
+    return written
+
+
+def _flag_trading(components):
+    """Flag bookings inside any of `components`, and every member of those that have one. Returns bookings flagged."""
+    from apps.bookings.models import Booking
+    from .models import FraudGraphNode, User
+
+    flagged_components = set()
+    flagged_bookings = 0
+    for batch in _batches(components, KEY_BATCH):
+        members = FraudGraphNode.objects.filter(component__in=batch).values('user_id')
+
+        def component_of(party):
+            return Subquery(FraudGraphNode.objects.filter(user_id=OuterRef(party)).values('component'))
+
+        trades = list(
+            Booking.objects.exclude(status='cancelled')
+            .filter(is_suspicious=False, client_id__in=members, hauler_id__in=members)
+            .annotate(client_component=component_of('client_id'), hauler_component=component_of('hauler_id'))
+            .filter(client_component=F('hauler_component'))
+            .order_by().values_list('id', 'client_component')
+        )
+        if not trades:
+            continue
+        flagged_bookings += Booking.objects.filter(id__in=[pk for pk, _ in trades]).update(is_suspicious=True)
+        flagged_components.update(component for _, component in trades)
+
+    for batch in _batches(flagged_components, KEY_BATCH):
+        User.objects.filter(
+            is_suspicious=False, id__in=FraudGraphNode.objects.filter(component__in=batch).values('user_id'),
+        ).update(is_suspicious=True)
+    return flagged_bookings
+
+
+def update_components(now=None):
+    """Merge devices used since the watermark into the graph and flag rings. Returns (devices, bookings flagged)."""
+    from .models import DeviceSession, FraudGraphScan
+
+    until = (now or timezone.now()) - SETTLE
+    FraudGraphScan.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        # Serialises runs: a second worker waits here rather than merging the same sessions twice
+        scan = FraudGraphScan.objects.select_for_update().get(pk=1)
+        since = scan.checked_through
+        sessions = DeviceSession.objects.filter(last_seen__lt=until)
+        if since is not None:
+            sessions = sessions.filter(last_seen__gte=since)
+
+        uf = UnionFind()
+        seen = _link_sessions(uf, sessions, since)
+        flagged = _flag_trading(_store(uf))
+
+        scan.checked_through = until
+        scan.sessions_seen += seen
+        scan.flagged_count += flagged
+        scan.save()
+    return seen, flagged
+
+
+def component_for(user_id):
+    """(component id, member ids) for the user, or (None, []) when they are linked to nobody."""
+    from .models import FraudGraphNode
+
+    component = FraudGraphNode.objects.filter(user_id=user_id).values_list('component', flat=True).first()
+    if component is None:
+        return None, []
+    return component, list(FraudGraphNode.objects.filter(component=component).values_list('user_id', flat=True))
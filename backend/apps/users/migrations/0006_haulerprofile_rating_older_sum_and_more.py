@@ -0,0 +1,33 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_is_suspicious_devicesession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='haulerprofile',
+            name='rating_older_sum',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='haulerprofile',
+            name='rating_older_weight',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='haulerprofile',
+            name='rating_recent_sum',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='haulerprofile',
+            name='rating_recent_weight',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:22
+
+from decimal import Decimal
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def fill_rank_scores(apps, schema_editor):
+    """rank_score for existing profiles (same formula as apps.users.directory.rank_score)."""
+    HaulerProfile = apps.get_model('users', 'HaulerProfile')
+    profiles = list(HaulerProfile.objects.only('id', 'rating_avg', 'review_count', 'no_show_count'))
+    for profile in profiles:
+        smoothed = (5 * Decimal('3.5') + profile.rating_avg * profile.review_count) / (5 + profile.review_count)
+        profile.rank_score = (smoothed - Decimal('0.5') * profile.no_show_count).quantize(Decimal('0.0001'))
+    HaulerProfile.objects.bulk_update(profiles, ['rank_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_haulerprofile_rating_older_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='haulerprofile',
+            name='rank_score',
+            field=models.DecimalField(decimal_places=4, default=Decimal('3.5'), max_digits=7),
+        ),
+        migrations.RunPython(fill_rank_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='haulerprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['skills'], name='hauler_skills_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='haulerprofile',
+            index=models.Index(fields=['-rank_score', '-id'], name='hauler_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='haulerprofile',
+            index=models.Index(fields=['rating_avg'], name='hauler_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('city'), name='user_city_upper_idx'),
+        ),
+    ]
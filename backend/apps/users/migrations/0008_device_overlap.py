@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_hauler_directory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceOverlapScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_through', models.DateTimeField(blank=True, null=True)),
+                ('checked_count', models.BigIntegerField(default=0)),
+                ('flagged_count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(fields=['user', 'fingerprint'], name='device_user_fp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(fields=['user', 'created_at'], name='device_user_created_idx'),
+        ),
+    ]
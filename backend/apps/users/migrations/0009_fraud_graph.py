@@ -0,0 +1,42 @@
+# Generated by Django 4.2.9 on 2026-10-19 15:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_device_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudGraphNode',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fraud_node', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('component', models.UUIDField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FraudGraphScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_through', models.DateTimeField(blank=True, null=True)),
+                ('sessions_seen', models.BigIntegerField(default=0)),
+                ('flagged_count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='devicesession',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(fields=['created_at'], name='device_created_idx'),
+        ),
+    ]
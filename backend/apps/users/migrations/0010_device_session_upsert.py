@@ -0,0 +1,159 @@
+# Generated by Django 4.2.9 on 2026-10-19 17:05
+
+import django.contrib.postgres.indexes
+import django.utils.timezone
+from django.db import migrations, models, transaction
+
+USER_BATCH = 2000
+
+# Per (user, fingerprint) group: keep the earliest row, carrying the group's login
+# count, last login and last 5 distinct IPs (newest first), then delete the rest.
+# Also folds per-login rows written during compaction into an already-compacted row
+# (one with logins or IPs folded in), whose own last_seen and recent_ips count.
+KEEP_SQL = """
+UPDATE {t} SET recent_ips = g.recent, ip_address = (g.recent ->> 0)::inet, login_count = g.n, last_seen = g.last
+FROM (
+    SELECT (array_agg(d.id ORDER BY d.first_seen, d.id))[1] AS keep_id, sum(d.login_count) AS n,
+           max(CASE WHEN d.login_count > 1 OR d.recent_ips <> '[]' THEN d.last_seen ELSE d.first_seen END) AS last,
+           COALESCE((
+               SELECT jsonb_agg(r.ip ORDER BY r.seen DESC) FROM (
+                   SELECT s.ip, max(s.seen) AS seen FROM (
+                       SELECT host(i.ip_address) AS ip, i.first_seen AS seen FROM {t} i
+                       WHERE i.user_id = d.user_id AND i.fingerprint = d.fingerprint
+                       AND i.ip_address IS NOT NULL AND i.recent_ips = '[]'
+                       UNION ALL
+                       SELECT e.ip, i.last_seen - e.n * interval '1 microsecond' FROM {t} i
+                       CROSS JOIN jsonb_array_elements_text(i.recent_ips) WITH ORDINALITY e(ip, n)
+                       WHERE i.user_id = d.user_id AND i.fingerprint = d.fingerprint
+                   ) s
+                   GROUP BY 1 ORDER BY 2 DESC LIMIT 5
+               ) r
+           ), '[]'::jsonb) AS recent
+    FROM {t} d WHERE d.user_id = ANY(%s::uuid[]) GROUP BY d.user_id, d.fingerprint
+) g
+WHERE {t}.id = g.keep_id
+"""
+
+DROP_SQL = """
+DELETE FROM {t} d WHERE d.user_id = ANY(%s::uuid[]) AND EXISTS (
+    SELECT 1 FROM {t} k WHERE k.user_id = d.user_id AND k.fingerprint = d.fingerprint
+    AND (k.first_seen, k.id) < (d.first_seen, d.id)
+)
+"""
+
+DUPLICATED_SQL = """
+SELECT DISTINCT user_id FROM {t} GROUP BY user_id, fingerprint HAVING count(*) > 1
+"""
+
+UNIQUE_USER_FINGERPRINT = models.UniqueConstraint(fields=('user', 'fingerprint'), name='device_user_fp_unique')
+
+
+def compact_device_sessions(apps, schema_editor):
+    """Fold the per-login rows into one row per (user, fingerprint), one transaction per batch of users."""
+    DeviceSession = apps.get_model('users', 'DeviceSession')
+    table = DeviceSession._meta.db_table
+    users = DeviceSession.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    last = None
+    while True:
+        batch = list((users.filter(user_id__gt=last) if last else users)[:USER_BATCH])
+        if not batch:
+            return
+        last = batch[-1]
+        with transaction.atomic(), schema_editor.connection.cursor() as cursor:
+            user_ids = [str(user_id) for user_id in batch]
+            cursor.execute(KEEP_SQL.format(t=table), [user_ids])
+            cursor.execute(DROP_SQL.format(t=table), [user_ids])
+
+
+def add_unique_constraint(apps, schema_editor):
+    """
+    Logins keep inserting per-login rows while compact_device_sessions runs
+    (atomic = False), so lock out writers, fold whatever duplicates appeared
+    since, and add the constraint before the lock is released.
+    """
+    DeviceSession = apps.get_model('users', 'DeviceSession')
+    table = DeviceSession._meta.db_table
+    with transaction.atomic(), schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(DUPLICATED_SQL.format(t=table))
+        user_ids = [str(row[0]) for row in cursor.fetchall()]
+        if user_ids:
+            cursor.execute(KEEP_SQL.format(t=table), [user_ids])
+            cursor.execute(DROP_SQL.format(t=table), [user_ids])
+        schema_editor.add_constraint(DeviceSession, UNIQUE_USER_FINGERPRINT)
+
+
+def remove_unique_constraint(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('users', 'DeviceSession'), UNIQUE_USER_FINGERPRINT)
+
+
+class Migration(migrations.Migration):
+    # Compaction commits per batch of users rather than in one long transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0009_fraud_graph'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='devicesession',
+            name='device_user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='devicesession',
+            name='device_created_idx',
+        ),
+        migrations.RenameField(
+            model_name='devicesession',
+            old_name='created_at',
+            new_name='first_seen',
+        ),
+        migrations.AlterField(
+            model_name='devicesession',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='devicesession',
+            name='recent_ips',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='devicesession',
+            name='login_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='devicesession',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(compact_device_sessions, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_unique_constraint, remove_unique_constraint)],
+            state_operations=[
+                migrations.AddConstraint(model_name='devicesession', constraint=UNIQUE_USER_FINGERPRINT),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='devicesession',
+            name='device_user_fp_idx',
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(fields=['user', 'first_seen'], name='device_user_first_seen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(fields=['last_seen'], name='device_last_seen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['recent_ips'], name='device_recent_ips_gin'),
+        ),
+        migrations.AlterModelOptions(
+            name='devicesession',
+            options={'ordering': ['-last_seen']},
+        ),
+    ]
@@ -1,6 +1,11 @@
 import uuid
+from decimal import Decimal
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -63,6 +68,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_suspicious = models.BooleanField(default=False)  # flagged by device fingerprint detection
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Bumped to revoke every token issued so far (apps.users.authentication)
+    token_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     objects = UserManager()
@@ -70,6 +77,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'user_type']
 
+    class Meta:
+        indexes = [
+            # city__iexact lookups (hauler directory, job board)
+            models.Index(Upper('city'), name='user_city_upper_idx'),
+        ]
+
     def __str__(self):
         return f'{self.first_name} {self.last_name} ({self.email})'
 
@@ -78,6 +91,42 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f'{self.first_name} {self.last_name}'
 
 
+class ClaimsUser(User):
+    """
+    The request user built from access-token claims by
+    apps.users.authentication, without a query. Only the claimed fields are
+    loaded; the first access to any other field loads all the rest at once,
+    and reloads the claimed ones too (the token's copy may be up to
+    ACCESS_TOKEN_LIFETIME old) unless they have been set since. Until then
+    save() needs update_fields, so stale claims are never written back.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._claims = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and deferred.issuperset(fields):
+            pk_name = self._meta.pk.attname
+            fields = deferred | {
+                name for name, value in getattr(self, '_claims', {}).items()
+                if name != pk_name and getattr(self, name) == value
+            }
+            self._claims = {}
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and self.get_deferred_fields():
+            raise ValueError('ClaimsUser holds token claims, not the whole row: save() needs update_fields.')
+        super().save(*args, **kwargs)
+
+
 class HaulerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='hauler_profile')
     bio = models.TextField(blank=True)
@@ -85,31 +134,105 @@ class HaulerProfile(models.Model):
     profile_photo = models.ImageField(upload_to='hauler_photos/', null=True, blank=True)
     rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     review_count = models.IntegerField(default=0)
+    # Weighted rating aggregates behind rating_avg, maintained by apps.reviews.ratings:
+    # Σ rating·weight and Σ weight over reviews < 90 days old and over older ones
+    rating_recent_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    rating_recent_weight = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    rating_older_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    rating_older_weight = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    # Directory ordering (apps.users.directory.rank_score), refreshed with rating / no-show changes
+    rank_score = models.DecimalField(max_digits=7, decimal_places=4, default=Decimal('3.5'))
     # Reliability tracking (used by no-show strike system)
     no_show_count = models.IntegerField(default=0)
     abandonment_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Hauler directory (apps.users.directory): skill containment and keyset ordering
+            GinIndex(fields=['skills'], name='hauler_skills_gin', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['-rank_score', '-id'], name='hauler_rank_idx'),
+            models.Index(fields=['rating_avg'], name='hauler_rating_idx'),
+        ]
+
     def __str__(self):
         return f'Profile: {self.user.full_name}'
 
 
 class DeviceSession(models.Model):
     """
-    Logs device fingerprints per login (Task 17).
-    Used by the cross-account detection Celery task to flag Sybil attacks /
+    A device fingerprint a user has logged in with (Task 17): one row per
+    (user, fingerprint), upserted on every login by apps.users.devices.record_login.
+    Used by the cross-account detection Celery tasks to flag Sybil attacks /
     wash trading when the same device appears on both sides of a booking.
     Only populated when SECURITY['DEVICE_FINGERPRINT_ENABLED'] = True (prod).
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='device_sessions')
     fingerprint = models.CharField(max_length=128, db_index=True)
+    # Most recent login IP, and the last few distinct ones, newest first
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    recent_ips = models.JSONField(default=list, blank=True)
+    login_count = models.PositiveIntegerField(default=1)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-last_seen']
+        constraints = [
+            # Upsert target; also serves the overlap check's index-only fingerprint lookups per user
+            models.UniqueConstraint(fields=['user', 'fingerprint'], name='device_user_fp_unique'),
+        ]
+        indexes = [
+            # Cross-account overlap (apps.users.overlap): "has this user used a new device since the last run"
+            models.Index(fields=['user', 'first_seen'], name='device_user_first_seen_idx'),
+            # Fraud graph (apps.users.fraudgraph): devices used since the last run, and IP lookups;
+            # retention (apps.users.devices.prune_stale)
+            models.Index(fields=['last_seen'], name='device_last_seen_idx'),
+            GinIndex(fields=['recent_ips'], name='device_recent_ips_gin'),
+        ]
 
     def __str__(self):
         return f'DeviceSession: {self.user.email} — {self.fingerprint[:16]}…'
+
+
+class DeviceOverlapScan(models.Model):
+    """
+    Watermark for the incremental cross-account device check
+    (apps.users.tasks.detect_cross_account_devices). A single row.
+    """
+    # Bookings completed, and devices first seen, before this have been checked
+    checked_through = models.DateTimeField(null=True, blank=True)
+    checked_count = models.BigIntegerField(default=0)
+    flagged_count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Device overlap scan through {self.checked_through}'
+
+
+class FraudGraphNode(models.Model):
+    """
+    A user's connected component in the shared device / IP graph
+    (apps.users.fraudgraph). Users linked to no other account have no row.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='fraud_node')
+    # Component id: the user id of one of its members
+    component = models.UUIDField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id} in component {self.component}'
+
+
+class FraudGraphScan(models.Model):
+    """Watermark for the incremental fraud graph update. A single row."""
+    # Devices last seen before this have been merged into the graph
+    checked_through = models.DateTimeField(null=True, blank=True)
+    sessions_seen = models.BigIntegerField(default=0)
+    flagged_count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Fraud graph through {self.checked_through}'
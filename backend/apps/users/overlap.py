@@ -0,0 +1,107 @@
+"""
+Cross-account device overlap: the same device fingerprint logged in on both
+the client and the hauler account of a completed booking (Sybil accounts,
+wash trading). Run by apps.users.tasks.detect_cross_account_devices.
+
+The check is one query. For each candidate booking Postgres counts the
+distinct fingerprints the client shares with the hauler as a correlated
+semi-join over DeviceSession's (user, fingerprint) unique index:
+
+    SELECT count(DISTINCT c.fingerprint) FROM device_session c
+    WHERE c.user_id = booking.client_id
+      AND c.fingerprint IN (SELECT h.fingerprint FROM device_session h
+                            WHERE h.user_id = booking.hauler_id)
+
+It is incremental. DeviceOverlapScan.checked_through is a watermark, and a
+run only looks at bookings in the LOOKBACK window that either
+  - completed since the watermark, or
+  - have a party who used a new device since the watermark (a shared
+    device can show up after the booking was first checked), probed per
+    booking on DeviceSession's (user, first_seen) index.
+The watermark trails the clock by SETTLE so rows whose transactions commit
+a little after their timestamp are not skipped.
+
+Hits are written per booking (is_suspicious, shared_device_count) and both
+parties get User.is_suspicious for manual admin review. Flags are only ever
+added; clearing them is an admin decision.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+LOOKBACK = timedelta(days=90)
+SETTLE = timedelta(minutes=5)
+
+COMPLETED_STATUSES = ('completed', 'resolved_hauler', 'resolved_client')
+
+
+def _shared_devices():
+    """Correlated subquery: distinct fingerprints the booking's client shares with its hauler."""
+    from .models import DeviceSession
+
+    hauler_prints = DeviceSession.objects.filter(user_id=OuterRef(OuterRef('hauler_id'))).values('fingerprint')
+    shared = (
+        DeviceSession.objects.filter(user_id=OuterRef('client_id'), fingerprint__in=hauler_prints)
+        .order_by().values('user_id').annotate(n=Count('fingerprint', distinct=True)).values('n')
+    )
+    return Coalesce(Subquery(shared, output_field=IntegerField()), 0)
+
+
+def candidate_bookings(since, until):
+    """Completed bookings to (re)check for the window [since, until)."""
+    from apps.bookings.models import Booking
+    from .models import DeviceSession
+
+    bookings = Booking.objects.filter(
+        status__in=COMPLETED_STATUSES,
+        completed_at__gte=until - LOOKBACK,
+        completed_at__lt=until,
+        # Not yet overlap-flagged; is_suspicious can come from another detector
+        shared_device_count=0,
+    ).order_by()
+    if since <= until - LOOKBACK:
+        return bookings
+
+    def new_device(party):
+        return Exists(DeviceSession.objects.filter(
+            user_id=OuterRef(party), first_seen__gte=since, first_seen__lt=until,
+        ))
+    return bookings.filter(Q(completed_at__gte=since) | new_device('client_id') | new_device('hauler_id'))
+
+
+def detect_overlaps(now=None):
+    """Check everything new since the watermark. Returns (checked, flagged) booking counts."""
+    from apps.bookings.models import Booking
+    from .models import DeviceOverlapScan, User
+
+    until = (now or timezone.now()) - SETTLE
+    scan, _ = DeviceOverlapScan.objects.get_or_create(pk=1)
+    since = scan.checked_through or until - LOOKBACK
+
+    checked, hits = 0, []
+    rows = candidate_bookings(since, until).annotate(shared=_shared_devices()).values_list(
+        'id', 'client_id', 'hauler_id', 'shared',
+    )
+    for row in rows.iterator(chunk_size=2000):
+        checked += 1
+        if row[3]:
+            hits.append(row)
+
+    with transaction.atomic():
+        if hits:
+            Booking.objects.bulk_update(
+                [Booking(id=pk, is_suspicious=True, shared_device_count=shared) for pk, _, _, shared in hits],
+                ['is_suspicious', 'shared_device_count'],
+                batch_size=500,
+            )
+            parties = {user_id for _, client_id, hauler_id, _ in hits for user_id in (client_id, hauler_id)}
+            User.objects.filter(id__in=parties, is_suspicious=False).update(is_suspicious=True)
+        scan.checked_through = until
+        scan.checked_count += checked
+        scan.flagged_count += len(hits)
+        scan.save()
+    return checked, len(hits)
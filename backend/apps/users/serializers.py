@@ -10,6 +10,25 @@ class HaulerProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = HaulerProfile
         fields = ['bio', 'skills', 'profile_photo', 'rating_avg', 'review_count', 'no_show_count']
+        read_only_fields = ['rating_avg', 'review_count', 'no_show_count']
+
+
+class HaulerDirectorySerializer(serializers.ModelSerializer):
+    """A hauler directory entry (apps.users.directory): public profile fields only, no contact details."""
+    id = serializers.UUIDField(source='user.id')
+    first_name = serializers.CharField(source='user.first_name')
+    last_name = serializers.CharField(source='user.last_name')
+    full_name = serializers.CharField(source='user.full_name')
+    country = serializers.CharField(source='user.country')
+    city = serializers.CharField(source='user.city')
+
+    class Meta:
+        model = HaulerProfile
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'country', 'city',
+            'bio', 'skills', 'profile_photo', 'rating_avg', 'review_count', 'no_show_count',
+        ]
+        read_only_fields = fields
 
 
 class UserSerializer(serializers.ModelSerializer):
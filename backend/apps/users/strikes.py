@@ -6,15 +6,29 @@ settings. In dev this is 100 (effectively disabling automatic suspensions).
 In prod it is 1 (full enforcement).
 
 Call apply_no_show_strike(user) or apply_cancellation_strike(user) from any view
-or Celery task that detects the relevant violation.
+or Celery task that detects the relevant violation. Every account_status
+change (warnings included) revokes the user's tokens
+(apps.users.authentication.revoke_tokens): the status is an access-token
+claim, so this is what makes the new one apply from their next request. The
+user has to sign in again.
+
+Both are usually called inside the transaction that refunds the escrow, so
+the emails and restriction cache keys go through the outbox
+(apps.outbox.relay): they happen after that transaction commits, and not at
+all if it rolls back.
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
 
+from apps.outbox.relay import enqueue, idempotent
+
+from .authentication import revoke_tokens
+from .directory import refresh_rank_score
+
 SEC = settings.SECURITY
 
 
@@ -22,12 +36,42 @@ def _multiplier():
     return SEC.get('STRIKE_THRESHOLD_MULTIPLIER', 1)
 
 
+def _set_status(user, account_status, **fields):
+    """
+    Save `account_status` (and `fields`) and revoke the user's tokens. Always
+    revoked: `user` may be a request user whose status is the token's copy.
+    """
+    user.account_status = account_status
+    for name, value in fields.items():
+        setattr(user, name, value)
+    user.save(update_fields=['account_status', *fields])
+    revoke_tokens(user)
+
+
 def _send_strike_email(user, subject, body):
-    """Stub: send account warning / suspension email."""
+    """Queue the account warning / suspension email to go out once the strike commits."""
+    enqueue('apps.users.strikes.send_strike_email', {'user_id': str(user.pk), 'subject': subject, 'body': body})
+
+
+def _restrict(flag, user, until):
+    """Queue the `flag:<user id>` restriction cache key (value: expiry, ISO 8601) for after commit."""
+    enqueue('apps.users.strikes.set_restriction', {'key': f'{flag}:{user.pk}', 'until': until.isoformat()})
+
+
+@idempotent
+def send_strike_email(event_id, payload):
+    """Outbox handler. Stub: send account warning / suspension email."""
     # In prod wire up Django's send_mail or your email provider here.
     pass
 
 
+def set_restriction(event_id, payload):
+    """Outbox handler: set the restriction key until its expiry (absolute, so safe to repeat)."""
+    remaining = (datetime.fromisoformat(payload['until']) - timezone.now()).total_seconds()
+    if remaining > 0:
+        cache.set(payload['key'], payload['until'], timeout=int(remaining))
+
+
 def apply_no_show_strike(hauler_user):
     """
     Apply a no-show strike to a hauler. Increments no_show_count on HaulerProfile
@@ -44,33 +88,29 @@ def apply_no_show_strike(hauler_user):
     try:
         profile = hauler_user.hauler_profile
         profile.no_show_count += 1
-        profile.save(update_fields=['no_show_count', 'updated_at'])
+        refresh_rank_score(profile)
+        profile.save(update_fields=['no_show_count', 'rank_score', 'updated_at'])
         count = profile.no_show_count
     except Exception:
         return
 
     if count >= 5 * m:
-        hauler_user.account_status = 'banned'
-        hauler_user.is_active = False
-        hauler_user.save(update_fields=['account_status', 'is_active'])
+        _set_status(hauler_user, 'banned', is_active=False)
         _send_strike_email(hauler_user, 'Account banned', 'Your account has been permanently banned due to repeated no-shows.')
 
     elif count >= 3 * m:
-        hauler_user.account_status = 'suspended'
-        hauler_user.save(update_fields=['account_status'])
+        _set_status(hauler_user, 'suspended')
         # Store suspension expiry in cache (14 days); a Celery task can lift it
-        cache.set(f'suspension_until:{hauler_user.id}', (timezone.now() + timedelta(days=14)).isoformat(), timeout=14 * 86400)
+        _restrict('suspension_until', hauler_user, timezone.now() + timedelta(days=14))
         _send_strike_email(hauler_user, 'Account suspended', '14-day suspension. Manual review required to re-activate.')
 
     elif count >= 2 * m:
-        hauler_user.account_status = 'suspended'
-        hauler_user.save(update_fields=['account_status'])
-        cache.set(f'suspension_until:{hauler_user.id}', (timezone.now() + timedelta(hours=48)).isoformat(), timeout=48 * 3600)
+        _set_status(hauler_user, 'suspended')
+        _restrict('suspension_until', hauler_user, timezone.now() + timedelta(hours=48))
         _send_strike_email(hauler_user, 'Account suspended (48hr)', '48-hour booking suspension due to a no-show.')
 
     elif count >= 1 * m:
-        hauler_user.account_status = 'warned'
-        hauler_user.save(update_fields=['account_status'])
+        _set_status(hauler_user, 'warned')
         _send_strike_email(hauler_user, 'No-show warning', 'You have received a no-show warning.')
 
 
@@ -101,17 +141,14 @@ def apply_cancellation_strike(client_user):
     ).count()
 
     if total >= 10 * m:
-        client_user.account_status = 'warned'
-        client_user.save(update_fields=['account_status'])
+        _set_status(client_user, 'warned')
         _send_strike_email(client_user, 'Manual review required', 'Your account requires manual review due to excessive cancellations.')
 
     elif recent >= 5 * m:
-        client_user.account_status = 'suspended'
-        client_user.save(update_fields=['account_status'])
-        cache.set(f'posting_suspended_until:{client_user.id}', (timezone.now() + timedelta(days=7)).isoformat(), timeout=7 * 86400)
+        _set_status(client_user, 'suspended')
+        _restrict('posting_suspended_until', client_user, timezone.now() + timedelta(days=7))
         _send_strike_email(client_user, 'Job posting suspended', 'Job posting suspended for 7 days due to excessive cancellations.')
 
     elif recent >= 3 * m:
-        client_user.account_status = 'warned'
-        client_user.save(update_fields=['account_status'])
+        _set_status(client_user, 'warned')
         _send_strike_email(client_user, 'Cancellation warning', 'You have received a cancellation warning.')
@@ -11,44 +11,52 @@ SEC = settings.SECURITY
 @shared_task
 def detect_cross_account_devices():
     """
-    Scan completed bookings to find cases where the same device fingerprint
-    appears on both the client and hauler sides. Flags:
-      - The booking as suspicious (is_suspicious = True on Booking) [future]
+    Find completed bookings where the same device fingerprint appears on both
+    the client and hauler sides (apps.users.overlap). Flags:
+      - The booking (Booking.is_suspicious, with the shared device count)
       - Both users as is_suspicious (flag for manual admin review)
 
+    Incremental: only bookings completed, or whose parties logged in from a
+    new device, since the previous run are checked.
+
     Only runs when DEVICE_FINGERPRINT_ENABLED = True (prod).
     Runs weekly via Celery Beat.
     """
     if not SEC.get('DEVICE_FINGERPRINT_ENABLED'):
         return 'Device fingerprinting disabled — skipped.'
 
-    from .models import DeviceSession, User
-    from apps.bookings.models import Booking
+    from .overlap import detect_overlaps
 
-    flagged_bookings = 0
+    checked, flagged = detect_overlaps()
+    return f'Checked {checked} booking(s); flagged {flagged} suspicious booking(s) from device overlap.'
 
-    # Find bookings completed in the last 90 days
-    from django.utils import timezone
-    from datetime import timedelta
-    cutoff = timezone.now() - timedelta(days=90)
 
-    recent_bookings = Booking.objects.filter(
-        status__in=('completed', 'resolved_hauler', 'resolved_client'),
-        completed_at__gte=cutoff,
-    ).select_related('client', 'hauler')
+@shared_task
+def update_fraud_graph():
+    """
+    Merge device sessions logged since the last run into the shared device /
+    IP graph (apps.users.fraudgraph) and flag bookings made inside a
+    connected component, plus all of that component's members.
 
-    for booking in recent_bookings:
-        client_prints = set(
-            DeviceSession.objects.filter(user=booking.client).values_list('fingerprint', flat=True)
-        )
-        hauler_prints = set(
-            DeviceSession.objects.filter(user=booking.hauler).values_list('fingerprint', flat=True)
-        )
+    Only runs when DEVICE_FINGERPRINT_ENABLED = True (prod).
+    Runs daily via Celery Beat.
+    """
+    if not SEC.get('DEVICE_FINGERPRINT_ENABLED'):
+        return 'Device fingerprinting disabled — skipped.'
 
-        overlap = client_prints & hauler_prints
-        if overlap:
-            # Flag both users for admin review
-            User.objects.filter(id__in=[booking.client_id, booking.hauler_id]).update(is_suspicious=True)
-            flagged_bookings += 1
+    from .fraudgraph import update_components
+
+    seen, flagged = update_components()
+    return f'Merged {seen} device session(s) into the fraud graph; flagged {flagged} booking(s) inside a ring.'
+
+
+@shared_task
+def prune_device_sessions():
+    """
+    Delete devices not used for SECURITY['DEVICE_SESSION_RETENTION_DAYS'],
+    in batches (apps.users.devices.prune_stale).
+    Runs daily via Celery Beat.
+    """
+    from .devices import prune_stale
 
-    return f'Flagged {flagged_bookings} suspicious booking(s) from device overlap.'
+    return f'Pruned {prune_stale()} stale device session(s).'
@@ -14,4 +14,6 @@ urlpatterns = [
     # KYC (Stripe Identity)
     path('kyc/start/', views.kyc_start, name='kyc-start'),
     path('kyc/webhook/', views.stripe_identity_webhook, name='kyc-webhook'),
+    # Trust & safety (admin)
+    path('fraud/<uuid:user_id>/', views.fraud_component, name='fraud-component'),
 ]
@@ -8,19 +8,23 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 
 from config.throttles import AuthThrottle
+from . import authentication, directory
 from .models import User, HaulerProfile
 from .serializers import UserSerializer, UpdateUserSerializer, HaulerProfileSerializer, RegisterSerializer, LoginSerializer
+from .serializers import HaulerDirectorySerializer
 
 SEC = settings.SECURITY
 
 
 def get_tokens(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = authentication.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -65,8 +69,8 @@ def login(request):
                     request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip()
                     or request.META.get('REMOTE_ADDR')
                 )
-                from .models import DeviceSession
-                DeviceSession.objects.create(user=user, fingerprint=fingerprint[:128], ip_address=ip or None)
+                from .devices import record_login
+                record_login(user, fingerprint, ip)
 
         return Response({
             'user': UserSerializer(user).data,
@@ -130,11 +134,19 @@ def google_auth(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def refresh_token(request):
-    from rest_framework_simplejwt.serializers import TokenRefreshSerializer
-    serializer = TokenRefreshSerializer(data=request.data)
-    if serializer.is_valid():
-        return Response(serializer.validated_data)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    """New token pair with current claims; refused once the user is inactive or their tokens were revoked."""
+    raw = request.data.get('refresh')
+    if not raw:
+        return Response({'error': 'Refresh token is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        refresh = RefreshToken(raw)
+    except TokenError as e:
+        raise InvalidToken(e.args[0])
+    user = User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM), is_active=True).first()
+    # Refresh tokens issued before claims carry no version and stay valid until they expire
+    if user is None or refresh.get(authentication.VERSION_CLAIM, user.token_version) != user.token_version:
+        raise InvalidToken('Token has been revoked')
+    return Response(get_tokens(user))
 
 
 @api_view(['GET', 'PATCH'])
@@ -162,6 +174,20 @@ def update_profile(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def hauler_search(request):
+    """Browse haulers by city, skills, rating and reliability, best ranked first (apps.users.directory)."""
+    try:
+        profiles, next_cursor = directory.search(request.query_params)
+    except directory.DirectoryQueryError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'next_cursor': next_cursor,
+        'results': HaulerDirectorySerializer(profiles, many=True, context={'request': request}).data,
+    })
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def hauler_detail(request, pk):
@@ -175,10 +201,10 @@ def hauler_detail(request, pk):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def hauler_reviews(request, pk):
-    from apps.reviews.models import Review
-    from apps.reviews.serializers import ReviewSerializer
-    reviews = Review.objects.filter(reviewee_id=pk).select_related('reviewer').order_by('-created_at')
-    return Response(ReviewSerializer(reviews, many=True).data)
+    """Cursor-paginated public reviews plus rating summary, cached per hauler (apps.reviews.listing)."""
+    from apps.reviews import listing
+    response = Response(listing.hauler_reviews_body(request, pk))
+    return listing.add_cache_headers(request, response)
 
 
 # ---------------------------------------------------------------------------
@@ -236,32 +262,15 @@ def kyc_start(request):
 @permission_classes([AllowAny])
 def stripe_identity_webhook(request):
     """
-    Stripe Identity webhook handler.
-    On identity.verification_session.verified: sets user.verification_tier = 'id_verified'.
+    Stripe Identity webhook handler. Records the verified event and answers
+    straight away; on identity.verification_session.verified the consumer in
+    apps.payments.webhooks sets user.verification_tier = 'id_verified'.
     """
-    import stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+    from apps.payments.webhooks import receive
 
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
     webhook_secret = getattr(settings, 'STRIPE_IDENTITY_WEBHOOK_SECRET', settings.STRIPE_WEBHOOK_SECRET)
-
-    try:
-        event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-    except Exception:
+    if not receive(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''), webhook_secret):
         return Response({'error': 'Invalid signature.'}, status=status.HTTP_400_BAD_REQUEST)
-
-    if event['type'] == 'identity.verification_session.verified':
-        session = event['data']['object']
-        user_id = session.get('metadata', {}).get('user_id')
-        if user_id:
-            try:
-                user = User.objects.get(id=user_id)
-                user.verification_tier = 'id_verified'
-                user.save(update_fields=['verification_tier'])
-            except User.DoesNotExist:
-                pass
-
     return Response({'status': 'ok'})
 
 
@@ -324,10 +333,53 @@ def phone_verify_otp(request):
     cache.delete(cache_key)
 
     user = request.user
+    newly_verified = not user.phone_verified
     user.phone = phone
     user.phone_verified = True
     if user.verification_tier == 'unverified':
         user.verification_tier = 'phone_verified'
     user.save(update_fields=['phone', 'phone_verified', 'verification_tier'])
+    if newly_verified:
+        # Reviews by verified clients weigh 1.5× in hauler ratings
+        from apps.reviews.ratings import reweight_reviewer
+        reweight_reviewer(user)
 
     return Response({'message': 'Phone verified successfully.', 'user': UserSerializer(user).data})
+
+
+# ---------------------------------------------------------------------------
+# Fraud graph lookup (admin)
+# ---------------------------------------------------------------------------
+
+FRAUD_MEMBER_LIMIT = 500
+
+
+@api_view(['GET'])
+def fraud_component(request, user_id):
+    """
+    Admin view of the shared device / IP component a user belongs to
+    (apps.users.fraudgraph): its members and the bookings made inside it.
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+    from apps.bookings.models import Booking
+    from .fraudgraph import component_for
+
+    component, member_ids = component_for(user_id)
+    if component is None:
+        return Response({'error': 'This user shares no device or IP with another account.'},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    members = User.objects.filter(id__in=member_ids).order_by('created_at').values(
+        'id', 'email', 'first_name', 'last_name', 'user_type', 'account_status', 'is_suspicious',
+    )[:FRAUD_MEMBER_LIMIT]
+    bookings = Booking.objects.filter(client_id__in=member_ids, hauler_id__in=member_ids).values(
+        'id', 'client_id', 'hauler_id', 'amount', 'status', 'is_suspicious', 'created_at',
+    )[:FRAUD_MEMBER_LIMIT]
+    return Response({
+        'component': component,
+        'size': len(member_ids),
+        'members': list(members),
+        'bookings': list(bookings),
+    })
@@ -0,0 +1,287 @@
+"""
+Two-tier Django cache backend: Redis shared by every process, fronted by a
+small in-process LRU for read-mostly keys.
+
+    CACHES = {'default': {
+        'BACKEND': 'config.cache.TieredCache',
+        'LOCATION': 'redis://redis:6379/1',
+        'KEY_PREFIX': 'haulhub',
+        'VERSION': 1,
+        'OPTIONS': {
+            'LOCAL_PREFIXES': ('suspension_until:',),
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 30,
+            'max_connections': 50,       # anything else goes to the redis pool
+        },
+    }}
+
+Every key lives in Redis (django.core.cache.backends.redis.RedisCache, keys
+namespaced as KEY_PREFIX:VERSION:key). Django builds a cache object per
+thread; all of them in a process share one Redis connection pool and one
+local tier.
+
+Keys starting with one of LOCAL_PREFIXES are also kept in the process's
+LRU for up to LOCAL_TIMEOUT seconds, misses included, so repeated reads of
+a flag that is usually absent cost nothing. Writing or deleting such a key
+drops the local copy and publishes the key on INVALIDATION_CHANNEL. A
+listener thread in every process drops its copy in turn. If the listener
+loses Redis, the local tier is bypassed and emptied until it has
+resubscribed, since it may have missed messages. LOCAL_TIMEOUT bounds how
+stale a copy can get in the remaining races (including a Redis-side expiry).
+
+Reads are counted per key prefix (the part before the first ':', or the
+first '_' for keys without one) in config.metrics as
+cache.<prefix>.local / .shared / .miss; hit_rates() sums them up, and staff
+can read it at GET /api/metrics/cache/ (config.views.cache_metrics).
+"""
+
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache, RedisCacheClient
+from django.utils.functional import cached_property
+
+from config import metrics
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+_CLEAR_ALL = '*'
+_MISSING = object()
+
+
+def _prefix(key):
+    return key.split(':', 1)[0] if ':' in key else key.split('_', 1)[0]
+
+
+class LocalLRU:
+    """Bounded LRU of pickled values with per-entry expiry, safe to share between threads."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped on every invalidation so a read racing one does not store a stale value
+        self.generation = 0
+
+    def get(self, key):
+        """(True, value) for a live entry — value is _MISSING for a cached miss — else (False, None)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires, blob = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+        return True, _MISSING if blob is None else pickle.loads(blob)
+
+    def put(self, key, value, ttl, generation=None):
+        blob = None if value is _MISSING else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + ttl, blob)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+class _LocalTier:
+    """The process-wide LRU plus the pub/sub listener that keeps it coherent."""
+
+    def __init__(self, max_entries):
+        self.lru = LocalLRU(max_entries)
+        self.lock = threading.Lock()
+        self.pid = None
+        self.listening = False
+
+    @property
+    def origin(self):
+        return f'{socket.gethostname()}-{os.getpid()}'
+
+    def active(self, client):
+        """Whether the LRU may be used; starts the listener (again, after a fork) if needed."""
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self.listening = False
+                    self.lru.clear()
+                    threading.Thread(
+                        target=self._listen, args=(client, self.pid), name='cache-invalidation', daemon=True,
+                    ).start()
+        return self.listening
+
+    def _listen(self, client, pid):
+        while self.pid == pid:
+            pubsub = client.pubsub()
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                if (pubsub.get_message(timeout=5) or {}).get('type') != 'subscribe':
+                    raise redis.ConnectionError('No subscription confirmation')
+                # Anything cached before now may have missed an invalidation
+                self.lru.clear()
+                self.listening = True
+                for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    origin, key = message['data'].decode().split(' ', 1)
+                    if key == _CLEAR_ALL:
+                        self.lru.clear()
+                    elif origin != self.origin:
+                        self.lru.discard(key)
+            except redis.RedisError:
+                logger.warning('Cache invalidation listener lost Redis; local tier disabled', exc_info=True)
+            finally:
+                self.listening = False
+                self.lru.clear()
+                pubsub.close()
+            time.sleep(1)
+
+    def invalidate(self, client, key):
+        if key == _CLEAR_ALL:
+            self.lru.clear()
+        else:
+            self.lru.discard(key)
+        try:
+            client.publish(INVALIDATION_CHANNEL, f'{self.origin} {key}')
+        except redis.RedisError:
+            logger.warning('Could not publish cache invalidation for %s', key, exc_info=True)
+
+
+# (servers, key prefix) -> (RedisCacheClient, _LocalTier), shared by every thread's cache object
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class TieredCache(RedisCache):
+    def __init__(self, server, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.local_prefixes = tuple(options.pop('LOCAL_PREFIXES', ()))
+        self.local_timeout = options.pop('LOCAL_TIMEOUT', 30)
+        max_entries = options.pop('LOCAL_MAX_ENTRIES', 1000)
+        super().__init__(server, {**params, 'OPTIONS': options})
+        with _shared_lock:
+            shared_key = (tuple(self._servers), self.key_prefix)
+            if shared_key not in _shared:
+                _shared[shared_key] = (RedisCacheClient(self._servers, **self._options), _LocalTier(max_entries))
+            self._cache, self._tier = _shared[shared_key]
+
+    @cached_property
+    def _client(self):
+        return self._cache.get_client(write=True)
+
+    def _is_local(self, key):
+        return bool(self.local_prefixes) and key.startswith(self.local_prefixes)
+
+    def _count(self, key, outcome):
+        metrics.incr(f'cache.{_prefix(key)}.{outcome}')
+        metrics.flush_if_due()
+
+    def _invalidate(self, key, version):
+        if self._is_local(key):
+            self._tier.invalidate(self._client, self.make_and_validate_key(key, version=version))
+
+    def get(self, key, default=None, version=None):
+        if not (self._is_local(key) and self._tier.active(self._client)):
+            value = super().get(key, _MISSING, version=version)
+            self._count(key, 'miss' if value is _MISSING else 'shared')
+            return default if value is _MISSING else value
+
+        made = self.make_key(key, version=version)
+        hit, value = self._tier.lru.get(made)
+        if hit:
+            self._count(key, 'local')
+            return default if value is _MISSING else value
+        generation = self._tier.lru.generation
+        value = super().get(key, _MISSING, version=version)
+        self._tier.lru.put(made, value, self.local_timeout, generation)
+        self._count(key, 'miss' if value is _MISSING else 'shared')
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        local = [key for key in keys if self._is_local(key)]
+        shared = [key for key in keys if not self._is_local(key)]
+        found = super().get_many(shared, version=version) if shared else {}
+        for key in shared:
+            self._count(key, 'shared' if key in found else 'miss')
+        for key in local:
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version=version)
+        self._invalidate(key, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout, version=version)
+        if added:
+            self._invalidate(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = super().touch(key, timeout, version=version)
+        self._invalidate(key, version)
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version=version)
+        self._invalidate(key, version)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version=version)
+        self._invalidate(key, version)
+        return value
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = super().set_many(data, timeout, version=version)
+        for key in data:
+            self._invalidate(key, version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        super().delete_many(keys, version=version)
+        for key in keys:
+            self._invalidate(key, version)
+
+    def clear(self):
+        cleared = super().clear()
+        self._tier.invalidate(self._client, _CLEAR_ALL)
+        return cleared
+
+
+def hit_rates():
+    """{prefix: {'local': n, 'shared': n, 'miss': n, 'hit_rate': 0..1}} over all processes' flushed reads."""
+    counts = defaultdict(lambda: {'local': 0, 'shared': 0, 'miss': 0})
+    for name, value in metrics.snapshot('cache.')['counters'].items():
+        prefix, outcome = name[len('cache.'):].rsplit('.', 1)
+        counts[prefix][outcome] = value
+    for row in counts.values():
+        reads = row['local'] + row['shared'] + row['miss']
+        row['hit_rate'] = round((row['local'] + row['shared']) / reads, 4) if reads else None
+    return dict(counts)
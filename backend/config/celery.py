@@ -26,8 +26,52 @@ app.conf.beat_schedule = {
         'task': 'apps.payments.tasks.release_matured_reserves',
         'schedule': crontab(hour=2, minute=30),  # 2:30am UTC daily
     },
+    'reconcile-wallets-nightly': {
+        'task': 'apps.payments.tasks.reconcile_wallets',
+        'schedule': crontab(hour=3, minute=15),  # 3:15am UTC daily, after deposits and reserves
+    },
+    'flush-chat-message-stream-every-5-sec': {
+        'task': 'apps.chat.tasks.flush_message_stream',
+        'schedule': 5.0,  # no-op unless CHAT['WRITE_BEHIND_ENABLED']
+    },
+    'rescan-chat-messages-daily': {
+        'task': 'apps.chat.tasks.rescan_messages',
+        'schedule': crontab(hour=1, minute=0),  # 1am UTC daily; no-op once the rules version is scanned
+    },
+    'age-out-review-ratings-hourly': {
+        'task': 'apps.reviews.tasks.age_out_review_ratings',
+        'schedule': crontab(minute=20),
+    },
     'detect-cross-account-devices-weekly': {
         'task': 'apps.users.tasks.detect_cross_account_devices',
         'schedule': crontab(hour=3, minute=0, day_of_week=1),  # Monday 3am UTC
     },
+    'update-fraud-graph-daily': {
+        'task': 'apps.users.tasks.update_fraud_graph',
+        'schedule': crontab(hour=3, minute=30),  # 3:30am UTC daily
+    },
+    'drain-outbox-every-30-sec': {
+        'task': 'apps.outbox.tasks.drain_outbox',
+        'schedule': 30.0,  # backstop; enqueue() schedules a drain on commit
+    },
+    'prune-outbox-daily': {
+        'task': 'apps.outbox.tasks.prune_outbox',
+        'schedule': crontab(hour=4, minute=30),  # 4:30am UTC daily
+    },
+    'apply-stripe-events-every-30-sec': {
+        'task': 'apps.payments.tasks.apply_stripe_events',
+        'schedule': 30.0,  # backstop; the webhook views schedule a run on commit
+    },
+    'prune-stripe-events-daily': {
+        'task': 'apps.payments.tasks.prune_stripe_events',
+        'schedule': crontab(hour=5, minute=0),  # 5am UTC daily
+    },
+    'prune-statement-exports-daily': {
+        'task': 'apps.payments.tasks.prune_statement_exports',
+        'schedule': crontab(hour=5, minute=30),  # 5:30am UTC daily
+    },
+    'prune-device-sessions-daily': {
+        'task': 'apps.users.tasks.prune_device_sessions',
+        'schedule': crontab(hour=4, minute=0),  # 4am UTC daily
+    },
 }
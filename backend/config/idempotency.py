@@ -0,0 +1,194 @@
+"""
+Idempotency-Key support for money-moving endpoints.
+
+A client that sends `Idempotency-Key: <unique string>` can retry the same
+request as often as it likes; it runs once:
+
+    @api_view(['POST'])
+    @idempotent_request
+    def withdraw(request):
+        ...
+
+State lives in Redis at idem:<user id>:<key> next to a fingerprint of the
+request (method, path and body); the timings are in settings.IDEMPOTENCY:
+
+  - first request      SET NX claims the key as in flight, then the view
+                       runs and its response is stored for TTL_SECONDS. The
+                       claim expires after IN_FLIGHT_SECONDS, and a thread
+                       renews it every third of that while the view runs, so
+                       only a crashed worker's claim ever lapses
+  - repeat, finished   the stored response is replayed with an
+                       Idempotent-Replayed: true header — no view code, no
+                       database writes
+  - repeat, in flight  waits up to WAIT_SECONDS for the first one's response
+                       and replays it; 409 if it is still running. If the
+                       first one fails and releases the key meanwhile, the
+                       repeat claims it and runs
+  - same key, different request  422
+
+Only final outcomes are stored (status < 500). If the view raises or returns
+a 5xx the key is released so the retry runs again. If the response cannot be
+stored, the view has still run: the key stays claimed (for TTL_SECONDS) and
+retries get 409 rather than running it twice. Requests without the header,
+and safe methods, are not affected. If Redis is unreachable when the key is
+claimed, the view runs unprotected and a warning is logged.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# _wait_for(): the first request failed and released the key
+RELEASED = object()
+
+# KEYS[1] idempotency key; ARGV: our pending record, seconds. Renews the claim only while it is still ours.
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _cfg(key, default):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(key, default)
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str) if request.data else ''
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record['data'], status=record['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _wait_for(r, key):
+    """
+    The finished record for `key`, polling while it is in flight; RELEASED if
+    the key was released, None if it is still in flight after WAIT_SECONDS.
+    """
+    deadline = time.monotonic() + _cfg('WAIT_SECONDS', 10)
+    delay = 0.02
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+        raw = r.get(key)
+        if raw is None:
+            return RELEASED
+        record = json.loads(raw)
+        if record['state'] == 'done':
+            return record
+    return None
+
+
+def _keep_claimed(r, key, pending, stop):
+    """Renew our in-flight claim on `key` until `stop` is set."""
+    ttl = _cfg('IN_FLIGHT_SECONDS', 60)
+    while not stop.wait(ttl / 3):
+        try:
+            r.eval(_RENEW, 1, key, pending, ttl)
+        except redis.RedisError:
+            logger.warning('Could not renew idempotency claim %s', key, exc_info=True)
+
+
+def _store(r, key, pending, done):
+    """
+    Store the finished record. If that fails, keep the key claimed for
+    TTL_SECONDS instead: the view has run, so a retry must not run it again.
+    """
+    for attempt in range(3):
+        try:
+            r.set(key, json.dumps(done, default=str), ex=_cfg('TTL_SECONDS', 86400))
+            return
+        except redis.RedisError:
+            logger.warning('Could not store idempotent response for %s (attempt %d)', key, attempt + 1, exc_info=True)
+    try:
+        r.set(key, pending, ex=_cfg('TTL_SECONDS', 86400))
+    except redis.RedisError:
+        logger.error('Could not hold idempotency key %s after its request ran; a retry may run again', key)
+
+
+def idempotent_request(view):
+    """Make an @api_view function view replay its response for a repeated Idempotency-Key."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        client_key = request.META.get(HEADER)
+        if not client_key or request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return Response({'error': 'Idempotency-Key is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = f'idem:{request.user.pk}:{client_key}'
+        fingerprint = _fingerprint(request)
+        pending = json.dumps({'state': 'pending', 'fp': fingerprint})
+        try:
+            r = get_redis()
+            claimed = r.set(key, pending, nx=True, ex=_cfg('IN_FLIGHT_SECONDS', 60))
+            existing = None if claimed else r.get(key)
+        except redis.RedisError:
+            logger.warning('Idempotency store unavailable; running %s unprotected', view.__name__, exc_info=True)
+            return view(request, *args, **kwargs)
+
+        if existing is not None:
+            record = json.loads(existing)
+            if record['fp'] != fingerprint:
+                return Response(
+                    {'error': 'Idempotency-Key was already used for a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record['state'] == 'pending':
+                record = _wait_for(r, key)
+            if record is RELEASED:
+                # The first attempt failed and let go of the key: this one runs
+                return wrapper(request, *args, **kwargs)
+            if record is None:
+                return Response(
+                    {'error': 'A request with this Idempotency-Key is still in progress. Retry shortly.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(record)
+        if not claimed:
+            # Expired between SET NX and GET: treat as a fresh request
+            return wrapper(request, *args, **kwargs)
+
+        stop = threading.Event()
+        threading.Thread(target=_keep_claimed, args=(r, key, pending, stop), daemon=True).start()
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            stop.set()
+            _release(r, key)
+            raise
+        stop.set()
+        if response.status_code >= 500:
+            _release(r, key)
+            return response
+        done = {'state': 'done', 'fp': fingerprint, 'status': response.status_code, 'data': response.data}
+        _store(r, key, pending, done)
+        return response
+    return wrapper
+
+
+def _release(r, key):
+    try:
+        r.delete(key)
+    except redis.RedisError:
+        logger.warning('Could not release idempotency key %s', key, exc_info=True)
@@ -0,0 +1,119 @@
+"""
+Lightweight counters and gauges shared across processes through Redis.
+
+    from config import metrics
+
+    metrics.incr('chat.sockets.reaped')
+    metrics.gauge_max('chat.send_buffer.depth', len(outbox))
+    metrics.flush_if_due()            # or: await metrics.aflush_if_due()
+
+incr() and gauge_max() only touch process-local dicts, so they are safe on
+hot paths. flush_if_due() folds them into Redis at most every
+METRICS_FLUSH_SECONDS:
+
+  counters  summed over all processes (HINCRBY on metrics:counters)
+  gauges    the largest value each process saw since its last flush
+            (one field per process on metrics:gauges); snapshot() reports
+            the maximum over processes that flushed in the last
+            METRICS_GAUGE_TTL_SECONDS
+
+A failed flush is logged and its numbers are dropped — metrics never take a
+request down with them.
+"""
+
+import logging
+import os
+import socket
+import time
+from collections import Counter
+
+import redis
+from django.conf import settings
+
+from config.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = 'metrics:counters'
+GAUGES_KEY = 'metrics:gauges'
+
+_counters = Counter()
+_gauges = {}
+_state = {'next_flush': 0.0}
+
+
+def incr(name, value=1):
+    _counters[name] += value
+
+
+def gauge_max(name, value):
+    if value > _gauges.get(name, float('-inf')):
+        _gauges[name] = value
+
+
+def _take():
+    """Swap out the pending numbers if a flush is due, else return None."""
+    global _counters, _gauges
+    now = time.monotonic()
+    if now < _state['next_flush']:
+        return None
+    _state['next_flush'] = now + getattr(settings, 'METRICS_FLUSH_SECONDS', 10)
+    if not _counters and not _gauges:
+        return None
+    counters, gauges = _counters, _gauges
+    _counters, _gauges = Counter(), {}
+    return counters, gauges
+
+
+def _queue(pipe, counters, gauges):
+    process = f'{socket.gethostname()}-{os.getpid()}'
+    stamp = int(time.time())
+    for name, value in counters.items():
+        pipe.hincrby(COUNTERS_KEY, name, value)
+    for name, value in gauges.items():
+        pipe.hset(GAUGES_KEY, f'{name}|{process}', f'{value}|{stamp}')
+
+
+def flush_if_due():
+    pending = _take()
+    if pending is None:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue(pipe, *pending)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not flush metrics', exc_info=True)
+
+
+async def aflush_if_due():
+    pending = _take()
+    if pending is None:
+        return
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _queue(pipe, *pending)
+        await pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not flush metrics', exc_info=True)
+
+
+def snapshot(prefix=''):
+    """{'counters': {name: total}, 'gauges': {name: max}} for names starting with `prefix`."""
+    r = get_redis()
+    counters = {
+        name: int(value) for name, value in r.hgetall(COUNTERS_KEY).items() if name.startswith(prefix)
+    }
+
+    cutoff = time.time() - getattr(settings, 'METRICS_GAUGE_TTL_SECONDS', 300)
+    gauges, stale = {}, []
+    for field, raw in r.hgetall(GAUGES_KEY).items():
+        name = field.rsplit('|', 1)[0]
+        value, stamp = raw.split('|')
+        if int(stamp) < cutoff:
+            stale.append(field)
+        elif name.startswith(prefix):
+            gauges[name] = max(gauges.get(name, float('-inf')), float(value))
+    if stale:
+        r.hdel(GAUGES_KEY, *stale)
+    return {'counters': counters, 'gauges': gauges}
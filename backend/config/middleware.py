@@ -2,22 +2,19 @@ from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.settings import api_settings
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
+from apps.users.authentication import ClaimsJWTAuthentication
 
 
 @database_sync_to_async
 def get_user_from_token(token):
+    """The access token's user, built from its claims (apps.users.authentication)."""
+    auth = ClaimsJWTAuthentication()
     try:
-        UntypedToken(token)
-        validated = api_settings.TOKEN_BACKEND.decode(token, verify=True)
-        user_id = validated.get('user_id')
-        return User.objects.get(id=user_id)
-    except (InvalidToken, TokenError, User.DoesNotExist, Exception):
+        return auth.get_user(auth.get_validated_token(token))
+    except (InvalidToken, TokenError, AuthenticationFailed, Exception):
         return AnonymousUser()
 
 
@@ -0,0 +1,254 @@
+"""
+Rate limiting primitives: the DRF throttles (config.throttles), the review
+and deposit velocity gates, and WebSocket frames.
+
+All share one contract — consume() returns 0.0 when the call is allowed,
+otherwise the number of seconds until it would be:
+
+  TokenBucket        in-process, a few float operations per call. One per
+                     connection; not shared between processes or threads.
+
+  SharedTokenBucket  one bucket in Redis shared by every process (e.g. per
+                     user across all of their sockets), refilled atomically
+                     in a Lua script using the Redis clock. To keep the hot
+                     path off the network each holder leases up to `lease`
+                     tokens per round trip and spends them locally, so only
+                     one call in `lease` touches Redis. Leased tokens are
+                     already deducted from the shared bucket, so leasing never
+                     lets more through than the shared limit allows.
+
+  GCRA               `limit` units per `period` seconds for a key, shared
+                     by every process: the generic cell rate algorithm in one
+                     Lua call on a single Redis key (the theoretical arrival
+                     time), so a check is O(1) whatever the rate and atomic
+                     under concurrency. Up to `limit` units may be spent at
+                     once and the allowance refills continuously, one unit
+                     every period / limit seconds, so about twice `limit`
+                     can pass within one period. Calls can weigh more than
+                     one unit. The wait it returns is exact: the moment the
+                     call would conform, or math.inf if `cost` exceeds
+                     `limit`. Used for request throttles.
+
+  RollingWindow      at most `limit` units spent in any `period` seconds for
+                     a key: a sorted set of (timestamp, amount) entries,
+                     pruned, summed and added to in one Lua call. Unlike
+                     GCRA it never lets more than `limit` through in a
+                     period, so it backs the money and review caps ("$X per
+                     24 hours"). The limit is passed per call, so the same
+                     key can be checked against a limit that changes (e.g.
+                     with the verification tier). refund() takes back the
+                     last granted call when the action it paid for failed.
+
+If Redis is unreachable the shared limiters fail open and log a warning —
+rate limiting must not take the site down with it.
+"""
+
+import logging
+import math
+import time
+import uuid
+
+import redis
+
+from config.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. Starts full."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def consume(self, cost=1):
+        now = time.monotonic()
+        tokens = self.tokens + (now - self.stamp) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        self.stamp = now
+        if tokens >= cost:
+            self.tokens = tokens - cost
+            return 0.0
+        self.tokens = tokens
+        return (cost - tokens) / self.rate
+
+
+# KEYS[1] bucket hash; ARGV: rate (tokens/s), burst, wanted tokens
+# Returns {granted, wait_ms}: granted may be less than wanted, wait_ms > 0 only when nothing was granted.
+_TAKE = """
+local rate, burst, want = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens, ts = tonumber(state[1]), tonumber(state[2])
+if tokens == nil then
+  tokens, ts = burst, now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local granted = math.min(want, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+local wait = 0
+if granted == 0 then
+  wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+return {granted, wait}
+"""
+
+_scripts = {}
+
+
+def _script(client, kind, body=_TAKE):
+    if (kind, body) not in _scripts:
+        _scripts[kind, body] = client.register_script(body)
+    return _scripts[kind, body]
+
+
+class SharedTokenBucket:
+    """A Redis-backed bucket at ratelimit:<key>, drawn on in leases of up to `lease` tokens."""
+
+    def __init__(self, key, rate, burst, lease=1):
+        self.key = f'ratelimit:{key}'
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.lease = max(1, min(int(lease), int(burst)))
+        self.leased = 0
+
+    def _granted(self, reply):
+        granted, wait_ms = (int(v) for v in reply)
+        if granted:
+            self.leased = granted - 1
+            return 0.0
+        return wait_ms / 1000
+
+    def consume(self):
+        if self.leased:
+            self.leased -= 1
+            return 0.0
+        try:
+            reply = _script(get_redis(), 'sync')(keys=[self.key], args=[self.rate, self.burst, self.lease])
+        except redis.RedisError:
+            logger.warning('Rate limiter unavailable for %s; allowing', self.key, exc_info=True)
+            return 0.0
+        return self._granted(reply)
+
+    async def aconsume(self):
+        if self.leased:
+            self.leased -= 1
+            return 0.0
+        try:
+            reply = await _script(get_async_redis(), 'async')(
+                keys=[self.key], args=[self.rate, self.burst, self.lease],
+            )
+        except redis.RedisError:
+            logger.warning('Rate limiter unavailable for %s; allowing', self.key, exc_info=True)
+            return 0.0
+        return self._granted(reply)
+
+
+# KEYS[1] theoretical arrival time (ms); ARGV: emission interval (ms per unit), limit (units), cost (units)
+# Returns {allowed, wait_ms} as strings so the fractions survive the trip back from Lua.
+_GCRA = """
+local interval, limit, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + t[2] / 1000
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local new_tat = tat + cost * interval
+local allow_at = new_tat - limit * interval
+if allow_at > now then
+  return {'0', tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {'1', '0'}
+"""
+
+
+class GCRA:
+    """`limit` units per `period` seconds at ratelimit:gcra:<key>, refilled continuously."""
+
+    def __init__(self, key, limit, period):
+        self.key = f'ratelimit:gcra:{key}'
+        self.limit = float(limit)
+        self.interval_ms = float(period) * 1000 / self.limit
+
+    def consume(self, cost=1):
+        if cost > self.limit:
+            return math.inf
+        try:
+            allowed, wait_ms = _script(get_redis(), 'sync', _GCRA)(
+                keys=[self.key], args=[self.interval_ms, self.limit, float(cost)],
+            )
+        except redis.RedisError:
+            logger.warning('Rate limiter unavailable for %s; allowing', self.key, exc_info=True)
+            return 0.0
+        return 0.0 if allowed == '1' else float(wait_ms) / 1000
+
+
+# KEYS[1] sorted set of '<amount>:<nonce>' members scored by time (ms); ARGV: period (ms), limit, cost, nonce
+# Returns {allowed, wait_ms}; wait_ms is -1 when `cost` can never fit.
+_WINDOW = """
+local period, limit, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - period)
+local entries = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+local total = 0
+for i = 1, #entries, 2 do
+  total = total + tonumber(string.match(entries[i], '^([^:]+):'))
+end
+if total + cost <= limit then
+  redis.call('ZADD', KEYS[1], now, ARGV[3] .. ':' .. ARGV[4])
+  redis.call('PEXPIRE', KEYS[1], period)
+  return {1, 0}
+end
+if cost > limit then
+  return {0, -1}
+end
+for i = 1, #entries, 2 do
+  total = total - tonumber(string.match(entries[i], '^([^:]+):'))
+  if total + cost <= limit then
+    return {0, tonumber(entries[i + 1]) + period - now}
+  end
+end
+return {0, -1}
+"""
+
+
+class RollingWindow:
+    """At most `limit` units in any `period` seconds at ratelimit:window:<key>; the limit is given per call."""
+
+    def __init__(self, key, period):
+        self.key = f'ratelimit:window:{key}'
+        self.period_ms = int(float(period) * 1000)
+        self.granted = None
+
+    def consume(self, limit, cost=1):
+        nonce = uuid.uuid4().hex
+        try:
+            allowed, wait_ms = _script(get_redis(), 'sync', _WINDOW)(
+                keys=[self.key], args=[self.period_ms, limit, cost, nonce],
+            )
+        except redis.RedisError:
+            logger.warning('Rate limiter unavailable for %s; allowing', self.key, exc_info=True)
+            return 0.0
+        if allowed:
+            self.granted = f'{cost}:{nonce}'
+            return 0.0
+        return math.inf if wait_ms < 0 else wait_ms / 1000
+
+    def refund(self):
+        """Take back the last call consume() allowed (the action it paid for did not happen)."""
+        if self.granted is None:
+            return
+        try:
+            get_redis().zrem(self.key, self.granted)
+        except redis.RedisError:
+            logger.warning('Could not refund %s on %s', self.granted, self.key, exc_info=True)
+        self.granted = None
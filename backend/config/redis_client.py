@@ -0,0 +1,29 @@
+"""
+Shared Redis connections for code that talks to Redis directly (streams,
+Lua scripts, presence keys) instead of going through Django's cache or the
+Channels layer.
+
+Both clients are created lazily and reused for the lifetime of the process,
+so every caller shares one connection pool:
+
+    from config.redis_client import get_redis, get_async_redis
+
+    get_redis().xadd(...)                 # Celery tasks / sync views
+    await get_async_redis().xadd(...)     # consumers running on the event loop
+"""
+
+from functools import lru_cache
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+@lru_cache(maxsize=None)
+def get_async_redis() -> aioredis.Redis:
+    return aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
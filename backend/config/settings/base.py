@@ -1,5 +1,6 @@
 from pathlib import Path
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 from decouple import config, Csv
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
     'apps.payments',
     'apps.chat',
     'apps.reviews',
+    'apps.outbox',
 ]
 
 MIDDLEWARE = [
@@ -100,7 +102,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the access token's claims (no user query per request)
+        'apps.users.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -128,19 +131,47 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Redis (channel layer, Celery broker and direct clients in config.redis_client)
+REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
+
+# Django cache (config.cache.TieredCache): shared Redis, in its own database so
+# cache.clear() never touches channel-layer / Celery keys, fronted by a small
+# per-process LRU for the read-mostly key prefixes in LOCAL_PREFIXES.
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='redis://redis:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.TieredCache',
+        'LOCATION': REDIS_CACHE_URL,
+        'KEY_PREFIX': 'haulhub',
+        'VERSION': 1,
+        'OPTIONS': {
+            'max_connections': 100,
+            # Account restriction flags, set only by apps.users.strikes
+            'LOCAL_PREFIXES': ('suspension_until:', 'posting_suspended_until:'),
+            'LOCAL_MAX_ENTRIES': 5000,
+            'LOCAL_TIMEOUT': 30,
+        },
+    },
+}
+
+# config.metrics: how often each process folds its counters into Redis, and
+# how long a process's gauges count after its last flush.
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=10, cast=int)
+METRICS_GAUGE_TTL_SECONDS = 300
+
 # Django Channels
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [config('REDIS_URL', default='redis://redis:6379/0')],
+            'hosts': [REDIS_URL],
         },
     },
 }
 
 # Celery
-CELERY_BROKER_URL = config('REDIS_URL', default='redis://redis:6379/0')
-CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://redis:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -203,10 +234,26 @@ SECURITY = {
     # Dev: unused (validation off). Prod: 500 m.
     'GEO_VALIDATION_RADIUS_METERS': 500,
 
+    # --- Access tokens ---
+    # Seconds a user's token_version stays cached in Redis for the per-request
+    # revocation check (apps.users.authentication). revoke_tokens updates the
+    # cache directly, so this only bounds how often the database is consulted.
+    'TOKEN_VERSION_CACHE_SECONDS': 300,
+
     # --- Rate limiting ---
     # Master switch. False = no throttling applied (speeds up local testing).
     'RATE_LIMITING_ENABLED': False,
 
+    # --- WebSocket rate limits (apps.chat.consumers._RateLimitMixin) ---
+    # Frames per second / burst per connection (in-process bucket).
+    'WS_FRAME_RATE': 10,
+    'WS_FRAME_BURST': 30,
+    # Chat messages per second / burst per user across all sockets (Redis
+    # bucket), taken WS_MESSAGE_LEASE tokens per Redis round trip.
+    'WS_MESSAGE_RATE': 1,
+    'WS_MESSAGE_BURST': 10,
+    'WS_MESSAGE_LEASE': 3,
+
     # --- Deposit velocity ---
     # Whether per-tier daily deposit caps are enforced.
     'DEPOSIT_VELOCITY_ENABLED': False,
@@ -214,6 +261,8 @@ SECURITY = {
     # --- Device fingerprinting ---
     # Whether device fingerprint cross-account detection task runs.
     'DEVICE_FINGERPRINT_ENABLED': False,
+    # Devices not used for this many days are deleted by the retention task.
+    'DEVICE_SESSION_RETENTION_DAYS': 365,
 
     # --- IP reputation ---
     # Whether registrations from datacenter/VPN IPs trigger extra verification.
@@ -233,3 +282,136 @@ SECURITY = {
     # Whether to request 3D Secure on card payments (shifts chargeback liability).
     'STRIPE_REQUEST_3DS': False,
 }
+
+# ---------------------------------------------------------------------------
+# Chat
+# ---------------------------------------------------------------------------
+# Tunables for apps.chat (WebSocket consumers and their background tasks).
+# Read via django.conf.settings.CHAT, same as SECURITY above.
+# ---------------------------------------------------------------------------
+CHAT = {
+    # --- Write-behind persistence ---
+    # False: ChatConsumer INSERTs every message before broadcasting it.
+    # True:  the consumer assigns id + sent_at itself, appends the message to a
+    #        Redis stream and broadcasts immediately; the flush_message_stream
+    #        Celery task bulk-inserts the stream into Message.
+    'WRITE_BEHIND_ENABLED': False,
+    # Redis stream + consumer group used by the write-behind path.
+    'WRITE_BEHIND_STREAM': 'chat:messages',
+    'WRITE_BEHIND_GROUP': 'chat-writers',
+    # Messages per bulk_create batch.
+    'WRITE_BEHIND_BATCH_SIZE': 200,
+    # Stream entries left unacknowledged this long (ms) belong to a worker that
+    # died mid-batch and are claimed and replayed by the next flush.
+    'WRITE_BEHIND_CLAIM_IDLE_MS': 30000,
+    # An entry that still fails on its own after this many deliveries is
+    # moved to WRITE_BEHIND_DEAD_STREAM (with the error) and acknowledged, so
+    # it cannot hold up the rest of the stream.
+    'WRITE_BEHIND_MAX_DELIVERIES': 5,
+    'WRITE_BEHIND_DEAD_STREAM': 'chat:messages:dead',
+
+    # --- Multiplexed sockets (ws/chat/) ---
+    # Upper bound on rooms one UserChatConsumer socket may subscribe to.
+    'MAX_ROOMS_PER_SOCKET': 50,
+
+    # --- Solicitation filter (apps.chat.moderation) ---
+    # JSON rules file; None = apps/chat/data/solicitation_rules.json.
+    'MODERATION_RULES_FILE': None,
+    # How often (seconds) a process checks the rules file for changes.
+    'MODERATION_RULES_RELOAD_SECONDS': 30,
+    # Matcher implementation (class with from_rules(rules) and match(text)).
+    'MODERATION_MATCHER': 'apps.chat.moderation.RegexTrieMatcher',
+
+    # --- Presence / typing (Redis + channel layer only, see apps.chat.presence) ---
+    # A connection counts as online this long after its last heartbeat.
+    'PRESENCE_TTL_SECONDS': 60,
+    # Heartbeats arriving faster than this are ignored.
+    'PRESENCE_HEARTBEAT_MIN_SECONDS': 10,
+    # typing=true is re-broadcast at most once per interval per connection.
+    'TYPING_THROTTLE_SECONDS': 3,
+
+    # --- Reconnect backfill (apps.chat.backfill) ---
+    # Recent messages kept per room in Redis for replay on reconnect.
+    'RECENT_BUFFER_SIZE': 100,
+    'RECENT_BUFFER_TTL_SECONDS': 86400,
+    # Gaps larger than this are not replayed; the client is told to resync.
+    'BACKFILL_MAX_MESSAGES': 200,
+
+    # --- Socket flow control (apps.chat.consumers._FlowControlMixin) ---
+    # Frames buffered per connection before SEND_BUFFER_POLICY kicks in:
+    # 'coalesce' (collapse buffered messages into a resync), 'drop', or 'disconnect'.
+    'SEND_BUFFER_HIGH_WATER': 500,
+    'SEND_BUFFER_POLICY': 'coalesce',
+    # Frames written without a pong before the writer waits (0 = unlimited),
+    # and how often the writer asks for one.
+    'SEND_WINDOW': 200,
+    'SEND_ACK_EVERY': 50,
+    # Application-level keepalive; 0 disables reaping.
+    'PING_INTERVAL_SECONDS': 25,
+    'PONG_TIMEOUT_SECONDS': 10,
+
+    # --- Retroactive re-scan (apps.chat.tasks.rescan_messages) ---
+    # Messages fetched per keyset chunk (one checkpoint per chunk).
+    'RESCAN_CHUNK_SIZE': 20000,
+    # Matcher processes; None = os.cpu_count(), 1 = scan inline.
+    'RESCAN_WORKERS': None,
+    # The task re-queues itself from the checkpoint after this many seconds.
+    'RESCAN_TIME_BUDGET_SECONDS': 600,
+}
+
+# Public hauler review listing (apps.reviews.listing)
+REVIEWS = {
+    # Reviews per cursor page.
+    'PAGE_SIZE': 10,
+    # Redis cache lifetime for summaries and pages; entries are invalidated
+    # as soon as the hauler's rating changes, this only bounds memory.
+    'CACHE_SECONDS': 300,
+    # Cache-Control max-age on anonymous responses (shared caches / nginx).
+    'HTTP_MAX_AGE_SECONDS': 60,
+}
+
+# Idempotency-Key handling on money-moving endpoints (config.idempotency)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+IDEMPOTENCY = {
+    # How long a key's final response is replayed for.
+    'TTL_SECONDS': 86400,
+    # A claim not refreshed for this long (crashed worker) is released. While the
+    # view runs its claim is refreshed every IN_FLIGHT_SECONDS / 3.
+    'IN_FLIGHT_SECONDS': 60,
+    # How long a concurrent duplicate waits for the first request's response.
+    'WAIT_SECONDS': 10,
+}
+
+# Transactional outbox (apps.outbox.relay)
+OUTBOX = {
+    # Events claimed per relay transaction.
+    'BATCH_SIZE': 100,
+    # Failed handlers are retried with exponential backoff (30 s .. 1 h) this
+    # many times, then left for an admin to retry.
+    'MAX_ATTEMPTS': 10,
+    # Processed events (and @idempotent markers) are kept this long.
+    'RETENTION_DAYS': 7,
+}
+
+# Stripe webhook events, recorded by the webhook views and applied by
+# apps.payments.webhooks
+STRIPE_EVENTS = {
+    # Events claimed per consumer transaction.
+    'BATCH_SIZE': 100,
+    # A failing event is retried with exponential backoff (30 s .. 1 h) this
+    # many times, then left for an admin to retry; later events for the same
+    # user wait behind it.
+    'MAX_ATTEMPTS': 10,
+    # Processed events are kept this long, which is also how long a
+    # redelivered event id is recognised (Stripe retries for up to 3 days).
+    'RETENTION_DAYS': 30,
+}
+
+# Nightly wallet / ledger reconciliation (apps.payments.reconcile)
+RECONCILE = {
+    # Wallet ids per shard; each shard is a separate task.
+    'SHARD_SIZE': 5000,
+    # Checkpoints stay behind rows newer than this, in case a transaction
+    # that started earlier has not committed yet.
+    'SETTLE_SECONDS': 600,
+}
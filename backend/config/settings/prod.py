@@ -36,9 +36,16 @@ SECURITY = {
     'REQUIRE_KYC_FOR_PAYOUT': True,
     'GEO_VALIDATION_ENABLED': True,
     'GEO_VALIDATION_RADIUS_METERS': 500,
+    'TOKEN_VERSION_CACHE_SECONDS': 300,
     'RATE_LIMITING_ENABLED': True,
+    'WS_FRAME_RATE': 10,
+    'WS_FRAME_BURST': 30,
+    'WS_MESSAGE_RATE': 1,
+    'WS_MESSAGE_BURST': 10,
+    'WS_MESSAGE_LEASE': 3,
     'DEPOSIT_VELOCITY_ENABLED': True,
     'DEVICE_FINGERPRINT_ENABLED': True,
+    'DEVICE_SESSION_RETENTION_DAYS': 365,
     'IP_REPUTATION_CHECK_ENABLED': True,
     'REVIEW_COOLING_PERIOD_MINUTES': 60,
     'STRIKE_THRESHOLD_MULTIPLIER': 1,
@@ -0,0 +1,154 @@
+import threading
+import time
+import uuid
+from unittest import mock
+
+import redis
+from django.test import SimpleTestCase, override_settings
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.users.models import User
+from config import idempotency
+from config.redis_client import get_redis
+
+IDEMPOTENCY = {'TTL_SECONDS': 60, 'IN_FLIGHT_SECONDS': 60, 'WAIT_SECONDS': 2}
+
+
+@api_view(['POST'])
+@idempotency.idempotent_request
+def debit(request):
+    """Stands in for a money-moving view: counts its runs; the test decides how each one ends."""
+    test = request.data['test']
+    run = IdempotentRequestTests.behaviour[test]
+    IdempotentRequestTests.runs[test] += 1
+    return run(request)
+
+
+@override_settings(IDEMPOTENCY=IDEMPOTENCY)
+class IdempotentRequestTests(SimpleTestCase):
+    """Against the configured Redis; every test uses its own user and key."""
+
+    behaviour = {}
+    runs = {}
+
+    def setUp(self):
+        self.user = User(id=uuid.uuid4(), email='idem@example.com')
+        self.key = uuid.uuid4().hex
+        self.test = self.id()
+        self.runs[self.test] = 0
+        self.behaviour[self.test] = lambda request: Response({'ok': True}, status=201)
+        self.addCleanup(get_redis().delete, f'idem:{self.user.pk}:{self.key}')
+
+    def post(self, amount=10, key=None):
+        request = APIRequestFactory().post(
+            '/api/wallet/withdraw/', {'test': self.test, 'amount': amount}, format='json',
+            HTTP_IDEMPOTENCY_KEY=key or self.key,
+        )
+        force_authenticate(request, user=self.user)
+        return debit(request)
+
+    def post_in_background(self, **kwargs):
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(response=self.post(**kwargs)))
+        thread.start()
+        return thread, result
+
+    def block_until(self, event, status=201):
+        def run(request):
+            event.wait(10)
+            return Response({'ok': status < 500}, status=status)
+        self.behaviour[self.test] = run
+
+    def wait_for_claim(self):
+        deadline = time.monotonic() + 5
+        while get_redis().get(f'idem:{self.user.pk}:{self.key}') is None:
+            self.assertLess(time.monotonic(), deadline, 'first request never claimed the key')
+            time.sleep(0.01)
+
+    def test_repeat_replays_the_stored_response(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.runs[self.test], 1)
+
+    def test_same_key_for_a_different_request_is_rejected(self):
+        self.post(amount=10)
+        response = self.post(amount=11)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.runs[self.test], 1)
+
+    def test_repeat_while_in_flight_waits_for_the_response(self):
+        release = threading.Event()
+        self.block_until(release)
+        thread, _ = self.post_in_background()
+        self.wait_for_claim()
+        threading.Timer(0.3, release.set).start()
+        second = self.post()
+        thread.join()
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.runs[self.test], 1)
+
+    @override_settings(IDEMPOTENCY={**IDEMPOTENCY, 'WAIT_SECONDS': 0.2})
+    def test_repeat_gets_409_while_the_first_is_still_running(self):
+        release = threading.Event()
+        self.block_until(release)
+        thread, _ = self.post_in_background()
+        self.wait_for_claim()
+        self.assertEqual(self.post().status_code, 409)
+        release.set()
+        thread.join()
+        self.assertEqual(self.runs[self.test], 1)
+
+    @override_settings(IDEMPOTENCY={**IDEMPOTENCY, 'IN_FLIGHT_SECONDS': 1, 'WAIT_SECONDS': 0.2})
+    def test_claim_is_renewed_while_the_view_runs(self):
+        release = threading.Event()
+        self.block_until(release)
+        thread, _ = self.post_in_background()
+        self.wait_for_claim()
+        time.sleep(1.6)  # past IN_FLIGHT_SECONDS
+        self.assertEqual(self.post().status_code, 409)
+        release.set()
+        thread.join()
+        self.assertEqual(self.runs[self.test], 1)
+
+    def test_failed_attempt_releases_the_key_for_a_waiting_repeat(self):
+        release = threading.Event()
+
+        def fail_first(request):
+            if self.runs[self.test] == 1:
+                release.wait(10)
+                return Response({'ok': False}, status=503)
+            return Response({'ok': True}, status=201)
+        self.behaviour[self.test] = fail_first
+        thread, first = self.post_in_background()
+        self.wait_for_claim()
+        threading.Timer(0.3, release.set).start()
+        second = self.post()
+        thread.join()
+        self.assertEqual(first['response'].status_code, 503)
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertEqual(self.runs[self.test], 2)
+
+    def test_response_that_cannot_be_stored_is_not_run_again(self):
+        real = get_redis()
+
+        class FailingDone:
+            def __getattr__(self, name):
+                return getattr(real, name)
+
+            def set(self, key, value, **kwargs):
+                if '"done"' in value:
+                    raise redis.ConnectionError('lost')
+                return real.set(key, value, **kwargs)
+
+        with mock.patch.object(idempotency, 'get_redis', FailingDone):
+            self.assertEqual(self.post().status_code, 201)
+        with override_settings(IDEMPOTENCY={**IDEMPOTENCY, 'WAIT_SECONDS': 0.2}):
+            self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(self.runs[self.test], 1)
@@ -5,6 +5,12 @@ All throttles inherit from ConditionalThrottle, which skips enforcement when
 SECURITY['RATE_LIMITING_ENABLED'] is False (dev environment). In production,
 full per-scope limits are enforced.
 
+Each scope's rate ('10/hour', from DEFAULT_THROTTLE_RATES) is enforced by a
+config.ratelimit.GCRA limiter in Redis, per user (or per client IP for
+anonymous scopes): one atomic O(1) check per request, shared by every
+process, and a Retry-After header with the exact time until the next
+request would be allowed.
+
 Usage:
     @api_view(['POST'])
     @throttle_classes([JobCreationThrottle])
@@ -13,47 +19,76 @@ Usage:
 """
 
 from django.conf import settings
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from config.ratelimit import GCRA
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'<n>/<period>' (period: s, m, h or d, optionally spelled out) -> (n, seconds)."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
 
+class ConditionalThrottle(BaseThrottle):
+    """
+    GCRA throttle for `scope`, keyed per user. Skips enforcement when
+    RATE_LIMITING_ENABLED is False.
+    """
+    scope = None
 
-class ConditionalThrottle:
-    """Skip throttle enforcement when RATE_LIMITING_ENABLED is False."""
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
 
     def allow_request(self, request, view):
+        self.delay = 0.0
         if not settings.SECURITY.get('RATE_LIMITING_ENABLED', False):
             return True
-        return super().allow_request(request, view)
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        limit, period = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[self.scope])
+        self.delay = GCRA(f'{self.scope}:{ident}', limit, period).consume()
+        return self.delay == 0.0
 
     def wait(self):
-        if not settings.SECURITY.get('RATE_LIMITING_ENABLED', False):
-            return None
-        return super().wait()
+        return self.delay or None
 
 
-class JobCreationThrottle(ConditionalThrottle, UserRateThrottle):
+class JobCreationThrottle(ConditionalThrottle):
     scope = 'job_creation'
 
 
-class JobApplicationThrottle(ConditionalThrottle, UserRateThrottle):
+class JobApplicationThrottle(ConditionalThrottle):
     scope = 'job_application'
 
 
-class EscrowLockThrottle(ConditionalThrottle, UserRateThrottle):
+class EscrowLockThrottle(ConditionalThrottle):
     scope = 'escrow_lock'
 
 
-class DepositThrottle(ConditionalThrottle, UserRateThrottle):
+class DepositThrottle(ConditionalThrottle):
     scope = 'deposit'
 
 
-class ReviewThrottle(ConditionalThrottle, UserRateThrottle):
+class ReviewThrottle(ConditionalThrottle):
     scope = 'review'
 
 
-class EvidenceUploadThrottle(ConditionalThrottle, UserRateThrottle):
+class EvidenceUploadThrottle(ConditionalThrottle):
     scope = 'evidence_upload'
 
 
-class AuthThrottle(ConditionalThrottle, AnonRateThrottle):
-    """IP-based throttle for auth endpoints (login / register)."""
+class AuthThrottle(ConditionalThrottle):
+    """IP-based throttle for auth endpoints (login / register); authenticated requests are not limited."""
     scope = 'auth'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'ip:{self.get_ident(request)}'
@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.views import cache_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.users.urls')),
@@ -12,4 +14,5 @@ urlpatterns = [
     path('api/chat/', include('apps.chat.urls')),
     path('api/reviews/', include('apps.reviews.urls')),
     path('api/haulers/', include('apps.users.hauler_urls')),
+    path('api/metrics/cache/', cache_metrics, name='cache-metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
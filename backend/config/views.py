@@ -0,0 +1,17 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+
+@api_view(['GET'])
+def cache_metrics(request):
+    """
+    Admin view of the tiered cache across all processes: reads per key
+    prefix served by the local tier, by Redis, or missed, and the hit rate
+    (config.cache.hit_rates).
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required.'}, status=status.HTTP_403_FORBIDDEN)
+
+    from config.cache import hit_rates
+    return Response(hit_rates())
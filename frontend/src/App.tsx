@@ -18,6 +18,7 @@ import HaulerBookingDetail from './pages/hauler/BookingDetail'
 import Wallet from './pages/shared/Wallet'
 import EditProfile from './pages/shared/EditProfile'
 import HaulerProfile from './pages/shared/HaulerProfile'
+import FindHaulers from './pages/shared/FindHaulers'
 import NegotiationChat from './pages/shared/NegotiationChat'
 
 function RequireAuth({ children }: { children: React.ReactNode }) {
@@ -67,7 +68,8 @@ export default function App() {
       <Route element={<Layout />}>
         <Route path="/" element={<Landing />} />
 
-        {/* Public hauler profiles */}
+        {/* Public hauler directory and profiles */}
+        <Route path="/haulers" element={<FindHaulers />} />
         <Route path="/haulers/:id" element={<HaulerProfile />} />
 
         {/* Shared authenticated */}
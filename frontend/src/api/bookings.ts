@@ -1,4 +1,4 @@
-import apiClient from './client'
+import apiClient, { idempotent } from './client'
 import type { Booking, JobEvidence, JobAmendment } from '../types'
 
 export const bookingsApi = {
@@ -17,7 +17,7 @@ export const bookingsApi = {
     apiClient.post<Booking>(`/bookings/${id}/mark-done/`),
 
   complete: (id: string) =>
-    apiClient.post<Booking>(`/bookings/${id}/complete/`),
+    apiClient.post<Booking>(`/bookings/${id}/complete/`, undefined, idempotent()),
 
   openDispute: (id: string, reason: string) =>
     apiClient.post<Booking>(`/bookings/${id}/dispute/`, { reason }),
@@ -29,5 +29,5 @@ export const bookingsApi = {
     apiClient.post<JobAmendment>(`/bookings/${id}/amendments/`, { proposed_budget, reason }),
 
   respondToAmendment: (bookingId: string, amendmentId: string, action: 'accept' | 'reject') =>
-    apiClient.patch<JobAmendment>(`/bookings/${bookingId}/amendments/${amendmentId}/`, { action }),
+    apiClient.patch<JobAmendment>(`/bookings/${bookingId}/amendments/${amendmentId}/`, { action }, idempotent()),
 }
@@ -16,10 +16,21 @@ apiClient.interceptors.request.use((config) => {
   return config
 })
 
+// Money-moving requests carry an Idempotency-Key: the server runs them once and
+// replays the first response to any retry, so they are safe to resend.
+export const idempotent = () => ({ headers: { 'Idempotency-Key': crypto.randomUUID() } })
+
+const NETWORK_RETRIES = 2
+
 apiClient.interceptors.response.use(
   (res) => res,
   async (error) => {
     const original = error.config
+    if (!error.response && original?.headers?.['Idempotency-Key'] && (original._networkRetries ?? 0) < NETWORK_RETRIES) {
+      original._networkRetries = (original._networkRetries ?? 0) + 1
+      await new Promise((resolve) => setTimeout(resolve, 500 * original._networkRetries))
+      return apiClient(original)
+    }
     if (error.response?.status === 401 && !original._retry) {
       original._retry = true
       const { refreshToken, setAuth, logout, user } = useAuthStore.getState()
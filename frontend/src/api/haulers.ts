@@ -0,0 +1,23 @@
+import apiClient from './client'
+import type { HaulerDirectoryPage } from '../types'
+
+export interface HaulerSearchParams {
+  country?: string
+  city?: string
+  skills?: string[]
+  minRating?: string
+  maxNoShows?: string
+}
+
+export const haulersApi = {
+  search: (params: HaulerSearchParams, cursor?: string | null) => {
+    const p: Record<string, string> = {}
+    if (params.country)        p.country      = params.country
+    if (params.city)           p.city         = params.city
+    if (params.skills?.length) p.skills       = params.skills.join(',')
+    if (params.minRating)      p.min_rating   = params.minRating
+    if (params.maxNoShows)     p.max_no_shows = params.maxNoShows
+    if (cursor)                p.cursor       = cursor
+    return apiClient.get<HaulerDirectoryPage>('/haulers/', { params: p })
+  },
+}
@@ -1,4 +1,4 @@
-import apiClient from './client'
+import apiClient, { idempotent } from './client'
 import type { Job, JobApplication } from '../types'
 
 export const jobsApi = {
@@ -40,7 +40,7 @@ export const jobsApi = {
     apiClient.patch<JobApplication>(`/jobs/applications/${appId}/`, { action: 'chat' }),
 
   hire: (appId: string) =>
-    apiClient.patch<JobApplication>(`/jobs/applications/${appId}/`, { action: 'hire' }),
+    apiClient.patch<JobApplication>(`/jobs/applications/${appId}/`, { action: 'hire' }, idempotent()),
 
   rejectApplication: (appId: string) =>
     apiClient.patch<JobApplication>(`/jobs/applications/${appId}/`, { action: 'reject' }),
@@ -1,7 +1,14 @@
-import apiClient from './client'
-import type { Wallet } from '../types'
+import apiClient, { idempotent } from './client'
+import type { TransactionPage, Wallet } from '../types'
 
 export const paymentsApi = {
   getWallet: () => apiClient.get<Wallet>('/wallet/'),
-  deposit: (amount: string) => apiClient.post<{ checkout_url: string }>('/wallet/deposit/', { amount }),
+  getTransactions: (params: { type?: string; cursor?: string | null }) =>
+    apiClient.get<TransactionPage>('/wallet/transactions/', {
+      params: { type: params.type || undefined, cursor: params.cursor || undefined },
+    }),
+  // Streamed by the server; the browser still collects it into one Blob to save it
+  downloadStatement: (params: { since: string; until: string; output?: 'csv' | 'jsonl' }) =>
+    apiClient.get<Blob>('/wallet/statement/', { params, responseType: 'blob' }),
+  deposit: (amount: string) => apiClient.post<{ checkout_url: string }>('/wallet/deposit/', { amount }, idempotent()),
 }
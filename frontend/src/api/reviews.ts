@@ -1,12 +1,12 @@
 import apiClient from './client'
-import type { Review, User } from '../types'
+import type { HaulerReviewPage, Review, User } from '../types'
 
 export const reviewsApi = {
   create: (data: { booking_id: string; rating: number; comment: string }) =>
     apiClient.post<Review>('/reviews/', data),
 
-  forHauler: (haulerId: string) =>
-    apiClient.get<Review[]>(`/haulers/${haulerId}/reviews/`),
+  forHauler: (haulerId: string, cursor?: string | null) =>
+    apiClient.get<HaulerReviewPage>(`/haulers/${haulerId}/reviews/`, { params: cursor ? { cursor } : undefined }),
 
   haulerDetail: (haulerId: string) =>
     apiClient.get<User>(`/haulers/${haulerId}/`),
@@ -1,19 +1,31 @@
 import { useState, useEffect, useRef, useCallback } from 'react'
-import { useQuery } from '@tanstack/react-query'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
 import { chatApi } from '../../api/chat'
-import { useWebSocket } from '../../hooks/useWebSocket'
+import { useWebSocket, type ChatEvent } from '../../hooks/useWebSocket'
 import { useAuthStore } from '../../stores/authStore'
 import type { Message } from '../../types'
 import { format } from 'date-fns'
 
+// The server re-sends typing=true at most every few seconds while someone types
+const TYPING_EXPIRY_MS = 6000
+const TYPING_SEND_MS = 2000
+const NOTICE_MIN_MS = 2000
+
 interface ChatWindowProps {
   roomId: string
 }
 
 export default function ChatWindow({ roomId }: ChatWindowProps) {
   const { user } = useAuthStore()
+  const queryClient = useQueryClient()
   const [messages, setMessages] = useState<Message[]>([])
   const [input, setInput] = useState('')
+  const [otherOnline, setOtherOnline] = useState(false)
+  const [otherTyping, setOtherTyping] = useState(false)
+  const [notice, setNotice] = useState<string | null>(null)
+  const typingTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const noticeTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const lastTypingSent = useRef(0)
   const bottomRef = useRef<HTMLDivElement>(null)
 
   const { data: initialMessages } = useQuery({
@@ -29,13 +41,46 @@ export default function ChatWindow({ roomId }: ChatWindowProps) {
   }, [initialMessages])
 
   const handleNewMessage = useCallback((msg: Message) => {
+    if (msg.sender?.id !== user?.id) setOtherTyping(false)
     setMessages((prev) => {
       if (prev.find((m) => m.id === msg.id)) return prev
       return [...prev, msg]
     })
-  }, [])
+  }, [user?.id])
+
+  const handleEvent = useCallback((event: ChatEvent) => {
+    if (event.type === 'resync') {
+      queryClient.invalidateQueries({ queryKey: ['messages', roomId] })
+      return
+    }
+    if (event.type === 'error') {
+      // Rejected frames are not persisted, so say so instead of failing silently
+      setNotice(event.code === 4429 ? 'Slow down — messages sent too fast were not delivered.' : event.error)
+      if (noticeTimer.current) clearTimeout(noticeTimer.current)
+      noticeTimer.current = setTimeout(
+        () => setNotice(null),
+        Math.max(NOTICE_MIN_MS, (event.retry_after ?? 0) * 1000)
+      )
+      return
+    }
+    if (event.type === 'presence') {
+      setOtherOnline(event.status === 'online')
+      if (event.status === 'offline') setOtherTyping(false)
+      return
+    }
+    if (typingTimer.current) clearTimeout(typingTimer.current)
+    setOtherTyping(event.is_typing)
+    if (event.is_typing) {
+      typingTimer.current = setTimeout(() => setOtherTyping(false), TYPING_EXPIRY_MS)
+    }
+  }, [queryClient, roomId])
 
-  const { sendMessage } = useWebSocket(roomId, handleNewMessage)
+  const { sendMessage, sendTyping } = useWebSocket(roomId, handleNewMessage, handleEvent)
+
+  useEffect(() => () => {
+    if (typingTimer.current) clearTimeout(typingTimer.current)
+    if (noticeTimer.current) clearTimeout(noticeTimer.current)
+  }, [])
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -47,10 +92,27 @@ export default function ChatWindow({ roomId }: ChatWindowProps) {
     if (!content) return
     sendMessage(content)
     setInput('')
+    lastTypingSent.current = 0
+  }
+
+  const handleInput = (value: string) => {
+    setInput(value)
+    const now = Date.now()
+    if (!value.trim()) {
+      if (lastTypingSent.current) sendTyping(false)
+      lastTypingSent.current = 0
+    } else if (now - lastTypingSent.current > TYPING_SEND_MS) {
+      sendTyping(true)
+      lastTypingSent.current = now
+    }
   }
 
   return (
     <div className="flex flex-col h-full bg-white dark:bg-navy-800 rounded-xl border border-navy-200 dark:border-navy-700">
+      <div className="px-4 py-2 border-b border-navy-200 dark:border-navy-700 text-xs text-navy-500 dark:text-navy-400 flex items-center gap-2">
+        <span className={`w-2 h-2 rounded-full ${otherOnline ? 'bg-green-500' : 'bg-navy-300 dark:bg-navy-600'}`} />
+        {otherTyping ? 'Typing…' : otherOnline ? 'Online' : 'Offline'}
+      </div>
       <div className="flex-1 overflow-y-auto p-4 space-y-3 min-h-0">
         {messages.length === 0 && (
           <p className="text-center text-navy-400 dark:text-navy-500 text-sm py-8">No messages yet. Say hello!</p>
@@ -84,11 +146,17 @@ export default function ChatWindow({ roomId }: ChatWindowProps) {
         <div ref={bottomRef} />
       </div>
 
+      {notice && (
+        <p className="px-4 py-1 text-xs text-red-600 dark:text-red-400 border-t border-navy-200 dark:border-navy-700">
+          {notice}
+        </p>
+      )}
+
       <form onSubmit={handleSend} className="border-t border-navy-200 dark:border-navy-700 p-3 flex gap-2">
         <input
           type="text"
           value={input}
-          onChange={(e) => setInput(e.target.value)}
+          onChange={(e) => handleInput(e.target.value)}
           placeholder="Type a message..."
           className="input flex-1"
         />
@@ -38,6 +38,7 @@ export default function Navbar() {
                   {user.user_type === 'client' ? (
                     <>
                       <NavLink to="/dashboard">My Jobs</NavLink>
+                      <NavLink to="/haulers">Find Haulers</NavLink>
                       <Link to="/jobs/new" className="ml-1 btn-primary text-sm py-2 px-3.5">
                         Post a Job
                       </Link>
@@ -73,7 +74,10 @@ export default function Navbar() {
                     {/* Mobile nav links */}
                     <div className="sm:hidden px-1 py-1 border-b border-navy-100 dark:border-navy-700 mb-1">
                       {user.user_type === 'client' ? (
-                        <Link to="/dashboard" className="block px-2 py-1.5 text-sm text-navy-700 dark:text-navy-200 hover:bg-navy-50 dark:hover:bg-navy-700 rounded-lg">My Jobs</Link>
+                        <>
+                          <Link to="/dashboard" className="block px-2 py-1.5 text-sm text-navy-700 dark:text-navy-200 hover:bg-navy-50 dark:hover:bg-navy-700 rounded-lg">My Jobs</Link>
+                          <Link to="/haulers" className="block px-2 py-1.5 text-sm text-navy-700 dark:text-navy-200 hover:bg-navy-50 dark:hover:bg-navy-700 rounded-lg">Find Haulers</Link>
+                        </>
                       ) : (
                         <>
                           <Link to="/board" className="block px-2 py-1.5 text-sm text-navy-700 dark:text-navy-200 hover:bg-navy-50 dark:hover:bg-navy-700 rounded-lg">Job Board</Link>
@@ -1,9 +1,9 @@
 import StarRating from '../ui/StarRating'
-import type { Review } from '../../types'
+import type { PublicReview } from '../../types'
 import { format } from 'date-fns'
 
 interface ReviewCardProps {
-  review: Review
+  review: PublicReview
 }
 
 export default function ReviewCard({ review }: ReviewCardProps) {
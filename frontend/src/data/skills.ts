@@ -0,0 +1,5 @@
+// Skills a hauler can list on their profile; the directory filters on these exact strings
+export const SKILLS = [
+  'Furniture Moving', 'Junk Removal', 'Appliance Install', 'IKEA Assembly',
+  'Heavy Lifting', 'Packing', 'Storage', 'Piano Moving', 'Driving', 'Other'
+]
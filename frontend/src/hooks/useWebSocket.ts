@@ -2,7 +2,18 @@ import { useEffect, useRef, useCallback } from 'react'
 import { useAuthStore } from '../stores/authStore'
 import type { Message } from '../types'
 
+export type ChatEvent =
+  | { type: 'typing'; room_id: string; user_id: string; is_typing: boolean }
+  | { type: 'presence'; room_id: string; user_id: string; status: 'online' | 'offline' }
+  // Too many missed messages to replay after a reconnect: refetch the history
+  | { type: 'resync'; room_id: string }
+  // Frame rejected, e.g. code 4429 when sending faster than the server's rate limit
+  | { type: 'error'; room_id: string | null; code: number; error: string; retry_after?: number }
+
+const HEARTBEAT_MS = 20000
+
 interface WSMessage {
+  type?: 'message'
   id: string
   sender_id: string
   sender_name: string
@@ -14,9 +25,14 @@ interface WSMessage {
 
 export function useWebSocket(
   roomId: string | null,
-  onMessage: (msg: Message) => void
+  onMessage: (msg: Message) => void,
+  onEvent?: (event: ChatEvent) => void
 ) {
   const ws = useRef<WebSocket | null>(null)
+  const heartbeat = useRef<ReturnType<typeof setInterval> | null>(null)
+  // Last message seen on this room; sent on reconnect so the server replays only what was missed
+  const lastSeen = useRef<string | null>(null)
+  const closing = useRef(false)
   const { accessToken, user } = useAuthStore()
 
   const connect = useCallback(() => {
@@ -24,12 +40,32 @@ export function useWebSocket(
 
     const proto = window.location.protocol === 'https:' ? 'wss' : 'ws'
     const wsBase = `${proto}://${window.location.host}/ws`
-    const url = `${wsBase}/chat/${roomId}/?token=${accessToken}`
+    const resume = lastSeen.current ? `&last_seen=${lastSeen.current}` : ''
+    const url = `${wsBase}/chat/${roomId}/?token=${accessToken}${resume}`
 
     ws.current = new WebSocket(url)
 
+    ws.current.onopen = () => {
+      if (heartbeat.current) clearInterval(heartbeat.current)
+      heartbeat.current = setInterval(() => {
+        if (ws.current?.readyState === WebSocket.OPEN) {
+          ws.current.send(JSON.stringify({ type: 'presence' }))
+        }
+      }, HEARTBEAT_MS)
+    }
+
     ws.current.onmessage = (event) => {
-      const data: WSMessage = JSON.parse(event.data)
+      const data: WSMessage | ChatEvent | { type: 'ping'; seq: number } = JSON.parse(event.data)
+      if (data.type === 'ping') {
+        // Unanswered pings make the server stop writing and eventually close the socket
+        ws.current?.send(JSON.stringify({ type: 'pong', seq: data.seq }))
+        return
+      }
+      if (data.type === 'typing' || data.type === 'presence' || data.type === 'resync' || data.type === 'error') {
+        onEvent?.(data)
+        return
+      }
+      lastSeen.current = data.id
       const message: Message = {
         id: data.id,
         chat_room: roomId,
@@ -57,14 +93,26 @@ export function useWebSocket(
       onMessage(message)
     }
 
-    ws.current.onerror = () => {
-      setTimeout(connect, 3000)
+    // Errors are always followed by a close; reconnect from there (the server closes
+    // stalled sockets with 4008/4408) unless we closed it or access was refused.
+    ws.current.onclose = (event) => {
+      if (closing.current || event.code === 4001 || event.code === 4003) return
+      setTimeout(() => {
+        if (!closing.current) connect()
+      }, 3000)
     }
-  }, [roomId, accessToken, onMessage])
+  }, [roomId, accessToken, onMessage, onEvent])
 
   useEffect(() => {
+    lastSeen.current = null
+  }, [roomId])
+
+  useEffect(() => {
+    closing.current = false
     connect()
     return () => {
+      closing.current = true
+      if (heartbeat.current) clearInterval(heartbeat.current)
       ws.current?.close()
     }
   }, [connect])
@@ -75,5 +123,11 @@ export function useWebSocket(
     }
   }, [])
 
-  return { sendMessage }
+  const sendTyping = useCallback((isTyping: boolean) => {
+    if (ws.current?.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ type: 'typing', is_typing: isTyping }))
+    }
+  }, [])
+
+  return { sendMessage, sendTyping }
 }
@@ -5,11 +5,8 @@ import { authApi } from '../../api/auth'
 import { useAuthStore } from '../../stores/authStore'
 import { useNavigate } from 'react-router-dom'
 import LocationPicker from '../../components/ui/LocationPicker'
+import { SKILLS } from '../../data/skills'
 
-const SKILLS = [
-  'Furniture Moving', 'Junk Removal', 'Appliance Install', 'IKEA Assembly',
-  'Heavy Lifting', 'Packing', 'Storage', 'Piano Moving', 'Driving', 'Other'
-]
 
 interface ProfileForm {
   bio: string
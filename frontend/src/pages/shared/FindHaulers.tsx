@@ -0,0 +1,124 @@
+import { useState } from 'react'
+import { Link } from 'react-router-dom'
+import { useInfiniteQuery } from '@tanstack/react-query'
+import { haulersApi, type HaulerSearchParams } from '../../api/haulers'
+import { SKILLS } from '../../data/skills'
+import StarRating from '../../components/ui/StarRating'
+import Badge from '../../components/ui/Badge'
+import LocationPicker from '../../components/ui/LocationPicker'
+import { PageLoader } from '../../components/ui/LoadingSpinner'
+
+const RATING_OPTIONS = [
+  { value: '', label: 'Any rating' },
+  { value: '3', label: '3★ and up' },
+  { value: '4', label: '4★ and up' },
+  { value: '4.5', label: '4.5★ and up' },
+]
+
+export default function FindHaulers() {
+  const [filters, setFilters] = useState<HaulerSearchParams>({ country: '', city: '', skills: [], minRating: '' })
+  const [reliableOnly, setReliableOnly] = useState(false)
+  const params = { ...filters, maxNoShows: reliableOnly ? '0' : '' }
+
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ['haulers', params],
+    queryFn: ({ pageParam }) => haulersApi.search(params, pageParam).then((r) => r.data),
+    initialPageParam: null as string | null,
+    getNextPageParam: (last) => last.next_cursor,
+  })
+  const haulers = data?.pages.flatMap((page) => page.results) ?? []
+
+  const toggleSkill = (skill: string) =>
+    setFilters((f) => ({
+      ...f,
+      skills: f.skills?.includes(skill) ? f.skills.filter((s) => s !== skill) : [...(f.skills ?? []), skill],
+    }))
+
+  return (
+    <div className="max-w-4xl mx-auto space-y-6">
+      <h1 className="text-2xl font-bold text-navy-900 dark:text-white">Find a hauler</h1>
+
+      <div className="card space-y-4">
+        <LocationPicker
+          value={{ country: filters.country ?? '', city: filters.city ?? '' }}
+          onChange={({ country, city }) => setFilters((f) => ({ ...f, country, city }))}
+        />
+        <div className="flex flex-wrap gap-2">
+          {SKILLS.map((skill) => (
+            <button
+              key={skill}
+              type="button"
+              onClick={() => toggleSkill(skill)}
+              className={`px-3 py-1 rounded-full text-sm border transition-colors ${
+                filters.skills?.includes(skill)
+                  ? 'bg-brand-600 border-brand-600 text-white'
+                  : 'border-navy-200 dark:border-navy-600 text-navy-700 dark:text-navy-300'
+              }`}
+            >
+              {skill}
+            </button>
+          ))}
+        </div>
+        <div className="flex flex-wrap items-center gap-4">
+          <select
+            value={filters.minRating}
+            onChange={(e) => setFilters((f) => ({ ...f, minRating: e.target.value }))}
+            className="input w-auto"
+          >
+            {RATING_OPTIONS.map((o) => (
+              <option key={o.value} value={o.value}>{o.label}</option>
+            ))}
+          </select>
+          <label className="flex items-center gap-2 text-sm text-navy-700 dark:text-navy-300">
+            <input type="checkbox" checked={reliableOnly} onChange={(e) => setReliableOnly(e.target.checked)} />
+            No no-shows
+          </label>
+        </div>
+      </div>
+
+      {isLoading ? (
+        <PageLoader />
+      ) : haulers.length === 0 ? (
+        <div className="card text-center py-10">
+          <p className="text-navy-500 dark:text-navy-400">No haulers match these filters.</p>
+        </div>
+      ) : (
+        <div className="space-y-3">
+          {haulers.map((hauler) => (
+            <Link key={hauler.id} to={`/haulers/${hauler.id}`} className="card block hover:shadow-md transition-shadow">
+              <div className="flex items-start justify-between gap-4">
+                <div>
+                  <p className="font-semibold text-navy-900 dark:text-white">{hauler.full_name}</p>
+                  <p className="text-sm text-navy-500 dark:text-navy-400">{hauler.city}</p>
+                </div>
+                <div className="flex items-center gap-2 shrink-0">
+                  <StarRating rating={parseFloat(hauler.rating_avg)} size="sm" />
+                  <span className="text-sm text-navy-600 dark:text-navy-400">
+                    {hauler.rating_avg} ({hauler.review_count})
+                  </span>
+                </div>
+              </div>
+              {hauler.skills.length > 0 && (
+                <div className="flex flex-wrap gap-1.5 mt-3">
+                  {hauler.skills.map((skill) => (
+                    <Badge key={skill} variant="blue">{skill}</Badge>
+                  ))}
+                </div>
+              )}
+            </Link>
+          ))}
+          {hasNextPage && (
+            <button
+              type="button"
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+              className="btn-secondary w-full"
+            >
+              {isFetchingNextPage ? 'Loading…' : 'Show more haulers'}
+            </button>
+          )}
+        </div>
+      )}
+    </div>
+  )
+}
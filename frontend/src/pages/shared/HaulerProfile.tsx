@@ -1,5 +1,5 @@
 import { useParams } from 'react-router-dom'
-import { useQuery } from '@tanstack/react-query'
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query'
 import { reviewsApi } from '../../api/reviews'
 import StarRating from '../../components/ui/StarRating'
 import ReviewCard from '../../components/reviews/ReviewCard'
@@ -15,11 +15,21 @@ export default function HaulerProfile() {
     queryFn: () => reviewsApi.haulerDetail(id!).then((r) => r.data),
   })
 
-  const { data: reviews } = useQuery({
+  const {
+    data: reviewPages,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
     queryKey: ['hauler-reviews', id],
-    queryFn: () => reviewsApi.forHauler(id!).then((r) => r.data),
+    queryFn: ({ pageParam }) => reviewsApi.forHauler(id!, pageParam).then((r) => r.data),
+    initialPageParam: null as string | null,
+    // `next` is a relative link; only its cursor is needed
+    getNextPageParam: (last) => (last.next ? new URL(last.next, window.location.origin).searchParams.get('cursor') : null),
     enabled: !!id,
   })
+  const summary = reviewPages?.pages[0]?.summary
+  const reviews = reviewPages?.pages.flatMap((page) => page.results)
 
   if (isLoading) return <PageLoader />
   if (!hauler) return <p className="text-center text-navy-500 dark:text-navy-400">Hauler not found.</p>
@@ -78,8 +88,24 @@ export default function HaulerProfile() {
       {/* Reviews */}
       <section>
         <h2 className="text-lg font-semibold text-navy-900 dark:text-white mb-4">
-          Reviews ({reviews?.length || 0})
+          Reviews ({summary?.review_count || 0})
         </h2>
+        {summary && summary.review_count > 0 && (
+          <div className="card mb-4 space-y-1.5">
+            {(['5', '4', '3', '2', '1'] as const).map((stars) => (
+              <div key={stars} className="flex items-center gap-3 text-sm">
+                <span className="w-8 text-navy-600 dark:text-navy-400">{stars}★</span>
+                <div className="flex-1 h-2 rounded-full bg-navy-100 dark:bg-navy-700 overflow-hidden">
+                  <div
+                    className="h-full bg-brand-500"
+                    style={{ width: `${(summary.histogram[stars] / summary.review_count) * 100}%` }}
+                  />
+                </div>
+                <span className="w-8 text-right text-navy-500 dark:text-navy-400">{summary.histogram[stars]}</span>
+              </div>
+            ))}
+          </div>
+        )}
         {reviews?.length === 0 && (
           <div className="card text-center py-10">
             <p className="text-navy-500 dark:text-navy-400">No reviews yet.</p>
@@ -88,6 +114,16 @@ export default function HaulerProfile() {
         <div className="space-y-4">
           {reviews?.map((review) => <ReviewCard key={review.id} review={review} />)}
         </div>
+        {hasNextPage && (
+          <button
+            type="button"
+            onClick={() => fetchNextPage()}
+            disabled={isFetchingNextPage}
+            className="btn-secondary w-full mt-4"
+          >
+            {isFetchingNextPage ? 'Loading…' : 'Show more reviews'}
+          </button>
+        )}
       </section>
     </div>
   )
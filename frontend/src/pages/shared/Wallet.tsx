@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react'
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useSearchParams } from 'react-router-dom'
 import { paymentsApi } from '../../api/payments'
 import { PageLoader } from '../../components/ui/LoadingSpinner'
@@ -34,8 +34,20 @@ function TxIcon({ type }: { type: string }) {
   )
 }
 
+const TYPE_OPTIONS = [
+  { value: '', label: 'All transactions' },
+  { value: 'deposit', label: 'Deposits' },
+  { value: 'withdrawal', label: 'Withdrawals' },
+  { value: 'escrow_lock,escrow_release,escrow_refund', label: 'Escrow' },
+  { value: 'reserve_hold,reserve_release', label: 'Reserve' },
+]
+
+const STATEMENT_YEARS = Array.from({ length: 5 }, (_, i) => new Date().getFullYear() - i)
+
 export default function Wallet() {
   const [amount, setAmount] = useState('')
+  const [txType, setTxType] = useState('')
+  const [statementYear, setStatementYear] = useState(STATEMENT_YEARS[0])
   const [searchParams] = useSearchParams()
   const queryClient = useQueryClient()
 
@@ -46,9 +58,23 @@ export default function Wallet() {
     queryFn: () => paymentsApi.getWallet().then((r) => r.data),
   })
 
+  const {
+    data: txPages,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['wallet-transactions', txType],
+    queryFn: ({ pageParam }) => paymentsApi.getTransactions({ type: txType, cursor: pageParam }).then((r) => r.data),
+    initialPageParam: null as string | null,
+    getNextPageParam: (last) => (last.next ? new URL(last.next, window.location.origin).searchParams.get('cursor') : null),
+  })
+  const transactions = txPages?.pages.flatMap((page) => page.results)
+
   useEffect(() => {
     if (depositStatus === 'success') {
       queryClient.invalidateQueries({ queryKey: ['wallet'] })
+      queryClient.invalidateQueries({ queryKey: ['wallet-transactions'] })
     }
   }, [depositStatus, queryClient])
 
@@ -59,6 +85,19 @@ export default function Wallet() {
     },
   })
 
+  const statementMutation = useMutation({
+    mutationFn: () =>
+      paymentsApi.downloadStatement({ since: `${statementYear}-01-01`, until: `${statementYear}-12-31` }),
+    onSuccess: ({ data }) => {
+      const url = URL.createObjectURL(data)
+      const link = document.createElement('a')
+      link.href = url
+      link.download = `haulhub-statement-${statementYear}.csv`
+      link.click()
+      URL.revokeObjectURL(url)
+    },
+  })
+
   if (isLoading) return <PageLoader />
 
   return (
@@ -126,14 +165,47 @@ export default function Wallet() {
         </p>
       </div>
 
+      {/* Yearly statement */}
+      <div className="card">
+        <h2 className="font-semibold text-navy-900 dark:text-white mb-4">Statements</h2>
+        <div className="flex gap-3">
+          <select
+            value={statementYear}
+            onChange={(e) => setStatementYear(Number(e.target.value))}
+            className="input flex-1"
+          >
+            {STATEMENT_YEARS.map((year) => (
+              <option key={year} value={year}>{year}</option>
+            ))}
+          </select>
+          <button
+            onClick={() => statementMutation.mutate()}
+            disabled={statementMutation.isPending}
+            className="btn-secondary"
+          >
+            {statementMutation.isPending ? 'Preparing…' : 'Download CSV'}
+          </button>
+        </div>
+        <p className="text-xs text-navy-500 dark:text-navy-400 mt-2">
+          Every transaction in the year with a running balance, for your tax records.
+        </p>
+      </div>
+
       {/* Transaction history */}
       <div className="card">
-        <h2 className="font-semibold text-navy-900 dark:text-white mb-4">Transaction History</h2>
-        {wallet?.transactions.length === 0 && (
+        <div className="flex items-center justify-between gap-3 mb-4">
+          <h2 className="font-semibold text-navy-900 dark:text-white">Transaction History</h2>
+          <select value={txType} onChange={(e) => setTxType(e.target.value)} className="input w-auto">
+            {TYPE_OPTIONS.map((o) => (
+              <option key={o.value} value={o.value}>{o.label}</option>
+            ))}
+          </select>
+        </div>
+        {transactions?.length === 0 && (
           <p className="text-sm text-navy-500 dark:text-navy-400 text-center py-8">No transactions yet.</p>
         )}
         <div className="space-y-3">
-          {wallet?.transactions.map((tx) => (
+          {transactions?.map((tx) => (
             <div key={tx.id} className="flex items-center justify-between py-2 border-b border-navy-100 dark:border-navy-700 last:border-0">
               <div className="flex items-center gap-3">
                 <div className="w-8 h-8 rounded-lg bg-navy-100 dark:bg-navy-700 flex items-center justify-center text-navy-500 dark:text-navy-400 shrink-0">
@@ -156,6 +228,15 @@ export default function Wallet() {
             </div>
           ))}
         </div>
+        {hasNextPage && (
+          <button
+            onClick={() => fetchNextPage()}
+            disabled={isFetchingNextPage}
+            className="btn-secondary w-full mt-4"
+          >
+            {isFetchingNextPage ? 'Loading…' : 'Show older transactions'}
+          </button>
+        )}
       </div>
     </div>
   )
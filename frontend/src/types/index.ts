@@ -138,7 +138,12 @@ export interface Wallet {
   reserve_balance: string
   pending_balance: number
   total_balance: number
-  transactions: Transaction[]
+}
+
+export interface TransactionPage {
+  next: string | null
+  previous: string | null
+  results: Transaction[]
 }
 
 export interface Review {
@@ -151,6 +156,46 @@ export interface Review {
   created_at: string
 }
 
+// Review as listed on a public hauler profile (no reviewer contact details)
+export interface PublicReview {
+  id: string
+  reviewer: Pick<User, 'id' | 'first_name' | 'last_name' | 'full_name'>
+  rating: number
+  comment: string
+  created_at: string
+}
+
+export interface HaulerReviewPage {
+  summary: {
+    rating_avg: string
+    review_count: number
+    histogram: Record<'1' | '2' | '3' | '4' | '5', number>
+  }
+  next: string | null
+  previous: string | null
+  results: PublicReview[]
+}
+
+export interface HaulerDirectoryEntry {
+  id: string
+  first_name: string
+  last_name: string
+  full_name: string
+  country: string
+  city: string
+  bio: string
+  skills: string[]
+  profile_photo: string | null
+  rating_avg: string
+  review_count: number
+  no_show_count: number
+}
+
+export interface HaulerDirectoryPage {
+  next_cursor: string | null
+  results: HaulerDirectoryEntry[]
+}
+
 export interface AuthTokens {
   access: string
   refresh: string